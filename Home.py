@@ -3,8 +3,9 @@ import pandas as pd
 import json
 from datetime import datetime
 from pathlib import Path
-from calculator import RetirementCalculator
 from monte_carlo import MonteCarloSimulator, generate_monte_carlo_advice
+from results_cache import get_projection_results, get_monte_carlo_results
+from calculator import FINANCIAL_HEALTH_RATINGS, projection_health_score
 from export import export_to_pdf, export_to_excel, export_to_csv
 from charts import (
     create_balance_projection_chart,
@@ -1654,8 +1655,7 @@ if calculate_button:
             if inputs.get('retirement_age', 0) <= inputs.get('current_age', 0):
                 st.error("Retirement age must be greater than current age")
             else:
-                calculator = RetirementCalculator(inputs)
-                results = calculator.calculate()
+                results = get_projection_results(inputs)
                 
                 st.session_state.results = results
                 st.session_state.inputs = inputs  # Save inputs too
@@ -1712,7 +1712,7 @@ if 'results' in st.session_state and st.session_state.results:
     st.header("Retirement Projection")
     
     # Summary metrics - single row
-    df = pd.DataFrame(results['projection'])
+    df = results['projection'].to_frame()
     
     # Get balance at retirement (first retirement year)
     retirement_row = df[df['Age'] == retirement_age]
@@ -1728,51 +1728,12 @@ if 'results' in st.session_state and st.session_state.results:
     # Check if there are any OAS clawbacks
     has_oas_clawback = (df['OAS Clawback'] > 0).any() if 'OAS Clawback' in df.columns else False
     
-    # Calculate Financial Health Score (0-100)
-    # Based on absolute balance thresholds throughout retirement
-    financial_health_score = 100
-    
-    # Detect shortfall (when balance hits zero before age 100) - OPTIMIZED
-    shortfall_age = None
-    shortfall_mask = (df['Age'] >= retirement_age) & (df['Investment Balance End'] <= 0) & (df['Age'] < 100)
-    shortfall_rows = df[shortfall_mask]
-    if not shortfall_rows.empty:
-        shortfall_age = int(shortfall_rows.iloc[0]['Age'])
-    
-    # CRITICAL: If there's a shortfall (funds run out), score is automatically 0
-    if shortfall_age:
-        financial_health_score = 0
-        health_rating = "❌ Fail"
-    else:
-        # Check minimum balance from retirement through age 95
-        retirement_df = df[df['Age'] >= retirement_age]
-        if not retirement_df.empty:
-            min_balance = retirement_df['Investment Balance End'].min()
-            
-            # Apply threshold-based scoring
-            if min_balance >= 1_600_000:
-                # Excellent: Always above $1.6M
-                financial_health_score = 100
-                health_rating = "🟢 Excellent"
-            elif min_balance >= 1_200_000:
-                # Good: Always above $1.2M
-                financial_health_score = 75
-                health_rating = "🟡 Good"
-            elif min_balance >= 500_000:
-                # Fair: Always above $500K
-                financial_health_score = 50
-                health_rating = "🟠 Fair"
-            else:
-                # Poor: Below $500K at some point
-                financial_health_score = 25
-                health_rating = "🔴 Poor"
-        else:
-            financial_health_score = 0
-            health_rating = "❌ Fail"
+    # Financial Health Score (0-100) by the lowest balance through retirement - 0 if the money runs out before 100
+    financial_health_score = projection_health_score(df['Age'], df['Investment Balance End'], retirement_age)
+    health_rating = FINANCIAL_HEALTH_RATINGS[financial_health_score]
     
-    # Run Monte Carlo simulation for success rate
-    mc_simulator = MonteCarloSimulator(inputs, num_simulations=10000)
-    mc_results = mc_simulator.run_simulation()
+    # Monte Carlo success rate - memoized, so reruns with unchanged inputs don't re-simulate
+    mc_results = get_monte_carlo_results(inputs, num_simulations=10000)
     mc_success_rate = mc_results['success_rate']
     
     col1, col2, col3, col4, col5, col6, col7, col8 = st.columns(8)
@@ -1810,7 +1771,7 @@ if 'results' in st.session_state and st.session_state.results:
     if legend_parts:
         st.caption(" | ".join(legend_parts))
     
-    df = pd.DataFrame(results['projection'])
+    df = results['projection'].to_frame()
     
     # Explicitly set column order
     column_order = [
@@ -2114,8 +2075,7 @@ if 'results' in st.session_state and st.session_state.results:
     
     if st.button("Run Monte Carlo Simulation (10,000 scenarios)", type="secondary"):
         with st.spinner("Running 10,000 simulations... This may take a moment."):
-            simulator = MonteCarloSimulator(inputs, num_simulations=10000)
-            mc_results = simulator.run_simulation()
+            mc_results = get_monte_carlo_results(inputs, num_simulations=10000)
             st.session_state.mc_results = mc_results
             st.rerun()
     
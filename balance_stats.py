@@ -0,0 +1,88 @@
+"""Per-age balance recorders for Monte Carlo percentiles: exact float32 matrix or bounded streaming sketch"""
+import numpy as np
+from typing import Sequence
+
+# Relative accuracy of sketch percentiles (each reported value is within 1% of the true one)
+SKETCH_RELATIVE_ACCURACY = 0.01
+# Largest balance the sketch resolves; anything above lands in the top bucket
+SKETCH_MAX_BALANCE = 1e12
+
+
+class BalanceMatrix:
+    """Exact per-age balances for every path, stored in one preallocated float32 (paths x ages) array"""
+
+    def __init__(self, num_paths: int, num_ages: int):
+        self.values = np.empty((num_paths, num_ages), dtype=np.float32)
+
+    def record(self, age_index: int, balances: np.ndarray):
+        """Store the (already floored) balances of every path at one age"""
+        self.values[:, age_index] = balances
+
+    def absorb(self, part: 'BalanceMatrix', row_offset: int):
+        """Copy a chunk's matrix into this one's rows starting at row_offset"""
+        self.values[row_offset:row_offset + len(part.values)] = part.values
+
+    def copy_ages(self, other: 'BalanceMatrix', num_ages: int):
+        """Take the first num_ages ages from another recorder of the same paths"""
+        self.values[:, :num_ages] = other.values[:, :num_ages]
+
+    def trim(self, num_paths: int):
+        """Drop preallocated rows that were never filled"""
+        self.values = self.values[:num_paths]
+
+    def percentiles(self, qs: Sequence[float]) -> np.ndarray:
+        """(len(qs), ages) array of percentiles, computed for every age in one pass"""
+        return np.percentile(self.values, qs, axis=0)
+
+
+class BalanceSketch:
+    """
+    Mergeable streaming quantile sketch with one row of log-spaced buckets per age
+    (DDSketch-style). Memory is fixed by the number of ages, not the number of paths,
+    and sketches from separate chunks merge by adding their counts.
+    """
+
+    gamma = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+    log_gamma = np.log(gamma)
+    # Bucket 0 holds depleted (zero) balances; bucket k >= 1 covers (gamma^(k-2), gamma^(k-1)]
+    num_buckets = int(np.ceil(np.log(SKETCH_MAX_BALANCE) / np.log(gamma))) + 2
+
+    def __init__(self, num_paths: int, num_ages: int):
+        self.counts = np.zeros((num_ages, self.num_buckets), dtype=np.int64)
+
+    def record(self, age_index: int, balances: np.ndarray):
+        """Add the (already floored) balances of every path at one age"""
+        buckets = np.zeros(len(balances), dtype=np.int64)
+        positive = balances > 0
+        buckets[positive] = np.clip(
+            np.ceil(np.log(np.maximum(balances[positive], 1.0)) / self.log_gamma), 0, self.num_buckets - 2
+        ).astype(np.int64) + 1
+        self.counts[age_index] += np.bincount(buckets, minlength=self.num_buckets)
+
+    def absorb(self, part: 'BalanceSketch', row_offset: int):
+        """Merge a chunk's sketch into this one by adding bucket counts"""
+        self.counts += part.counts
+
+    def copy_ages(self, other: 'BalanceSketch', num_ages: int):
+        """Take the first num_ages ages from another recorder of the same paths"""
+        self.counts[:num_ages] = other.counts[:num_ages]
+
+    def trim(self, num_paths: int):
+        """Nothing to drop - the sketch's size doesn't depend on the number of paths"""
+
+    def percentiles(self, qs: Sequence[float]) -> np.ndarray:
+        """(len(qs), ages) array of approximate percentiles, computed for every age in one pass"""
+        cumulative = np.cumsum(self.counts, axis=1)
+        total = cumulative[:, -1:]
+        # Bucket holding the rank of each requested percentile (nearest-rank, like np.percentile's 'lower')
+        ranks = np.asarray(qs, dtype=float)[:, None, None] / 100 * (total - 1)
+        buckets = (cumulative[None, :, :] <= ranks).sum(axis=2)
+        # Representative value of bucket k is the midpoint (in relative terms) of its range
+        values = 2 * self.gamma ** (buckets - 1) / (self.gamma + 1)
+        return np.where(buckets == 0, 0.0, values)
+
+
+BALANCE_RECORDERS = {
+    'exact': BalanceMatrix,
+    'sketch': BalanceSketch,
+}
@@ -1,32 +1,163 @@
+import numpy as np
+import pandas as pd
+
+from cash_flows import compile_cash_flows, OAS_CLAWBACK_RATE
+from plan_inputs import PlanInputs, compile_inputs
+from portfolio import target_equity_percent
+
+# Columns of the year-by-year projection, in display order
+PROJECTION_COLUMNS = (
+    'Age', 'Income (Today\'s $)', 'Total Monthly Income', 'Required Income', 'Monthly Shortfall',
+    'Monthly Surplus', 'Investment Balance Start', 'Monthly Investment', 'Investment Withdrawal',
+    'Surplus Reinvested', 'Investment Balance End', 'Yearly Investment Return', 'OAS', 'OAS P1', 'OAS P2',
+    'CPP', 'CPP P1', 'CPP P2', 'Employer Pension', 'Employer Pension P1', 'Employer Pension P2',
+    'Monthly Pension', 'Yearly Pension Amount', 'Part-Time Income', 'Lump Sum', 'Lump Sum Withdrawal',
+    'OAS Clawback', '4% Rule Amount', 'Withdrawal vs 4% Rule', '% Over 4% Rule',
+)
+
+
+class Projection:
+    """
+    Year-by-year projection stored by column: one read-only NumPy array per PROJECTION_COLUMNS
+    entry, row 0 being the current age. projection['OAS'] is a column; iterating or indexing by
+    row gives the old per-year dicts, which (like the DataFrame) are only built when first asked for.
+    """
+
+    __slots__ = ('columns', '_rows', '_frame')
+
+    def __init__(self, columns):
+        for values in columns.values():
+            values.setflags(write=False)
+        self.columns = columns
+        self._rows = None
+        self._frame = None
+
+    def __len__(self):
+        return len(self.columns['Age'])
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        return self.rows()[key]
+
+    def __iter__(self):
+        return iter(self.rows())
+
+    def rows(self):
+        """The projection as a list of per-year dicts (built once, on first use)"""
+        if self._rows is None:
+            names = list(self.columns)
+            self._rows = [dict(zip(names, row)) for row in zip(*(values.tolist() for values in self.columns.values()))]
+        return self._rows
+
+    def to_frame(self):
+        """The projection as a DataFrame over the same column arrays (built once, on first use)"""
+        if self._frame is None:
+            self._frame = pd.DataFrame(self.columns, copy=False)
+        return self._frame
+
+    def at_age(self, age, column, default=None):
+        """Value of column in the year of age, or default if the projection doesn't reach it"""
+        index = age - int(self.columns['Age'][0])
+        return self.columns[column][index].item() if 0 <= index < len(self) else default
+
+
+# Per-age schedule arrays the projection reads before retirement, and (only) in retirement
+_WORKING_ARRAYS = ('retired', 'lump_in', 'lump_out', 'monthly_investment')
+_RETIREMENT_ARRAYS = ('required_income', 'part_time', 'oas_p1', 'oas_p2', 'cpp_p1', 'cpp_p2', 'employer_pension_p1',
+                      'employer_pension_p2', 'oas_clawback_threshold', 'inflation_factor', 'four_percent_factor')
+
+
+class CalculationCheckpoint:
+    """
+    A finished projection's compiled schedule, its column values and the state entering every
+    year (balance and 4% rule baseline), so a rerun for edited inputs can resume at the first
+    age whose cash flows changed instead of recomputing from the current age.
+    """
+
+    def __init__(self, schedule, values, balances, four_percent_baselines):
+        self.schedule = schedule
+        self.values = values
+        self.balances = balances
+        self.four_percent_baselines = four_percent_baselines
+
+    def first_changed_index(self, schedule) -> int:
+        """Index of the first age whose cash flows differ (0 = recompute everything, len = nothing changed)"""
+        previous = self.schedule
+        if (schedule.current_age != previous.current_age or len(schedule) != len(previous)
+                or schedule.initial_balance != previous.initial_balance
+                or schedule.investment_return != previous.investment_return
+                or schedule.ignore_oas_clawback != previous.ignore_oas_clawback):
+            return 0
+        changed = np.zeros(len(schedule), dtype=bool)
+        for name in _WORKING_ARRAYS:
+            changed |= getattr(schedule, name) != getattr(previous, name)
+        # Up to the first change the retirement years match, and only their amounts matter
+        for name in _RETIREMENT_ARRAYS:
+            changed |= schedule.retired & (getattr(schedule, name) != getattr(previous, name))
+        return int(np.argmax(changed)) if changed.any() else len(schedule)
+
+
 class RetirementCalculator:
-    def __init__(self, inputs):
-        self.inputs = inputs
+    def __init__(self, inputs, resume_from=None):
+        # PlanInputs, or an inputs dict compiled (validated and defaulted) once here
+        self.inputs = compile_inputs(inputs)
+        # Incremental reruns: resume_from is an earlier calculation's checkpoint; years before the
+        # first age whose cash flows changed are copied from it. Every run stores self.checkpoint.
+        self.resume_from = resume_from
+        self.checkpoint = None
         
     def calculate(self):
         """Calculate year-by-year retirement projection from current age to 100"""
-        projection = []
-        
-        current_age = self.inputs['current_age']
-        retirement_age = self.inputs['retirement_age']
-        balance = float(self.inputs['total_investments'])
-        
-        # Get lump sums and create lookup dict - SAFETY CHECK
-        lump_sums = self.inputs.get('lump_sums', [])
-        if not isinstance(lump_sums, list):
-            lump_sums = []
-        lump_sum_by_age = {ls['age']: ls['amount'] for ls in lump_sums if isinstance(ls, dict) and ls.get('amount', 0) > 0}
-        
-        # Get lump sum withdrawals and create lookup dict - SAFETY CHECK
-        lump_withdrawals = self.inputs.get('lump_sum_withdrawals', [])
-        if not isinstance(lump_withdrawals, list):
-            lump_withdrawals = []
-        lump_withdrawal_by_age = {lw['age']: lw['amount'] for lw in lump_withdrawals if isinstance(lw, dict) and lw.get('amount', 0) > 0}
+        current_age = self.inputs.current_age
+        retirement_age = self.inputs.retirement_age
+        balance = self.inputs.total_investments
+        investment_return = self.inputs.return_rate
+        
+        # All deterministic per-age amounts (inflation, pensions, reductions, lump sums) compiled once
+        schedule = compile_cash_flows(self.inputs)
+        lump_in = schedule.lump_in.tolist()
+        lump_out = schedule.lump_out.tolist()
+        monthly_investment = schedule.monthly_investment.tolist()
+        required_incomes = schedule.required_income.tolist()
+        part_times = schedule.part_time.tolist()
+        oas_p1s, oas_p2s = schedule.oas_p1.tolist(), schedule.oas_p2.tolist()
+        cpp_p1s, cpp_p2s = schedule.cpp_p1.tolist(), schedule.cpp_p2.tolist()
+        employer_p1s, employer_p2s = schedule.employer_pension_p1.tolist(), schedule.employer_pension_p2.tolist()
+        oas_totals, cpp_totals = schedule.oas.tolist(), schedule.cpp.tolist()
+        employer_totals = schedule.employer_pension.tolist()
+        oas_thresholds = schedule.oas_clawback_threshold.tolist()
+        inflation_factors = schedule.inflation_factor.tolist()
+        four_percent_factors = schedule.four_percent_factor.tolist()
+        
+        # One list per projection column, filled in place year by year and turned into arrays at the end
+        ages = list(range(current_age, 101))
+        values = {name: [0] * len(ages) for name in PROJECTION_COLUMNS}
+        values['Age'] = ages
+        # State entering every year, checkpointed so a rerun can resume from any age
+        balances = [None] * len(ages)
+        four_percent_baselines = [None] * len(ages)
         
         # Calculate 4% rule baseline (for comparison in retirement years)
         balance_at_retirement = None
         four_percent_baseline = None
         
-        for age in range(current_age, 101):
+        # Years before the first changed age are the same as in the checkpointed run
+        checkpoint = self.resume_from
+        start_index = checkpoint.first_changed_index(schedule) if checkpoint is not None else 0
+        if start_index:
+            for name in PROJECTION_COLUMNS[1:]:
+                values[name][:start_index] = checkpoint.values[name][:start_index]
+            balances[:start_index] = checkpoint.balances[:start_index]
+            four_percent_baselines[:start_index] = checkpoint.four_percent_baselines[:start_index]
+            if start_index < len(ages):
+                balance = checkpoint.balances[start_index]
+                four_percent_baseline = checkpoint.four_percent_baselines[start_index]
+        
+        for i in range(start_index, len(ages)):
+            age = ages[i]
+            balances[i] = balance
+            four_percent_baselines[i] = four_percent_baseline
             year_start_balance = round(balance, 2)
             
             # Capture balance at retirement for 4% rule calculation
@@ -34,214 +165,71 @@ class RetirementCalculator:
                 balance_at_retirement = year_start_balance
                 four_percent_baseline = balance_at_retirement * 0.04 / 12  # Monthly amount
             
-            year_data = {
-                'Age': age,
-                'Income (Today\'s $)': 0,
-                'Total Monthly Income': 0,
-                'Required Income': 0,
-                'Monthly Shortfall': 0,
-                'Monthly Surplus': 0,
-                'Investment Balance Start': year_start_balance,
-                'Monthly Investment': 0,
-                'Investment Withdrawal': 0,
-                'Surplus Reinvested': 0,
-                'Investment Balance End': year_start_balance,
-                'Yearly Investment Return': 0,
-                'OAS': 0,
-                'OAS P1': 0,
-                'OAS P2': 0,
-                'CPP': 0,
-                'CPP P1': 0,
-                'CPP P2': 0,
-                'Employer Pension': 0,
-                'Employer Pension P1': 0,
-                'Employer Pension P2': 0,
-                'Monthly Pension': 0,
-                'Yearly Pension Amount': 0,
-                'Part-Time Income': 0,
-                'Lump Sum': 0,
-                'Lump Sum Withdrawal': 0,
-                'OAS Clawback': 0,
-                '4% Rule Amount': 0,
-                'Withdrawal vs 4% Rule': 0,
-                '% Over 4% Rule': 0
-            }
+            values['Investment Balance Start'][i] = year_start_balance
             
             # Add lump sum if applicable (at beginning of year, BEFORE returns)
             # ISSUE 3 FIX: Lump sums now added before returns so they earn returns in the year added
-            if age in lump_sum_by_age:
-                lump_sum_amount = lump_sum_by_age[age]
-                balance += lump_sum_amount
-                year_data['Lump Sum'] = round(lump_sum_amount, 2)
+            if lump_in[i]:
+                balance += lump_in[i]
+                values['Lump Sum'][i] = round(lump_in[i], 2)
             
             # Subtract lump sum withdrawal if applicable (at beginning of year, BEFORE returns)
-            if age in lump_withdrawal_by_age:
-                lump_withdrawal_amount = lump_withdrawal_by_age[age]
-                balance -= lump_withdrawal_amount
-                year_data['Lump Sum Withdrawal'] = round(lump_withdrawal_amount, 2)
+            if lump_out[i]:
+                balance -= lump_out[i]
+                values['Lump Sum Withdrawal'][i] = round(lump_out[i], 2)
             
             # Investment returns on balance (including any lump sums added this year)
-            annual_return = balance * (self.inputs['investment_return'] / 100)
+            annual_return = balance * investment_return
             
             # Monthly investments (before retirement and before stop age)
             # Use mid-year convention: contributions earn half-year return on average
-            if age < retirement_age and age <= self.inputs['stop_investments_age']:
-                monthly_inv = self.inputs['monthly_investments']
-                year_data['Monthly Investment'] = round(monthly_inv, 2)
+            if monthly_investment[i]:
+                monthly_inv = monthly_investment[i]
+                values['Monthly Investment'][i] = round(monthly_inv, 2)
                 
                 annual_contributions = monthly_inv * 12
                 # Mid-year convention: assume contributions earn half a year's return
-                contribution_returns = annual_contributions * (self.inputs['investment_return'] / 100) / 2
+                contribution_returns = annual_contributions * investment_return / 2
                 
                 balance += annual_contributions + contribution_returns
-                year_data['Yearly Investment Return'] = round(annual_return + contribution_returns, 2)
+                values['Yearly Investment Return'][i] = round(annual_return + contribution_returns, 2)
             
             # Retirement income calculations
             if age >= retirement_age:
                 # Calculate 4% rule amount for this year (inflated from baseline)
-                years_in_retirement = age - retirement_age
-                four_percent_amount = four_percent_baseline * ((1 + self.inputs['yearly_inflation'] / 100) ** years_in_retirement)
-                year_data['4% Rule Amount'] = round(four_percent_amount, 2)
-                
-                # Calculate required income with inflation
-                # ISSUE 7 FIX: Required income is entered in TODAY'S dollars, so inflate from current age to this age
-                # This gives consistent purchasing power throughout retirement
-                years_from_now = age - current_age
-                
-                if self.inputs['inflation_adjustment_enabled']:
-                    required_income = self.inputs['retirement_year_one_income'] * ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_now)
-                else:
-                    # If inflation adjustment disabled, still need to inflate to retirement year, then hold constant
-                    years_until_retirement = retirement_age - current_age
-                    required_income = self.inputs['retirement_year_one_income'] * ((1 + self.inputs['yearly_inflation'] / 100) ** years_until_retirement)
+                four_percent_amount = four_percent_baseline * four_percent_factors[i]
+                values['4% Rule Amount'][i] = round(four_percent_amount, 2)
                 
-                # Apply age-based reductions
-                age_77_threshold = self.inputs.get('age_77_threshold', 77)
-                age_83_threshold = self.inputs.get('age_83_threshold', 83)
-                reduction_1_enabled = self.inputs.get('reduction_1_enabled', True)
-                reduction_2_enabled = self.inputs.get('reduction_2_enabled', True)
-                
-                if reduction_1_enabled and age >= age_77_threshold:
-                    required_income *= (1 - self.inputs['age_77_reduction'] / 100)
-                if reduction_2_enabled and age >= age_83_threshold:
-                    required_income *= (1 - self.inputs['age_83_reduction'] / 100)
+                # Required income (today's dollars inflated to this age, after age-based reductions)
+                required_income = required_incomes[i]
                 
                 # Part-time work income
-                # ISSUE 6 FIX: Add inflation adjustment for part-time income
-                if age >= self.inputs.get('part_time_start_age', retirement_age) and age <= self.inputs['part_time_end_age']:
-                    part_time = self.inputs['part_time_income']
-                    if self.inputs.get('part_time_inflation_adjusted', False):
-                        years_since_part_time_start = age - self.inputs.get('part_time_start_age', retirement_age)
-                        part_time *= ((1 + self.inputs['yearly_inflation'] / 100) ** years_since_part_time_start)
-                    year_data['Part-Time Income'] = round(part_time, 2)
-                else:
-                    part_time = 0
-                
-                # Old Age Security (OAS) - Person 1
-                # OAS amount is entered in today's dollars, so inflate from current age
-                oas_p1 = 0
-                if age >= self.inputs.get('oas_start_age', 65):
-                    oas_p1 = self.inputs.get('monthly_oas', 0)
-                    if self.inputs.get('oas_inflation_adjusted', True):
-                        # Inflate from current age to this age
-                        years_from_now = age - current_age
-                        oas_p1 *= ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_now)
-                
-                # Old Age Security (OAS) - Person 2
-                oas_p2 = 0
-                if age >= self.inputs.get('oas_start_age_p2', 999):
-                    oas_p2 = self.inputs.get('monthly_oas_p2', 0)
-                    if self.inputs.get('oas_inflation_adjusted_p2', True):
-                        # Inflate from current age to this age
-                        years_from_now = age - current_age
-                        oas_p2 *= ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_now)
-                
-                # Total OAS before clawback
-                oas = oas_p1 + oas_p2
-                oas_before_clawback = oas
-                
-                # Store individual OAS amounts
-                year_data['OAS P1'] = round(oas_p1, 2)
-                year_data['OAS P2'] = round(oas_p2, 2)
-                
-                # Canada Pension Plan (CPP) - Person 1
-                # CPP amount is entered in today's dollars, so inflate from current age
-                cpp_p1 = 0
-                if age >= self.inputs.get('cpp_start_age', 65):
-                    cpp_p1 = self.inputs.get('monthly_cpp', 0)
-                    if self.inputs.get('cpp_inflation_adjusted', True):
-                        # Inflate from current age to this age
-                        years_from_now = age - current_age
-                        cpp_p1 *= ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_now)
-                
-                # Canada Pension Plan (CPP) - Person 2
-                cpp_p2 = 0
-                if age >= self.inputs.get('cpp_start_age_p2', 999):
-                    cpp_p2 = self.inputs.get('monthly_cpp_p2', 0)
-                    if self.inputs.get('cpp_inflation_adjusted_p2', True):
-                        # Inflate from current age to this age
-                        years_from_now = age - current_age
-                        cpp_p2 *= ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_now)
-                
-                # Total CPP
-                cpp = cpp_p1 + cpp_p2
-                year_data['CPP'] = round(cpp, 2)
-                year_data['CPP P1'] = round(cpp_p1, 2)
-                year_data['CPP P2'] = round(cpp_p2, 2)
-                
-                # Employer/Private pension - Person 1
-                employer_pension_p1 = 0
-                if age >= self.inputs.get('private_pension_start_age', 999):
-                    employer_pension_p1 = self.inputs.get('monthly_private_pension', 0)
-                    if self.inputs.get('private_pension_inflation_adjusted', False):
-                        # Inflate from current age to this age
-                        years_from_now = age - current_age
-                        employer_pension_p1 *= ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_now)
-                
-                # Add bridged amount for Person 1 if applicable
-                if self.inputs.get('bridged_enabled_p1', False):
-                    bridged_start = self.inputs.get('bridged_start_age_p1', 999)
-                    bridged_end = self.inputs.get('bridged_end_age_p1', 999)
-                    if bridged_start <= age <= bridged_end:
-                        bridged_amount = self.inputs.get('bridged_amount_p1', 0)
-                        if self.inputs.get('private_pension_inflation_adjusted', False):
-                            # Inflate bridged amount same as main pension
-                            years_from_now = age - current_age
-                            bridged_amount *= ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_now)
-                        employer_pension_p1 += bridged_amount
-                
-                # Employer/Private pension - Person 2
-                employer_pension_p2 = 0
-                if age >= self.inputs.get('private_pension_start_age_p2', 999):
-                    employer_pension_p2 = self.inputs.get('monthly_private_pension_p2', 0)
-                    if self.inputs.get('private_pension_inflation_adjusted_p2', False):
-                        # Inflate from current age to this age
-                        years_from_now = age - current_age
-                        employer_pension_p2 *= ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_now)
-                
-                # Add bridged amount for Person 2 if applicable
-                if self.inputs.get('bridged_enabled_p2', False):
-                    bridged_start = self.inputs.get('bridged_start_age_p2', 999)
-                    bridged_end = self.inputs.get('bridged_end_age_p2', 999)
-                    if bridged_start <= age <= bridged_end:
-                        bridged_amount = self.inputs.get('bridged_amount_p2', 0)
-                        if self.inputs.get('private_pension_inflation_adjusted_p2', False):
-                            # Inflate bridged amount same as main pension
-                            years_from_now = age - current_age
-                            bridged_amount *= ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_now)
-                        employer_pension_p2 += bridged_amount
-                
-                # Total Employer Pension
-                employer_pension = employer_pension_p1 + employer_pension_p2
-                year_data['Employer Pension'] = round(employer_pension, 2)
-                year_data['Employer Pension P1'] = round(employer_pension_p1, 2)
-                year_data['Employer Pension P2'] = round(employer_pension_p2, 2)
+                part_time = part_times[i]
+                if part_time:
+                    values['Part-Time Income'][i] = round(part_time, 2)
+                
+                # Old Age Security (OAS) - Person 1 and Person 2, total before clawback
+                oas_before_clawback = oas_totals[i]
+                values['OAS P1'][i] = round(oas_p1s[i], 2)
+                values['OAS P2'][i] = round(oas_p2s[i], 2)
+                
+                # Canada Pension Plan (CPP) - Person 1 and Person 2
+                cpp = cpp_totals[i]
+                values['CPP'][i] = round(cpp, 2)
+                values['CPP P1'][i] = round(cpp_p1s[i], 2)
+                values['CPP P2'][i] = round(cpp_p2s[i], 2)
+                
+                # Employer/Private pension (including bridged amounts) - Person 1 and Person 2
+                employer_pension = employer_totals[i]
+                values['Employer Pension'][i] = round(employer_pension, 2)
+                values['Employer Pension P1'][i] = round(employer_p1s[i], 2)
+                values['Employer Pension P2'][i] = round(employer_p2s[i], 2)
                 
                 # Total pension (OAS + CPP + Employer) - will be adjusted for OAS clawback later
                 total_pension_before_clawback = oas_before_clawback + cpp + employer_pension
                 
                 # Add required income column (what you need each month with inflation)
-                year_data['Required Income'] = round(required_income, 2)
+                values['Required Income'][i] = round(required_income, 2)
                 
                 # STEP 1: Calculate initial investment withdrawal needed (before considering clawback)
                 monthly_from_other = part_time + total_pension_before_clawback
@@ -265,13 +253,9 @@ class RetirementCalculator:
                 # Skip clawback if ignore_oas_clawback is enabled (income splitting scenario)
                 oas_clawback_monthly = 0
                 
-                if not self.inputs.get('ignore_oas_clawback', False):
-                    OAS_CLAWBACK_THRESHOLD_2026 = 95323
-                    OAS_CLAWBACK_RATE = 0.15
-                    
-                    # Inflate threshold from 2026 to current year
-                    years_from_2026 = age - current_age  # Years from now (2026 is current year)
-                    oas_threshold_this_year = OAS_CLAWBACK_THRESHOLD_2026 * ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_2026)
+                if not schedule.ignore_oas_clawback:
+                    # Threshold inflated from 2026 (the current year) to this age
+                    oas_threshold_this_year = oas_thresholds[i]
                     
                     # Calculate total annual income for clawback purposes
                     annual_income = (monthly_from_other + monthly_withdrawal) * 12
@@ -285,11 +269,11 @@ class RetirementCalculator:
                         annual_clawback = min(annual_clawback, max_clawback)
                         oas_clawback_monthly = annual_clawback / 12
                 
-                year_data['OAS Clawback'] = round(oas_clawback_monthly, 2)
+                values['OAS Clawback'][i] = round(oas_clawback_monthly, 2)
                 
                 # Calculate OAS after clawback for display in OAS column
                 oas_after_clawback = max(0, oas_before_clawback - oas_clawback_monthly)
-                year_data['OAS'] = round(oas_after_clawback, 2)
+                values['OAS'][i] = round(oas_after_clawback, 2)
                 
                 # STEP 3: If clawback creates a shortfall, withdraw additional funds from investments
                 if oas_clawback_monthly > 0:
@@ -313,29 +297,29 @@ class RetirementCalculator:
                 actual_annual_withdrawal = monthly_withdrawal * 12
                 balance -= actual_annual_withdrawal
                 
-                year_data['Investment Withdrawal'] = round(monthly_withdrawal, 2)
+                values['Investment Withdrawal'][i] = round(monthly_withdrawal, 2)
                 
                 # Calculate how far off from 4% rule (based on what was actually withdrawn)
-                year_data['Withdrawal vs 4% Rule'] = round(monthly_withdrawal - four_percent_amount, 2)
+                values['Withdrawal vs 4% Rule'][i] = round(monthly_withdrawal - four_percent_amount, 2)
                 if four_percent_amount > 0:
-                    year_data['% Over 4% Rule'] = round(((monthly_withdrawal - four_percent_amount) / four_percent_amount) * 100, 1)
+                    values['% Over 4% Rule'][i] = round(((monthly_withdrawal - four_percent_amount) / four_percent_amount) * 100, 1)
                 
                 # STEP 5: Calculate Monthly Pension (total of all pensions after OAS clawback)
                 # OAS is reduced by clawback, CPP and Employer pension are not affected
                 # Note: oas_after_clawback is already calculated above
                 total_pension_after_clawback = oas_after_clawback + cpp + employer_pension
-                year_data['Monthly Pension'] = round(total_pension_after_clawback, 2)
-                year_data['Yearly Pension Amount'] = round(total_pension_after_clawback * 12, 2)
+                values['Monthly Pension'][i] = round(total_pension_after_clawback, 2)
+                values['Yearly Pension Amount'][i] = round(total_pension_after_clawback * 12, 2)
                 
                 # STEP 6: Calculate final Total Monthly Income (after clawback)
                 # Total Monthly Income = Part-Time + Monthly Pension (after clawback) + Investment Withdrawal
                 final_total_monthly_income = part_time + total_pension_after_clawback + monthly_withdrawal
-                year_data['Total Monthly Income'] = round(final_total_monthly_income, 2)
+                values['Total Monthly Income'][i] = round(final_total_monthly_income, 2)
                 
                 # Calculate monthly shortfall (only show if positive = shortfall exists)
                 effective_income = part_time + total_pension_after_clawback + monthly_withdrawal
                 monthly_shortfall = required_income - effective_income
-                year_data['Monthly Shortfall'] = round(monthly_shortfall, 2) if monthly_shortfall > 0 else 0
+                values['Monthly Shortfall'][i] = round(monthly_shortfall, 2) if monthly_shortfall > 0 else 0
                 
                 # STEP 7: Calculate and reinvest surplus if income exceeds required
                 monthly_surplus = 0
@@ -343,36 +327,36 @@ class RetirementCalculator:
                     monthly_surplus = effective_income - required_income
                     annual_surplus = monthly_surplus * 12
                     balance += annual_surplus  # Reinvest surplus back into investments
-                    year_data['Monthly Surplus'] = round(monthly_surplus, 2)
-                    year_data['Surplus Reinvested'] = round(annual_surplus, 2)
+                    values['Monthly Surplus'][i] = round(monthly_surplus, 2)
+                    values['Surplus Reinvested'][i] = round(annual_surplus, 2)
                 
                 # Calculate income in today's dollars (deflate by inflation)
-                years_from_now = age - current_age
-                inflation_factor = (1 + self.inputs['yearly_inflation'] / 100) ** years_from_now
-                income_todays_dollars = effective_income / inflation_factor
-                year_data['Income (Today\'s $)'] = round(income_todays_dollars, 2)
+                income_todays_dollars = effective_income / inflation_factors[i]
+                values['Income (Today\'s $)'][i] = round(income_todays_dollars, 2)
                 
                 # Calculate returns on balance AFTER withdrawals and surplus reinvestment
-                annual_return = balance * (self.inputs['investment_return'] / 100)
+                annual_return = balance * investment_return
                 balance += annual_return
-                year_data['Yearly Investment Return'] = round(annual_return, 2)
+                values['Yearly Investment Return'][i] = round(annual_return, 2)
             else:
                 # Before retirement, add returns and contributions
                 balance += annual_return
-                year_data['Yearly Investment Return'] = round(annual_return, 2)
-            
-            year_data['Investment Balance End'] = round(max(0, balance), 2)
-            projection.append(year_data)
+                values['Yearly Investment Return'][i] = round(annual_return, 2)
             
             # Update balance for next year
-            balance = year_data['Investment Balance End']
+            balance = round(max(0, balance), 2)
+            values['Investment Balance End'][i] = balance
         
         # Calculate summary statistics
-        total_withdrawals = sum(row['Investment Withdrawal'] * 12 for row in projection)
-        total_pension = sum(row['Yearly Pension Amount'] for row in projection)
-        total_lump_sums = sum(row['Lump Sum'] for row in projection)
-        total_lump_withdrawals = sum(row['Lump Sum Withdrawal'] for row in projection)
-        final_balance = projection[-1]['Investment Balance End']
+        total_withdrawals = sum(withdrawal * 12 for withdrawal in values['Investment Withdrawal'])
+        total_pension = sum(values['Yearly Pension Amount'])
+        total_lump_sums = sum(values['Lump Sum'])
+        total_lump_withdrawals = sum(values['Lump Sum Withdrawal'])
+        final_balance = values['Investment Balance End'][-1]
+        
+        projection = Projection({name: np.array(column, dtype=np.int64 if name == 'Age' else float)
+                                 for name, column in values.items()})
+        self.checkpoint = CalculationCheckpoint(schedule, values, balances, four_percent_baselines)
         
         # Generate advice
         advice = self._generate_advice(projection)
@@ -384,7 +368,9 @@ class RetirementCalculator:
             'total_lump_sums': total_lump_sums,
             'total_lump_withdrawals': total_lump_withdrawals,
             'final_balance': final_balance,
-            'advice': advice
+            'advice': advice,
+            # Age the projection was recomputed from, when an earlier calculation's checkpoint was reused
+            'resumed_from_age': ages[start_index] if start_index and start_index < len(ages) else None,
         }
     
     def _generate_advice(self, projection):
@@ -392,26 +378,26 @@ class RetirementCalculator:
         advice_parts = []
         
         # Get account balances
-        tfsa = self.inputs.get('tfsa', 0)
-        rrsp = self.inputs.get('rrsp', 0)
-        non_registered = self.inputs.get('non_registered', 0)
-        lira = self.inputs.get('lira', 0)
+        tfsa = self.inputs.tfsa
+        rrsp = self.inputs.rrsp
+        non_registered = self.inputs.non_registered
+        lira = self.inputs.lira
         total = tfsa + rrsp + non_registered + lira
         
-        retirement_age = self.inputs['retirement_age']
-        current_age = self.inputs['current_age']
+        retirement_age = self.inputs.retirement_age
+        current_age = self.inputs.current_age
         
-        # Analyze projection data for detailed insights
-        retirement_rows = [r for r in projection if r['Age'] >= retirement_age]
+        # Analyze projection data for detailed insights (straight from the columns, as Python numbers)
+        ages = projection['Age'].tolist()
+        balance_starts = projection['Investment Balance Start'].tolist()
+        withdrawals = projection['Investment Withdrawal'].tolist()
+        over_four_percent = projection['% Over 4% Rule'].tolist()
+        retirement_years = [i for i, age in enumerate(ages) if age >= retirement_age]
         
         # Check if running out of money
-        depleted = False
-        depletion_age = None
-        for row in projection:
-            if row['Investment Balance End'] <= 0 and row['Age'] < 100:
-                depleted = True
-                depletion_age = row['Age']
-                break
+        depleted_years = np.flatnonzero((projection['Investment Balance End'] <= 0) & (projection['Age'] < 100))
+        depleted = len(depleted_years) > 0
+        depletion_age = ages[depleted_years[0]] if depleted else None
         
         if depleted:
             advice_parts.append(f"### ⚠️ Critical: Funding Shortfall Detected\n")
@@ -419,7 +405,7 @@ class RetirementCalculator:
             
             # Calculate how much needs to change
             years_short = 100 - depletion_age
-            current_monthly = self.inputs['retirement_year_one_income']
+            current_monthly = self.inputs.retirement_year_one_income
             
             advice_parts.append(f"**Immediate Actions Required:**\n\n")
             advice_parts.append(f"**Option 1: Reduce Retirement Spending**\n")
@@ -429,32 +415,32 @@ class RetirementCalculator:
             
             advice_parts.append(f"**Option 2: Delay Retirement**\n")
             advice_parts.append(f"- Current plan: Retire at {retirement_age}\n")
-            advice_parts.append(f"- Working until {retirement_age + 2} adds ~${self.inputs['monthly_investments'] * 24:,.0f} to portfolio\n")
-            advice_parts.append(f"- Working until {retirement_age + 3} adds ~${self.inputs['monthly_investments'] * 36:,.0f} to portfolio\n\n")
+            advice_parts.append(f"- Working until {retirement_age + 2} adds ~${self.inputs.monthly_investments * 24:,.0f} to portfolio\n")
+            advice_parts.append(f"- Working until {retirement_age + 3} adds ~${self.inputs.monthly_investments * 36:,.0f} to portfolio\n\n")
             
             if current_age < retirement_age:
                 advice_parts.append(f"**Option 3: Increase Current Savings**\n")
-                current_savings = self.inputs.get('monthly_investments', 0)
+                current_savings = self.inputs.monthly_investments
                 years_to_retirement = retirement_age - current_age
                 advice_parts.append(f"- Current: ${current_savings:,.0f}/month\n")
                 advice_parts.append(f"- Increase by $500/month = ${500 * 12 * years_to_retirement:,.0f} more by retirement\n")
                 advice_parts.append(f"- Increase by $1,000/month = ${1000 * 12 * years_to_retirement:,.0f} more by retirement\n\n")
             
             advice_parts.append(f"**Option 4: Extend Part-Time Work**\n")
-            part_time = self.inputs.get('part_time_income', 0)
-            part_time_end = self.inputs.get('part_time_end_age', 65)
+            part_time = self.inputs.part_time_income
+            part_time_end = self.inputs.part_time_end_age
             advice_parts.append(f"- Current part-time income: ${part_time:,.0f}/month until age {part_time_end}\n")
             advice_parts.append(f"- Extending to age {part_time_end + 3} reduces portfolio withdrawals by ${part_time * 12 * 3:,.0f}\n")
             advice_parts.append(f"- Extending to age {part_time_end + 5} reduces portfolio withdrawals by ${part_time * 12 * 5:,.0f}\n\n")
         else:
-            final_balance = projection[-1]['Investment Balance End']
+            final_balance = projection['Investment Balance End'][-1].item()
             advice_parts.append(f"### ✅ Plan Sustainability\n")
             advice_parts.append(f"Your plan is sustainable with a projected balance of **${final_balance:,.0f}** at age 100.\n\n")
             
             # Analyze balance trajectory
-            retirement_start_balance = next((r['Investment Balance Start'] for r in projection if r['Age'] == retirement_age), 0)
-            age_75_balance = next((r['Investment Balance Start'] for r in projection if r['Age'] == 75), 0)
-            age_85_balance = next((r['Investment Balance Start'] for r in projection if r['Age'] == 85), 0)
+            retirement_start_balance = projection.at_age(retirement_age, 'Investment Balance Start', 0)
+            age_75_balance = projection.at_age(75, 'Investment Balance Start', 0)
+            age_85_balance = projection.at_age(85, 'Investment Balance Start', 0)
             
             advice_parts.append(f"**Balance Trajectory:**\n")
             advice_parts.append(f"- Age {retirement_age} (retirement): ${retirement_start_balance:,.0f}\n")
@@ -477,24 +463,24 @@ class RetirementCalculator:
                 )
         
         # Analyze 4% rule compliance
-        if retirement_rows:
-            violations = [r for r in retirement_rows if r['% Over 4% Rule'] > 0]
+        if retirement_years:
+            violations = [i for i in retirement_years if over_four_percent[i] > 0]
             
             if violations:
                 advice_parts.append(f"### ⚠️ Withdrawal Rate Analysis\n")
                 advice_parts.append(
                     f"Your plan **exceeds the 4% safe withdrawal rule** in {len(violations)} years "
-                    f"({len(violations) / len(retirement_rows) * 100:.0f}% of retirement).\n\n"
+                    f"({len(violations) / len(retirement_years) * 100:.0f}% of retirement).\n\n"
                 )
                 
                 # Find worst violations
-                worst_violations = sorted(violations, key=lambda x: x['% Over 4% Rule'], reverse=True)[:3]
+                worst_violations = sorted(violations, key=lambda i: over_four_percent[i], reverse=True)[:3]
                 advice_parts.append(f"**Highest withdrawal rates:**\n")
-                for v in worst_violations:
-                    withdrawal_rate = (v['Investment Withdrawal'] * 12 / v['Investment Balance Start'] * 100) if v['Investment Balance Start'] > 0 else 0
+                for i in worst_violations:
+                    withdrawal_rate = (withdrawals[i] * 12 / balance_starts[i] * 100) if balance_starts[i] > 0 else 0
                     advice_parts.append(
-                        f"- Age {v['Age']}: ${v['Investment Withdrawal']:,.0f}/month "
-                        f"({withdrawal_rate:.2f}% annual rate, {v['% Over 4% Rule']:.1f}% over safe limit)\n"
+                        f"- Age {ages[i]}: ${withdrawals[i]:,.0f}/month "
+                        f"({withdrawal_rate:.2f}% annual rate, {over_four_percent[i]:.1f}% over safe limit)\n"
                     )
                 
                 advice_parts.append(
@@ -504,9 +490,9 @@ class RetirementCalculator:
                 
                 # Calculate average withdrawal rate
                 avg_rate = sum(
-                    (r['Investment Withdrawal'] * 12 / r['Investment Balance Start'] * 100) 
-                    for r in retirement_rows if r['Investment Balance Start'] > 0 and r['Investment Withdrawal'] > 0
-                ) / len([r for r in retirement_rows if r['Investment Withdrawal'] > 0])
+                    (withdrawals[i] * 12 / balance_starts[i] * 100)
+                    for i in retirement_years if balance_starts[i] > 0 and withdrawals[i] > 0
+                ) / len([i for i in retirement_years if withdrawals[i] > 0])
                 
                 advice_parts.append(f"**Your average withdrawal rate:** {avg_rate:.2f}% annually\n")
                 
@@ -647,7 +633,7 @@ class RetirementCalculator:
         
         # Current age allocation
         if years_to_retirement > 10:
-            current_equity = min(90, 110 - current_age)
+            current_equity = target_equity_percent(current_age, retirement_age)
             current_bonds = 100 - current_equity
             advice_parts.append(f"**TODAY (Age {current_age}, {years_to_retirement} years to retirement):**")
             advice_parts.append(f"- Equities: {current_equity}% (${total * current_equity / 100:,.0f})")
@@ -657,7 +643,7 @@ class RetirementCalculator:
         # 10 years before retirement
         if years_to_retirement >= 10:
             age_minus_10 = retirement_age - 10
-            equity_minus_10 = min(80, 110 - age_minus_10)
+            equity_minus_10 = target_equity_percent(age_minus_10, retirement_age)
             bonds_minus_10 = 100 - equity_minus_10
             
             # Project portfolio value 10 years before retirement
@@ -665,8 +651,8 @@ class RetirementCalculator:
             if years_until > 0:
                 projected_balance = total
                 for _ in range(years_until):
-                    projected_balance += self.inputs['monthly_investments'] * 12
-                    projected_balance *= (1 + self.inputs['investment_return'] / 100)
+                    projected_balance += self.inputs.monthly_investments * 12
+                    projected_balance *= (1 + self.inputs.return_rate)
                 
                 advice_parts.append(f"**AGE {age_minus_10} (10 years before retirement):**")
                 advice_parts.append(f"- Projected Portfolio: ${projected_balance:,.0f}")
@@ -679,15 +665,15 @@ class RetirementCalculator:
         # 5 years before retirement
         if years_to_retirement >= 5:
             age_minus_5 = retirement_age - 5
-            equity_minus_5 = min(70, 110 - age_minus_5)
+            equity_minus_5 = target_equity_percent(age_minus_5, retirement_age)
             bonds_minus_5 = 100 - equity_minus_5
             
             years_until = age_minus_5 - current_age
             if years_until > 0:
                 projected_balance = total
                 for _ in range(years_until):
-                    projected_balance += self.inputs['monthly_investments'] * 12
-                    projected_balance *= (1 + self.inputs['investment_return'] / 100)
+                    projected_balance += self.inputs.monthly_investments * 12
+                    projected_balance *= (1 + self.inputs.return_rate)
                 
                 advice_parts.append(f"**AGE {age_minus_5} (5 years before retirement):**")
                 advice_parts.append(f"- Projected Portfolio: ${projected_balance:,.0f}")
@@ -695,11 +681,11 @@ class RetirementCalculator:
                 advice_parts.append(f"  - Equities: ${projected_balance * equity_minus_5 / 100:,.0f}")
                 advice_parts.append(f"  - Bonds: ${projected_balance * bonds_minus_5 / 100:,.0f}")
                 advice_parts.append(f"- Action: Accelerate bond allocation, build 2-year cash reserve")
-                advice_parts.append(f"- Cash Reserve Target: ${self.inputs['retirement_year_one_income'] * 24:,.0f} (2 years expenses)\n")
+                advice_parts.append(f"- Cash Reserve Target: ${self.inputs.retirement_year_one_income * 24:,.0f} (2 years expenses)\n")
         
         # At retirement
-        retirement_balance = next((r['Investment Balance Start'] for r in projection if r['Age'] == retirement_age), total)
-        equity_at_retirement = max(40, min(60, 110 - retirement_age))
+        retirement_balance = projection.at_age(retirement_age, 'Investment Balance Start', total)
+        equity_at_retirement = target_equity_percent(retirement_age, retirement_age, retirement_day=True)
         bonds_at_retirement = 100 - equity_at_retirement
         
         advice_parts.append(f"**AGE {retirement_age} (RETIREMENT DAY):**")
@@ -707,12 +693,12 @@ class RetirementCalculator:
         advice_parts.append(f"- Target Allocation: {equity_at_retirement}% equities / {bonds_at_retirement}% bonds")
         advice_parts.append(f"  - Equities: ${retirement_balance * equity_at_retirement / 100:,.0f}")
         advice_parts.append(f"  - Bonds: ${retirement_balance * bonds_at_retirement / 100:,.0f}")
-        advice_parts.append(f"- Cash Reserve: ${self.inputs['retirement_year_one_income'] * 24:,.0f} (2 years)")
+        advice_parts.append(f"- Cash Reserve: ${self.inputs.retirement_year_one_income * 24:,.0f} (2 years)")
         advice_parts.append(f"- Strategy: Maintain growth potential while protecting principal\n")
         
         # Age 70 (CPP/OAS typically start)
-        age_70_balance = next((r['Investment Balance Start'] for r in projection if r['Age'] == 70), retirement_balance)
-        equity_70 = max(35, min(50, 110 - 70))
+        age_70_balance = projection.at_age(70, 'Investment Balance Start', retirement_balance)
+        equity_70 = target_equity_percent(70, retirement_age)
         bonds_70 = 100 - equity_70
         
         advice_parts.append(f"**AGE 70 (CPP/OAS Income Begins):**")
@@ -724,8 +710,8 @@ class RetirementCalculator:
         advice_parts.append(f"- Action: Can maintain higher equity allocation with guaranteed income floor\n")
         
         # Age 75 (RRIF minimum withdrawals)
-        age_75_balance = next((r['Investment Balance Start'] for r in projection if r['Age'] == 75), age_70_balance)
-        equity_75 = max(30, min(45, 110 - 75))
+        age_75_balance = projection.at_age(75, 'Investment Balance Start', age_70_balance)
+        equity_75 = target_equity_percent(75, retirement_age)
         bonds_75 = 100 - equity_75
         
         advice_parts.append(f"**AGE 75 (RRIF Minimum Withdrawals):**")
@@ -737,8 +723,8 @@ class RetirementCalculator:
         advice_parts.append(f"- Strategy: Balance mandatory withdrawals with longevity risk\n")
         
         # Age 85 (Late retirement)
-        age_85_balance = next((r['Investment Balance Start'] for r in projection if r['Age'] == 85), age_75_balance)
-        equity_85 = max(25, min(35, 110 - 85))
+        age_85_balance = projection.at_age(85, 'Investment Balance Start', age_75_balance)
+        equity_85 = target_equity_percent(85, retirement_age)
         bonds_85 = 100 - equity_85
         
         advice_parts.append(f"**AGE 85 (Late Retirement Phase):**")
@@ -820,7 +806,7 @@ class RetirementCalculator:
         
         if years_to_retirement > 5:
             advice_parts.append(f"**{retirement_age - 5} (5 years out):**")
-            advice_parts.append(f"- Build 2-year cash reserve: ${self.inputs['retirement_year_one_income'] * 24:,.0f}")
+            advice_parts.append(f"- Build 2-year cash reserve: ${self.inputs.retirement_year_one_income * 24:,.0f}")
             advice_parts.append(f"- Accelerate bond allocation to target {bonds_at_retirement}%")
             advice_parts.append(f"- Review CPP/OAS start age strategy (60-70 for CPP, 65-70 for OAS)")
             advice_parts.append(f"- Consolidate accounts for easier management\n")
@@ -855,3 +841,163 @@ class RetirementCalculator:
         advice_parts.append("- Protection: Equities, real return bonds, indexed pensions\n")
         
         return "\n".join(advice_parts)
+
+
+def _round_cents(values):
+    """Round to the cent exactly as Python's round(x, 2) does, which np.round can miss at half-cents"""
+    cents = values * 100
+    rounded = np.rint(cents) / 100
+    # Scaling by 100 can push a value across (or onto) a half-cent: round those few the exact way
+    near_half = np.abs(np.abs(cents - np.trunc(cents)) - 0.5) <= 1e-15 * np.abs(cents) + 1e-9
+    if near_half.any():
+        rounded[near_half] = [round(value, 2) for value in values[near_half].tolist()]
+    return rounded
+
+
+# Per-age schedule arrays calculate_batch stacks into (variants x ages) matrices
+_BATCH_SCHEDULE_ARRAYS = ('lump_in', 'lump_out', 'monthly_investment', 'part_time', 'oas', 'cpp',
+                          'employer_pension', 'oas_clawback_threshold', 'retired')
+
+
+def calculate_batch(plans, **parameters):
+    """
+    Deterministic projections of many plan variants at once, stepped age by age as
+    (variants x ages) arrays with the same withdrawal capping, two-step OAS clawback, surplus
+    reinvestment and cent rounding as RetirementCalculator.calculate().
+
+    plans is either a list of plans (PlanInputs or inputs dicts), or one base plan with equal-length
+    arrays (or scalars) of input values as keyword arguments - e.g. retirement_year_one_income=[...],
+    retirement_age=[...] - one variant per position. All variants share the same current age.
+    Schedules are compiled once per distinct plan apart from retirement_year_one_income, which
+    only scales required income.
+
+    Returns (variants x ages) 'balance_start', 'balance_end', 'withdrawal', 'oas_clawback',
+    'total_monthly_income' and 'shortfall' (monthly amounts), per-variant 'final_balance',
+    'depletion_age' (0 if the money lasts) and 'total_withdrawals', the (variants x ages)
+    'retired' mask and the shared 'ages'.
+    """
+    income_key = 'retirement_year_one_income'
+    if isinstance(plans, (dict, PlanInputs)):
+        base = compile_inputs(plans)
+        names = list(parameters)
+        columns = [column.tolist() for column in np.broadcast_arrays(*(np.atleast_1d(parameters[name])
+                                                                       for name in names))]
+        num_variants = len(columns[0]) if columns else 1
+        incomes = (columns[names.index(income_key)] if income_key in parameters
+                   else [base.retirement_year_one_income] * num_variants)
+        other = [i for i, name in enumerate(names) if name != income_key]
+        keys = list(zip(*(columns[i] for i in other))) if other else [()] * num_variants
+
+        def variant_inputs(key):
+            return base.replace(**{names[i]: value for i, value in zip(other, key)})
+    else:
+        if parameters:
+            raise ValueError("pass parameter arrays with a single base plan, not a list of plans")
+        plans = [compile_inputs(plan) for plan in plans]
+        num_variants = len(plans)
+        incomes = [plan.retirement_year_one_income for plan in plans]
+        # Plans are hashable, so the plan with its income zeroed identifies its schedule
+        keys = [plan.replace(retirement_year_one_income=0.0) for plan in plans]
+
+        def variant_inputs(key):
+            return key
+
+    # One schedule per distinct plan (apart from spending), rows broadcast to its variants
+    groups = {}
+    for j, key in enumerate(keys):
+        groups.setdefault(key, []).append(j)
+    incomes = np.asarray(incomes, dtype=float)
+    arrays, ages = {}, None
+    initial_balance = np.empty(num_variants)
+    investment_return = np.empty(num_variants)
+    ignore_clawback = np.zeros(num_variants, dtype=bool)
+    for key, members in groups.items():
+        schedule = compile_cash_flows(variant_inputs(key))
+        if ages is None:
+            ages = schedule.ages
+            arrays = {name: np.empty((num_variants, len(ages)), dtype=getattr(schedule, name).dtype)
+                      for name in _BATCH_SCHEDULE_ARRAYS}
+            arrays['required_income'] = np.empty((num_variants, len(ages)))
+        elif len(schedule.ages) != len(ages) or schedule.current_age != ages[0]:
+            raise ValueError("all plan variants must share the same current_age")
+        for name in _BATCH_SCHEDULE_ARRAYS:
+            arrays[name][members] = getattr(schedule, name)
+        arrays['required_income'][members] = schedule.required_incomes(incomes[members])
+        initial_balance[members] = schedule.initial_balance
+        investment_return[members] = schedule.investment_return
+        ignore_clawback[members] = schedule.ignore_oas_clawback
+
+    shape = (num_variants, len(ages))
+    results = {name: np.zeros(shape) for name in ('balance_start', 'balance_end', 'withdrawal', 'oas_clawback',
+                                                  'total_monthly_income', 'shortfall')}
+    balance = initial_balance.copy()
+    for i in range(len(ages)):
+        balance = _round_cents(balance)
+        results['balance_start'][:, i] = balance
+        balance += arrays['lump_in'][:, i]
+        balance -= arrays['lump_out'][:, i]
+        # Before retirement: returns on the balance, contributions at mid-year
+        annual_contributions = arrays['monthly_investment'][:, i] * 12
+        working_balance = (balance + (annual_contributions + annual_contributions * investment_return / 2)
+                           + balance * investment_return)
+        
+        # In retirement: withdraw what other income doesn't cover, capped at the balance
+        required_income = arrays['required_income'][:, i]
+        part_time, oas = arrays['part_time'][:, i], arrays['oas'][:, i]
+        cpp, employer_pension = arrays['cpp'][:, i], arrays['employer_pension'][:, i]
+        monthly_from_other = part_time + (oas + cpp + employer_pension)
+        available = np.maximum(0, balance)
+        withdrawal = np.where(monthly_from_other < required_income,
+                              np.minimum((required_income - monthly_from_other) * 12, available) / 12, 0.0)
+        # OAS clawback on total income above the threshold, at most the whole OAS amount
+        excess_income = (monthly_from_other + withdrawal) * 12 - arrays['oas_clawback_threshold'][:, i]
+        clawback = np.where((excess_income > 0) & ~ignore_clawback,
+                            np.minimum(excess_income * OAS_CLAWBACK_RATE, oas * 12) / 12, 0.0)
+        # A clawback shortfall is withdrawn too, again capped at the balance
+        clawback_shortfall = required_income - (monthly_from_other - clawback + withdrawal)
+        withdrawal = withdrawal + np.where((clawback > 0) & (clawback_shortfall > 0),
+                                           np.minimum(clawback_shortfall * 12, available) / 12, 0.0)
+        retired_balance = balance - withdrawal * 12
+        income = part_time + (np.maximum(0, oas - clawback) + cpp + employer_pension) + withdrawal
+        # Surplus income is reinvested, then the remaining balance earns the year's return
+        retired_balance += np.maximum(income - required_income, 0) * 12
+        retired_balance += retired_balance * investment_return
+        
+        retired = arrays['retired'][:, i]
+        balance = _round_cents(np.maximum(0, np.where(retired, retired_balance, working_balance)))
+        results['balance_end'][:, i] = balance
+        results['withdrawal'][:, i] = np.where(retired, withdrawal, 0.0)
+        results['oas_clawback'][:, i] = np.where(retired, clawback, 0.0)
+        results['total_monthly_income'][:, i] = np.where(retired, income, 0.0)
+        results['shortfall'][:, i] = np.where(retired, np.maximum(required_income - income, 0), 0.0)
+
+    depleted = (results['balance_end'] <= 0) & (ages < 100)
+    results['ages'] = ages
+    results['retired'] = arrays['retired']
+    results['final_balance'] = results['balance_end'][:, -1]
+    results['depletion_age'] = np.where(depleted.any(axis=1), ages[np.argmax(depleted, axis=1)], 0)
+    results['total_withdrawals'] = results['withdrawal'].sum(axis=1) * 12
+    return results
+
+
+# Financial Health Score by the lowest balance through retirement (checked in order); 0 if the money runs out
+FINANCIAL_HEALTH_THRESHOLDS = ((1_600_000, 100), (1_200_000, 75), (500_000, 50), (-np.inf, 25))
+FINANCIAL_HEALTH_RATINGS = {100: "🟢 Excellent", 75: "🟡 Good", 50: "🟠 Fair", 25: "🔴 Poor", 0: "❌ Fail"}
+
+
+def financial_health_scores(batch):
+    """Financial Health Score (0-100) of every calculate_batch variant, scored as on the home page"""
+    retired, balance_end = batch['retired'], batch['balance_end']
+    shortfall = (retired & (balance_end <= 0) & (batch['ages'] < 100)).any(axis=1)
+    min_balance = np.where(retired, balance_end, np.inf).min(axis=1)
+    scores = np.select([min_balance >= threshold for threshold, _ in FINANCIAL_HEALTH_THRESHOLDS],
+                       [score for _, score in FINANCIAL_HEALTH_THRESHOLDS])
+    scores[shortfall | ~retired.any(axis=1)] = 0
+    return scores
+
+
+def projection_health_score(ages, balance_end, retirement_age):
+    """Financial Health Score (0-100) of one projection from its ages and end-of-year balances"""
+    ages = np.asarray(ages)
+    batch = {'ages': ages, 'retired': (ages >= retirement_age)[None], 'balance_end': np.asarray(balance_end)[None]}
+    return int(financial_health_scores(batch)[0])
@@ -0,0 +1,250 @@
+"""Per-age cash-flow schedule compiled once from the plan inputs and shared by every engine"""
+import numpy as np
+from typing import Dict, Optional, Union
+
+from plan_inputs import MAX_AGE, PlanInputs, compile_inputs, lump_sum_array
+
+# OAS clawback threshold is $95,323 in 2026 (the current year), indexed to inflation annually
+OAS_CLAWBACK_THRESHOLD_2026 = 95323
+OAS_CLAWBACK_RATE = 0.15
+
+
+class _ConstantInflation:
+    """Price levels when inflation is the same every year (the plan's yearly_inflation)"""
+
+    def __init__(self, growth: float, current_age: int, ages: np.ndarray):
+        self.growth = growth
+        self.current_age = current_age
+        self.ages = ages
+        # Inflation factors from today ($ entered in today's dollars are inflated from current age)
+        self.levels = growth ** (ages - current_age)
+
+    def level_at(self, age: int):
+        """Price level at one age, relative to today"""
+        return self.growth ** (age - self.current_age)
+
+    def since(self, age: int):
+        """Price level at every age relative to the level at `age`"""
+        return self.growth ** (self.ages - age)
+
+
+class _PathInflation:
+    """
+    Per-path price levels from a (paths x years) matrix of yearly inflation rates,
+    compounded by cumulative product along the age axis. Ages outside the schedule
+    fall back to the plan's constant inflation rate.
+    """
+
+    def __init__(self, inflation: np.ndarray, growth: float, current_age: int, ages: np.ndarray):
+        self.growth = growth
+        self.current_age = current_age
+        self.ages = ages
+        # Level at index 0 (today) is 1; each year's inflation raises the next year's level
+        self.levels = np.ones_like(inflation)
+        np.cumprod(1 + inflation[:, :-1], axis=1, out=self.levels[:, 1:])
+
+    def level_at(self, age: int):
+        index = age - self.current_age
+        if index < 0:
+            return self.growth ** index
+        if index >= self.levels.shape[1]:
+            return self.levels[:, -1:] * self.growth ** (index - self.levels.shape[1] + 1)
+        return self.levels[:, index:index + 1]
+
+    def since(self, age: int):
+        return self.levels / self.level_at(age)
+
+
+class CashFlowSchedule:
+    """
+    Dense per-age arrays (index 0 = current age, last index = age 100) of every
+    deterministic quantity the engines need. Monthly amounts are nominal dollars
+    for that age; income sources are zero before retirement.
+    """
+
+    def __init__(self, inputs: PlanInputs, max_age: int = MAX_AGE):
+        self.inputs = inputs
+        self.current_age = inputs.current_age
+        self.retirement_age = inputs.retirement_age
+        self.max_age = max_age
+        self.investment_return = inputs.return_rate
+        self.initial_balance = inputs.total_investments
+        self.ignore_oas_clawback = inputs.ignore_oas_clawback
+
+        ages = np.arange(self.current_age, max_age + 1)
+        self.growth = 1 + inputs.inflation_rate
+
+        self.ages = ages
+        self.retired = ages >= self.retirement_age
+
+        prices = _ConstantInflation(self.growth, self.current_age, ages)
+        self.inflation_factor = prices.levels
+
+        # Lump sums in and out (at beginning of year, BEFORE returns), already by age up to MAX_AGE
+        if max_age == MAX_AGE:
+            self.lump_in, self.lump_out = inputs.lump_in, inputs.lump_out
+        else:
+            self.lump_in = lump_sum_array(inputs.lump_sums, self.current_age, max_age)
+            self.lump_out = lump_sum_array(inputs.lump_sum_withdrawals, self.current_age, max_age)
+
+        # Monthly investments (before retirement and before stop age)
+        contributing = ~self.retired & (ages <= inputs.stop_investments_age)
+        self.monthly_investment = np.where(contributing, inputs.monthly_investments, 0.0)
+        self.annual_contribution = self.monthly_investment * 12
+
+        flows = self._indexed_flows(prices)
+        self.required_income = flows['required_income']
+        self.part_time = flows['part_time']
+        self.oas_p1, self.oas_p2 = flows['oas_p1'], flows['oas_p2']
+        self.cpp_p1, self.cpp_p2 = flows['cpp_p1'], flows['cpp_p2']
+        self.employer_pension_p1 = flows['employer_pension_p1']
+        self.employer_pension_p2 = flows['employer_pension_p2']
+        self.oas = flows['oas']
+        self.cpp = flows['cpp']
+        self.employer_pension = flows['employer_pension']
+        self.pension_before_clawback = flows['pension_before_clawback']
+        self.other_income = flows['other_income']
+        self.net_withdrawal = flows['net_withdrawal']
+
+        # Clawback threshold and 4% rule amount, both indexed to inflation
+        self.oas_clawback_threshold = OAS_CLAWBACK_THRESHOLD_2026 * self.inflation_factor
+        self.four_percent_factor = prices.since(self.retirement_age)
+
+    def _indexed_flows(self, prices) -> Dict[str, np.ndarray]:
+        """
+        Every inflation-linked monthly amount (plus the annual net withdrawal) under the given
+        price levels - per-age arrays for constant inflation, (paths x years) for path inflation.
+        """
+        inputs = self.inputs
+        ages = self.ages
+        retired = self.retired
+        inflation_factor = prices.levels
+        flows = {'required_income': self._required_income(prices, inputs.retirement_year_one_income)}
+
+        # Part-time work income, optionally inflated from the year it starts
+        part_time_start = inputs.part_time_start_age
+        part_time = np.full(inflation_factor.shape, inputs.part_time_income)
+        if inputs.part_time_inflation_adjusted:
+            part_time = part_time * prices.since(part_time_start)
+        working = retired & (ages >= part_time_start) & (ages <= inputs.part_time_end_age)
+        flows['part_time'] = np.where(working, part_time, 0.0)
+
+        def pension(amount, start_age, indexed):
+            """Monthly pension stream from its start age, inflated from current age if indexed"""
+            amount = amount * (inflation_factor if indexed else 1)
+            return np.where(retired & (ages >= start_age), amount, 0.0)
+
+        def bridge(enabled, amount, start_age, end_age, indexed):
+            """Bridged pension top-up between its start and end ages"""
+            if not enabled:
+                return 0.0
+            amount = amount * (inflation_factor if indexed else 1)
+            return np.where(retired & (ages >= start_age) & (ages <= end_age), amount, 0.0)
+
+        # Government benefits - Person 1 and Person 2
+        flows['oas_p1'] = pension(inputs.monthly_oas, inputs.oas_start_age, inputs.oas_inflation_adjusted)
+        flows['oas_p2'] = pension(inputs.monthly_oas_p2, inputs.oas_start_age_p2, inputs.oas_inflation_adjusted_p2)
+        flows['cpp_p1'] = pension(inputs.monthly_cpp, inputs.cpp_start_age, inputs.cpp_inflation_adjusted)
+        flows['cpp_p2'] = pension(inputs.monthly_cpp_p2, inputs.cpp_start_age_p2, inputs.cpp_inflation_adjusted_p2)
+
+        # Employer/private pensions, including any bridged amount
+        flows['employer_pension_p1'] = pension(inputs.monthly_private_pension, inputs.private_pension_start_age,
+                                               inputs.private_pension_inflation_adjusted) \
+            + bridge(inputs.bridged_enabled_p1, inputs.bridged_amount_p1, inputs.bridged_start_age_p1,
+                     inputs.bridged_end_age_p1, inputs.private_pension_inflation_adjusted)
+        flows['employer_pension_p2'] = pension(inputs.monthly_private_pension_p2, inputs.private_pension_start_age_p2,
+                                               inputs.private_pension_inflation_adjusted_p2) \
+            + bridge(inputs.bridged_enabled_p2, inputs.bridged_amount_p2, inputs.bridged_start_age_p2,
+                     inputs.bridged_end_age_p2, inputs.private_pension_inflation_adjusted_p2)
+
+        flows['oas'] = flows['oas_p1'] + flows['oas_p2']
+        flows['cpp'] = flows['cpp_p1'] + flows['cpp_p2']
+        flows['employer_pension'] = flows['employer_pension_p1'] + flows['employer_pension_p2']
+
+        # Total monthly income from everything except investments (before OAS clawback)
+        flows['pension_before_clawback'] = flows['oas'] + flows['cpp'] + flows['employer_pension']
+        flows['other_income'] = flows['part_time'] + flows['pension_before_clawback']
+
+        # Annual amount the portfolio must fund when other income falls short
+        flows['net_withdrawal'] = np.maximum(flows['required_income'] - flows['other_income'], 0) * 12
+        return flows
+
+    def _required_income(self, prices, year_one_income) -> np.ndarray:
+        """Required monthly income at every age for a year-one income (a number, or a column of them)"""
+        inputs = self.inputs
+        ages = self.ages
+        inflation_factor = prices.levels
+
+        # Required income is entered in TODAY'S dollars, so inflate from current age to this age.
+        # If inflation adjustment is disabled, inflate to the retirement year, then hold constant.
+        if inputs.inflation_adjustment_enabled:
+            required_income = year_one_income * inflation_factor
+        else:
+            required_income = year_one_income * prices.level_at(self.retirement_age) \
+                * np.ones(inflation_factor.shape)
+
+        # Age-based reductions
+        if inputs.reduction_1_enabled:
+            required_income = required_income * np.where(
+                ages >= inputs.age_77_threshold, 1 - inputs.age_77_reduction / 100, 1)
+        if inputs.reduction_2_enabled:
+            required_income = required_income * np.where(
+                ages >= inputs.age_83_threshold, 1 - inputs.age_83_reduction / 100, 1)
+        return np.where(self.retired, required_income, 0.0)
+
+    def required_incomes(self, year_one_incomes: np.ndarray) -> np.ndarray:
+        """(plans x years) required monthly income for several year-one incomes under this schedule's inflation"""
+        prices = _ConstantInflation(self.growth, self.current_age, self.ages)
+        return self._required_income(prices, np.asarray(year_one_incomes, dtype=float)[:, None])
+
+    def withdrawals_under_inflation(self, inflation: np.ndarray) -> np.ndarray:
+        """
+        (paths x years) annual net withdrawals when each path has its own yearly inflation
+        rates (a (paths x years) matrix of fractions), re-indexing every inflation-linked flow.
+        """
+        prices = _PathInflation(inflation, self.growth, self.current_age, self.ages)
+        return self._indexed_flows(prices)['net_withdrawal']
+
+    def spending_flows(self, inflation: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Annual required income, annual other income and price level (relative to today) at every
+        age - per-age arrays, or (paths x years) under a matrix of per-path yearly inflation rates.
+        """
+        if inflation is None:
+            return {'required_income': self.required_income * 12, 'other_income': self.other_income * 12,
+                    'price_level': self.inflation_factor}
+        prices = _PathInflation(inflation, self.growth, self.current_age, self.ages)
+        flows = self._indexed_flows(prices)
+        return {'required_income': flows['required_income'] * 12, 'other_income': flows['other_income'] * 12,
+                'price_level': prices.levels}
+
+    def invested_balances(self, returns: np.ndarray) -> np.ndarray:
+        """
+        Balance earning each year's return along the deterministic path with the given per-year
+        returns, using the simulator's timing: mid-year contributions earn half a year, and in
+        retirement the withdrawal comes out first and a depleted balance earns nothing.
+        """
+        invested = np.zeros(len(self.ages))
+        balance = self.initial_balance
+        for i in range(len(self.ages)):
+            balance += self.lump_in[i] - self.lump_out[i]
+            if not self.retired[i]:
+                invested[i] = balance + self.annual_contribution[i] / 2
+                balance += balance * returns[i] + self.annual_contribution[i] * (1 + returns[i] / 2)
+            else:
+                balance -= self.net_withdrawal[i]
+                invested[i] = max(balance, 0.0)
+                balance += invested[i] * returns[i]
+        return invested
+
+    def __len__(self):
+        return len(self.ages)
+
+    def index_of(self, age: int) -> int:
+        """Array index for an age"""
+        return age - self.current_age
+
+
+def compile_cash_flows(inputs: Union[Dict, PlanInputs], max_age: int = MAX_AGE) -> CashFlowSchedule:
+    """Compile plan inputs (or an inputs dict) into a per-age cash-flow schedule"""
+    return CashFlowSchedule(compile_inputs(inputs), max_age=max_age)
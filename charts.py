@@ -2,6 +2,7 @@
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
+import numpy as np
 import pandas as pd
 
 
@@ -264,12 +265,8 @@ def create_purchasing_power_chart(df, retirement_age):
 
 def create_monte_carlo_percentile_chart(mc_results, retirement_age):
     """Create interactive Monte Carlo percentile chart"""
-    ages = list(mc_results['percentile_data'].keys())
-    p10 = [mc_results['percentile_data'][age]['p10'] for age in ages]
-    p25 = [mc_results['percentile_data'][age]['p25'] for age in ages]
-    p50 = [mc_results['percentile_data'][age]['p50'] for age in ages]
-    p75 = [mc_results['percentile_data'][age]['p75'] for age in ages]
-    p90 = [mc_results['percentile_data'][age]['p90'] for age in ages]
+    ages = mc_results.ages.tolist()
+    p10, p25, p50, p75, p90 = (mc_results.percentile(q).tolist() for q in (10, 25, 50, 75, 90))
     
     fig = go.Figure()
     
@@ -339,14 +336,16 @@ def create_monte_carlo_percentile_chart(mc_results, retirement_age):
 
 def create_failure_age_histogram(mc_results):
     """Create interactive histogram of failure ages"""
-    if not mc_results['failure_ages']:
+    if not mc_results['failures']:
         return None
     
+    # One bar per age, straight from the simulator's failure counts
+    failure_ages, counts = mc_results.failure_histogram()
     fig = go.Figure()
     
-    fig.add_trace(go.Histogram(
-        x=mc_results['failure_ages'],
-        nbinsx=30,
+    fig.add_trace(go.Bar(
+        x=failure_ages,
+        y=counts,
         marker_color='#E74C3C',
         opacity=0.7,
         hovertemplate='<b>Age %{x}</b><br>' +
@@ -376,6 +375,93 @@ def create_failure_age_histogram(mc_results):
     return fig
 
 
+def create_path_cohort_chart(ages, balances, retirement_age, title, max_paths=50):
+    """Create chart of individual simulated paths (up to max_paths of them) with the cohort's median"""
+    fig = go.Figure()
+    
+    ages = list(ages)
+    for row in balances[:max_paths]:
+        fig.add_trace(go.Scatter(
+            x=ages,
+            y=row,
+            mode='lines',
+            line=dict(color='rgba(231, 76, 60, 0.25)', width=1),
+            hoverinfo='skip',
+            showlegend=False
+        ))
+    
+    fig.add_trace(go.Scatter(
+        x=ages,
+        y=np.median(balances, axis=0),
+        mode='lines',
+        name='Cohort median',
+        line=dict(color='#2E86AB', width=3),
+        hovertemplate='<b>Age %{x}</b><br>' +
+                      'Median: $%{y:,.0f}<br>' +
+                      '<extra></extra>'
+    ))
+    
+    fig.add_vline(
+        x=retirement_age,
+        line_dash="dash",
+        line_color="green",
+        annotation_text="Retirement",
+        annotation_position="top"
+    )
+    
+    fig.update_layout(
+        title=title,
+        xaxis_title='Age',
+        yaxis_title='Investment Balance ($)',
+        template='plotly_white',
+        height=450
+    )
+    
+    fig.update_yaxes(tickformat='$,.0f')
+    
+    return fig
+
+
+def create_sweep_heatmap(values, retirement_ages, incomes, title, colorbar_title, colorscale='RdYlGn',
+                         hover_format=',.0f', current=None):
+    """Create heatmap of one outcome over a retirement age x monthly income grid, marking the current plan"""
+    fig = go.Figure()
+    
+    fig.add_trace(go.Heatmap(
+        z=values,
+        x=incomes,
+        y=retirement_ages,
+        colorscale=colorscale,
+        colorbar=dict(title=colorbar_title),
+        hovertemplate='<b>Retire at %{y}, $%{x:,.0f}/month</b><br>' +
+                      f'{colorbar_title}: %{{z:{hover_format}}}<br>' +
+                      '<extra></extra>'
+    ))
+    
+    if current is not None:
+        fig.add_trace(go.Scatter(
+            x=[current[1]],
+            y=[current[0]],
+            mode='markers',
+            name='Your plan',
+            marker=dict(symbol='x', size=12, color='black'),
+            hoverinfo='skip'
+        ))
+    
+    fig.update_layout(
+        title=title,
+        xaxis_title='Monthly Income Target (Today\'s $)',
+        yaxis_title='Retirement Age',
+        template='plotly_white',
+        height=450,
+        showlegend=False
+    )
+    
+    fig.update_xaxes(tickformat='$,.0f')
+    
+    return fig
+
+
 def create_dashboard_summary(df, inputs, results):
     """Create multi-panel dashboard summary"""
     retirement_age = inputs['retirement_age']
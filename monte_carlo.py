@@ -1,208 +1,984 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple, Union
+
+from balance_stats import BALANCE_RECORDERS
+from cash_flows import MAX_AGE, compile_cash_flows
+from mortality import LifeTableLongevity, build_longevity_model
+from path_store import PathStore
+from plan_inputs import PlanInputs, compile_inputs
+from return_models import AR1Inflation, ReturnModel, build_inflation_model, build_return_model
+from withdrawal_policies import WithdrawalPolicy, build_withdrawal_policy, summarize_spending
+
+# Paths are simulated in fixed-size chunks, each with its own child random stream,
+# so a seeded run gives identical results however the chunks are scheduled
+PATHS_PER_STREAM = 2500
+
+# Adaptive runs never stop before this many paths, however narrow the interval looks
+MIN_ADAPTIVE_SIMULATIONS = 2 * PATHS_PER_STREAM
+
+# How each chunk draws its return shocks: independent pseudo-random normals, mirrored
+# (antithetic) pairs, or scrambled Sobol low-discrepancy points
+SAMPLING_METHODS = ('random', 'antithetic', 'sobol')
+
+# Simulation time steps: one step per year of age, or twelve monthly steps per year
+TIME_STEPS = ('annual', 'monthly')
+
+# Plan inputs the goal-seek solver can search. direction is +1 when raising the value raises the
+# success rate; prune marks inputs every single path's outcome is monotone in (so known outcomes
+# can be skipped); tolerance is how close the bisection gets to the boundary.
+SOLVER_PARAMETERS = {
+    'retirement_year_one_income': {'direction': -1, 'integer': False, 'prune': True, 'tolerance': 10.0},
+    'monthly_investments': {'direction': 1, 'integer': False, 'prune': True, 'tolerance': 10.0},
+    # Not pruned: without inflation adjustment a later start also raises the income held constant
+    'retirement_age': {'direction': 1, 'integer': True, 'prune': False, 'tolerance': 1},
+}
+# Times an open-ended search bound is doubled looking for the target before giving up
+MAX_SOLVER_WIDENINGS = 12
+
+
+def _simulate_paths(schedule, return_matrix: np.ndarray, recorder, withdrawal_matrix: Optional[np.ndarray] = None,
+                    resume: Optional[Tuple[int, '_PathHistory']] = None, history: Optional['_PathHistory'] = None,
+                    num_alive: Optional[np.ndarray] = None,
+                    policy: Optional[WithdrawalPolicy] = None,
+                    monthly_returns: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Step a block of paths through every age of the schedule at once.
+    
+    Withdrawals come from the schedule, or from a (paths x years) withdrawal_matrix when
+    each path has its own inflation. Each age's balances (floored at zero) go to
+    recorder.record(). Returns (failure_age, final_balance): the first age each path ran
+    out of money (0 = never) and each path's unfloored balance at age 100.
+    
+    resume=(start_index, previous) continues the same paths from a previous run's history,
+    replaying the ages before start_index; history, if given, is filled with this run's.
+    
+    With stochastic lifetimes, paths come longest-lived first and num_alive[i] says how many
+    are still alive at age index i: only those are stepped, and the rest keep the balance
+    they died with (so failure means ruin before death).
+    
+    A started withdrawal policy, if given, decides every retirement withdrawal instead of the
+    schedule, and a path fails when it can't cover the policy's planned withdrawal.
+    
+    With (years x 12 x paths) monthly_returns, every year is stepped month by month instead:
+    contributions and withdrawals a twelfth at a time, and depletion at any month-start fails.
+    """
+    num_paths, num_years = return_matrix.shape
+    ages = schedule.ages.tolist()
+    lump_in = schedule.lump_in
+    lump_out = schedule.lump_out
+    contributions = schedule.annual_contribution
+    withdrawals = schedule.net_withdrawal
+    retired = schedule.retired
+    floored = np.empty(num_paths)
+    if monthly_returns is not None:
+        # Scratch space for the monthly steps, so the inner loop never allocates
+        scratch = np.empty(num_paths)
+        lowest = np.empty(num_paths)
+    
+    if resume is None:
+        start = 0
+        balance = np.full(num_paths, schedule.initial_balance)
+        failure_age = np.zeros(num_paths, dtype=np.int64)
+    else:
+        # Nothing before start_index changed, so every path's state there is exactly as before
+        start, previous = resume
+        balance = previous.balances[start].copy()
+        failure_age = np.where(previous.failure_age < ages[start], previous.failure_age, 0)
+        recorder.copy_ages(previous.recorder, start)
+        if history is not None:
+            history.balances[:start] = previous.balances[:start]
+    failed = failure_age > 0
+    np.maximum(balance, 0, out=floored)
+    
+    for i in range(start, num_years):
+        age = ages[i]
+        # Living paths are a prefix, so they're stepped through views with no gather/scatter
+        n = num_paths if num_alive is None else num_alive[i]
+        alive = balance[:n]
+        annual_return_rate = return_matrix[:n, i]
+        if history is not None:
+            history.balances[i] = balance
+        
+        # Lump sums at beginning of year, BEFORE returns
+        alive += lump_in[i] - lump_out[i]
+        
+        if not retired[i]:
+            if monthly_returns is not None:
+                # Each month's return, then that month's contribution
+                _step_months(alive, monthly_returns[i, :, :n], scratch[:n], contribution=contributions[i] / 12)
+            else:
+                # Accumulation phase: returns on starting balance plus mid-year contributions
+                alive += alive * annual_return_rate
+                if contributions[i]:
+                    alive += contributions[i] + contributions[i] * (annual_return_rate / 2)
+        else:
+            # Retirement phase: withdraw what other income doesn't cover, then grow what's left
+            if policy is not None:
+                withdrawal = policy.withdraw(i, alive, return_matrix[:n, i - 1] if i else None)
+            else:
+                withdrawal = withdrawals[i] if withdrawal_matrix is None else withdrawal_matrix[:n, i]
+            if monthly_returns is not None:
+                low = lowest[:n]
+                monthly_withdrawal = withdrawal / 12
+                if policy is not None:
+                    # A policy taking the whole balance (VPW's final year) cashes out at the start of the year
+                    # rather than a twelfth a month, which a falling market would overdraw
+                    cash_out = withdrawal >= alive
+                    alive -= np.where(cash_out, withdrawal, 0.0)
+                    monthly_withdrawal = np.where(cash_out, 0.0, monthly_withdrawal)
+                _step_months(alive, monthly_returns[i, :, :n], scratch[:n], withdrawal=monthly_withdrawal, lowest=low)
+            else:
+                alive -= withdrawal
+                low = alive
+            # Policies may plan to take everything; the plan's fixed withdrawals must leave something
+            depleted = low < 0 if policy is not None else low <= 0
+            if monthly_returns is None:
+                positive = alive > 0
+                alive[positive] += alive[positive] * annual_return_rate[positive]
+            
+            # First age at which a path runs out of money
+            newly_failed = depleted & ~failed[:n]
+            failure_age[:n][newly_failed] = age
+            failed[:n] |= newly_failed
+        
+        # Paths that have died keep their floored balance
+        np.maximum(alive, 0, out=floored[:n])
+        recorder.record(i, floored)
+    
+    if history is not None:
+        history.failure_age = failure_age
+    return failure_age, balance
+
+
+def _step_months(balance: np.ndarray, monthly_returns: np.ndarray, scratch: np.ndarray, contribution: float = 0.0,
+                 withdrawal: Union[None, float, np.ndarray] = None, lowest: Optional[np.ndarray] = None):
+    """
+    Step balances through one year's 12 months in place without allocating. With a monthly
+    withdrawal, it comes out at the start of each month (lowest tracks each path's lowest
+    balance after one) and only positive balances earn the month's return; otherwise the
+    whole balance compounds, as in the annual step. Contributions go in at each month's end.
+    """
+    if withdrawal is not None:
+        lowest.fill(np.inf)
+    for month in range(12):
+        if withdrawal is not None:
+            balance -= withdrawal
+            np.minimum(lowest, balance, out=lowest)
+            np.maximum(balance, 0, out=scratch)
+            scratch *= monthly_returns[month]
+        else:
+            np.multiply(balance, monthly_returns[month], out=scratch)
+        balance += scratch
+        if contribution:
+            balance += contribution
+
+
+class _PathHistory:
+    """
+    One chunk's paths, kept so a rerun can resume them: the draws (returns, any inflation,
+    lifetimes and monthly returns), the balance at the start of every age (years x paths, float64), each
+    path's failure age and the per-age balance recorder.
+    """
+
+    def __init__(self, num_paths: int, num_years: int):
+        self.balances = np.empty((num_years, num_paths))
+        self.failure_age = np.zeros(num_paths, dtype=np.int64)
+        self.return_matrix = None
+        self.inflation_matrix = None
+        self.death_age = None
+        self.monthly_returns = None
+        self.recorder = None
+
+
+# Per-age schedule arrays the path simulation reads; a rerun can resume at the first age where any differ
+_SCHEDULE_ARRAYS = ('retired', 'lump_in', 'lump_out', 'annual_contribution', 'net_withdrawal', 'required_income',
+                    'part_time', 'oas', 'cpp', 'employer_pension')
+
+
+class SimulationCheckpoint:
+    """
+    Everything needed to rerun a simulation for changed inputs with the same random draws:
+    the random streams, the model set-up, the compiled schedule and every chunk's path history.
+    """
+
+    def __init__(self, entropy: int, sizes: List[int], config: str, schedule, histories: List[_PathHistory]):
+        self.entropy = entropy
+        self.sizes = sizes
+        self.config = config
+        self.schedule = schedule
+        self.histories = histories
+
+    def first_changed_index(self, schedule) -> int:
+        """Index of the first age whose cash flows differ from the checkpointed schedule (0 = rerun everything)"""
+        previous = self.schedule
+        if (schedule.current_age != previous.current_age or len(schedule) != len(previous)
+                or schedule.initial_balance != previous.initial_balance):
+            return 0
+        changed = np.zeros(len(schedule), dtype=bool)
+        for name in _SCHEDULE_ARRAYS:
+            changed |= getattr(schedule, name) != getattr(previous, name)
+        return int(np.argmax(changed)) if changed.any() else len(schedule) - 1
+
+
+def _draw_normals(rng: np.random.Generator, num_paths: int, num_draws: int, sampling: str) -> np.ndarray:
+    """(paths x draws) standard normal draws using the requested sampling scheme"""
+    if sampling == 'antithetic':
+        # Rows j and half + j are mirror images, so every path has a partner with opposite shocks
+        half = rng.standard_normal(size=((num_paths + 1) // 2, num_draws))
+        return np.concatenate([half, -half])[:num_paths]
+    if sampling == 'sobol':
+        from scipy.special import ndtri
+        from scipy.stats import qmc
+        # Scrambled Sobol points (one dimension per draw) mapped through the inverse normal CDF;
+        # the first num_paths points of a power-of-two block keep the sequence's balance
+        sampler = qmc.Sobol(d=num_draws, scramble=True, seed=rng)
+        points = sampler.random_base2(int(np.ceil(np.log2(num_paths))))[:num_paths]
+        return ndtri(np.clip(points, 1e-12, 1 - 1e-12))
+    return rng.standard_normal(size=(num_paths, num_draws))
+
+
+def _control_weights(schedule, expected_returns: np.ndarray) -> np.ndarray:
+    """
+    (years x checkpoints) weights turning a path's return deviations into control variates.
+    
+    Column j is the first-order change in the deterministic projection's balance at one
+    checkpoint age (retirement, every 5 years after, and age 100) per unit of extra return
+    in each earlier year. Since each year's returns average expected_returns, every control
+    averages zero.
+    """
+    num_years = len(schedule)
+    # Balance exposed to each year's return along the deterministic path at the expected returns
+    exposed = schedule.invested_balances(expected_returns)
+    
+    retirement_index = min(max(schedule.index_of(schedule.retirement_age), 0), num_years - 1)
+    checkpoints = sorted(set(range(retirement_index, num_years, 5)) | {num_years - 1})
+    growth = np.cumprod(1 + expected_returns)
+    weights = np.zeros((num_years, len(checkpoints)))
+    for j, k in enumerate(checkpoints):
+        # A return shock in year t compounds at the expected returns through year k
+        weights[:k + 1, j] = exposed[:k + 1] * growth[k] / growth[:k + 1]
+    return weights
+
+
+class _SuccessMoments:
+    """
+    Mergeable sums for estimating the success rate and its standard error, optionally
+    adjusted by control variates. Each unit is one path, or one antithetic pair's average.
+    """
+
+    def __init__(self, num_controls: int = 0):
+        self.units = 0
+        self.sum_y = 0.0
+        self.sum_yy = 0.0
+        self.sum_x = np.zeros(num_controls)
+        self.sum_xx = np.zeros((num_controls, num_controls))
+        self.sum_xy = np.zeros(num_controls)
+
+    @classmethod
+    def from_units(cls, y: np.ndarray, controls: np.ndarray) -> '_SuccessMoments':
+        moments = cls(controls.shape[1])
+        moments.units = len(y)
+        moments.sum_y = float(y.sum())
+        moments.sum_yy = float(y @ y)
+        moments.sum_x = controls.sum(axis=0)
+        moments.sum_xx = controls.T @ controls
+        moments.sum_xy = controls.T @ y
+        return moments
+
+    def __iadd__(self, other: '_SuccessMoments') -> '_SuccessMoments':
+        self.units += other.units
+        self.sum_y += other.sum_y
+        self.sum_yy += other.sum_yy
+        self.sum_x = self.sum_x + other.sum_x
+        self.sum_xx = self.sum_xx + other.sum_xx
+        self.sum_xy = self.sum_xy + other.sum_xy
+        return self
+
+    def estimate(self) -> Tuple[float, float]:
+        """(success fraction, its standard error), regressed on the controls when there are any"""
+        n = self.units
+        mean_y = self.sum_y / n
+        mean_x = self.sum_x / n
+        var_y = self.sum_yy - n * mean_y ** 2
+        if len(mean_x) == 0:
+            return mean_y, float(np.sqrt(max(var_y, 0.0) / (n * max(n - 1, 1))))
+        
+        cov_xx = self.sum_xx - n * np.outer(mean_x, mean_x)
+        cov_xy = self.sum_xy - n * mean_x * mean_y
+        # lstsq copes with controls that carry no information (e.g. zero after antithetic pairing)
+        beta = np.linalg.lstsq(cov_xx, cov_xy, rcond=None)[0]
+        residual = max(var_y - beta @ cov_xy, 0.0) / max(n - len(beta) - 1, 1)
+        # Controls have known mean zero, so shift the estimate by how far their sample mean strayed
+        return float(mean_y - beta @ mean_x), float(np.sqrt(residual / n))
+
+
+def _draw_paths(schedule, return_model: ReturnModel, num_paths: int, child_seed: np.random.SeedSequence,
+                sampling: str = 'random', inflation_model: Optional[AR1Inflation] = None,
+                longevity_model: Optional[LifeTableLongevity] = None, monthly: bool = False
+                ) -> Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+    (returns, yearly inflation or None, death age or None, monthly returns or None) from one
+    chunk's random stream: the first two as (paths x years) matrices, the last (years x 12 x
+    paths). With lifetimes, paths are sorted longest-lived first.
+    """
+    num_years = len(schedule)
+    rng = np.random.default_rng(child_seed)
+    return_draws = num_years * return_model.shocks_per_year
+    # Inflation shocks are drawn alongside the return shocks so sampling schemes cover both
+    inflation_draws = 0 if inflation_model is None else num_years
+    shocks = _draw_normals(rng, num_paths, return_draws + inflation_draws, sampling)
+    return_matrix, inflation_matrix = return_model.simulate(rng, shocks[:, :return_draws])
+    if inflation_model is not None:
+        inflation_matrix = inflation_model.generate(return_model.primary_shocks(shocks[:, :return_draws]),
+                                                    shocks[:, return_draws:])
+    death_age = None
+    if longevity_model is not None:
+        # Lifetimes come after the market draws, so those match a fixed-horizon run's
+        death_age = longevity_model.death_ages(rng, num_paths, schedule.current_age)
+        order = np.argsort(-death_age, kind='stable')
+        return_matrix, death_age = return_matrix[order], death_age[order]
+        if inflation_matrix is not None:
+            inflation_matrix = inflation_matrix[order]
+    # Months are bridged last, so a monthly run sees the same annual returns as an annual one
+    monthly_returns = return_model.monthly_returns(rng, return_matrix) if monthly else None
+    return return_matrix, inflation_matrix, death_age, monthly_returns
+
+
+def _alive_counts(schedule, death_age: np.ndarray) -> np.ndarray:
+    """Paths still alive at each age of the schedule, for death ages sorted longest-lived first"""
+    return np.searchsorted(-death_age, -schedule.ages, side='right')
+
+
+def _run_chunk(schedule, return_model: ReturnModel, num_paths: int, child_seed: np.random.SeedSequence,
+               percentile_mode: str, sampling: str = 'random', control_weights: Optional[np.ndarray] = None,
+               inflation_model: Optional[AR1Inflation] = None, resume: Optional[Tuple[int, '_PathHistory']] = None,
+               keep_history: bool = False, longevity_model: Optional[LifeTableLongevity] = None,
+               withdrawal_policy: Optional[WithdrawalPolicy] = None, time_step: str = 'annual',
+               store_paths: bool = False) -> Dict:
+    """
+    Simulate one chunk of paths from its own stream and reduce it to mergeable partial aggregates.
+    
+    With resume=(start_index, history), the chunk reuses that history's draws and only steps
+    the ages from start_index on. keep_history adds the chunk's path history to the result, and
+    store_paths every path's balances, returns and failure age (for a PathStore).
+    """
+    num_years = len(schedule)
+    if resume is not None:
+        # Same paths as before: reuse their draws rather than regenerating them
+        previous = resume[1]
+        return_matrix, inflation_matrix = previous.return_matrix, previous.inflation_matrix
+        death_age, monthly_returns = previous.death_age, previous.monthly_returns
+    else:
+        return_matrix, inflation_matrix, death_age, monthly_returns = _draw_paths(
+            schedule, return_model, num_paths, child_seed, sampling, inflation_model, longevity_model,
+            monthly=time_step == 'monthly')
+    num_alive = None if death_age is None else _alive_counts(schedule, death_age)
+    # Models that also drive inflation re-index every inflation-linked cash flow per path
+    withdrawal_matrix = None
+    if withdrawal_policy is not None:
+        withdrawal_policy = withdrawal_policy.start(schedule, num_paths, inflation_matrix)
+    elif inflation_matrix is not None:
+        withdrawal_matrix = schedule.withdrawals_under_inflation(inflation_matrix)
+    # Stored paths need every balance, so the chunk records them exactly whatever the run's percentile mode
+    recorder = BALANCE_RECORDERS['exact' if store_paths else percentile_mode](num_paths, len(schedule))
+    history = _PathHistory(num_paths, num_years) if keep_history else None
+    failure_age, end_balance = _simulate_paths(schedule, return_matrix, recorder, withdrawal_matrix, resume, history,
+                                               num_alive, withdrawal_policy, monthly_returns)
+    year_balances = recorder
+    if store_paths and percentile_mode != 'exact':
+        # Fold the exact balances into the run's recorder, age by age as the simulation would have
+        year_balances = BALANCE_RECORDERS[percentile_mode](num_paths, len(schedule))
+        for i in range(num_years):
+            year_balances.record(i, recorder.values[:, i])
+    if history is not None:
+        history.return_matrix, history.inflation_matrix, history.recorder = return_matrix, inflation_matrix, recorder
+        history.death_age, history.monthly_returns = death_age, monthly_returns
+    failed = failure_age > 0
+    
+    succeeded = (~failed).astype(float)
+    if control_weights is None:
+        controls = np.empty((num_paths, 0))
+    else:
+        controls = (return_matrix - return_model.expected_returns(len(schedule))) @ control_weights
+    if sampling == 'antithetic':
+        # Average each mirrored pair into one unit (an odd chunk leaves one unpaired path)
+        paired = num_paths // 2
+        half = num_paths - paired
+        succeeded = np.concatenate([(succeeded[:paired] + succeeded[half:]) / 2, succeeded[paired:half]])
+        controls = np.concatenate([(controls[:paired] + controls[half:]) / 2, controls[paired:half]])
+    
+    return {
+        'paths': num_paths,
+        'failures': int(failed.sum()),
+        # Failure-age histogram indexed like the schedule (index 0 = current age)
+        'failure_age_counts': np.bincount(failure_age[failed] - schedule.current_age, minlength=len(schedule)),
+        'year_balances': year_balances,
+        'final_balances': np.maximum(end_balance, 0).astype(np.float32),
+        'min_balance': float(end_balance.min()),
+        'max_balance': float(end_balance.max()),
+        'success_moments': _SuccessMoments.from_units(succeeded, controls),
+        'death_ages': death_age,
+        'spending': None if withdrawal_policy is None else withdrawal_policy.spending.per_path(),
+        'history': history,
+        'stored_paths': (recorder.values, return_matrix, failure_age) if store_paths else None,
+    }
+
+
+class _NoBalances:
+    """Recorder that discards per-age balances, for runs that only need each path's outcome"""
+
+    def record(self, age_index: int, balances: np.ndarray):
+        pass
+
+
+def _run_comparison_chunk(schedules: List, return_models: List[ReturnModel], inflation_models: List,
+                          num_paths: int, child_seed: np.random.SeedSequence) -> Dict:
+    """
+    Simulate one chunk of paths for every scenario from the same draws (common random numbers).
+    
+    Draw column i feeds year i (counted from this year) of every scenario, so scenarios of
+    different lengths share the shocks of their common years. Extra randomness a model needs
+    (fat-tail mixing, regimes, bootstrap blocks) restarts from the same state for every scenario.
+    """
+    num_years = max(len(schedule) for schedule in schedules)
+    shocks_per_year = return_models[0].shocks_per_year
+    return_draws = num_years * shocks_per_year
+    inflation_draws = 0 if all(model is None for model in inflation_models) else num_years
+    model_seed = child_seed.spawn(1)[0]
+    rng = np.random.default_rng(child_seed)
+    shocks = _draw_normals(rng, num_paths, return_draws + inflation_draws, 'random')
+    
+    succeeded = np.empty((num_paths, len(schedules)))
+    final_balances = np.empty((num_paths, len(schedules)), dtype=np.float32)
+    for k, (schedule, return_model, inflation_model) in enumerate(zip(schedules, return_models, inflation_models)):
+        years = len(schedule)
+        return_shocks = shocks[:, :years * shocks_per_year]
+        return_matrix, inflation_matrix = return_model.simulate(np.random.default_rng(model_seed), return_shocks)
+        if inflation_model is not None:
+            inflation_matrix = inflation_model.generate(return_model.primary_shocks(return_shocks),
+                                                        shocks[:, return_draws:return_draws + years])
+        withdrawal_matrix = None if inflation_matrix is None else schedule.withdrawals_under_inflation(inflation_matrix)
+        failure_age, end_balance = _simulate_paths(schedule, return_matrix, _NoBalances(), withdrawal_matrix)
+        succeeded[:, k] = failure_age == 0
+        final_balances[:, k] = np.maximum(end_balance, 0)
+    
+    return {
+        'paths': num_paths,
+        'successes': succeeded.sum(axis=0),
+        # Paths on which both scenarios succeed, for the variance of every paired difference
+        'joint_successes': succeeded.T @ succeeded,
+        'final_balances': final_balances,
+    }
+
+
+def wilson_interval(successes: int, num_paths: int, confidence: float = 0.95) -> Tuple[float, float]:
+    """Wilson score confidence interval for a success rate, in percent (well-behaved near 0% and 100%)"""
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    p = successes / num_paths
+    denominator = 1 + z ** 2 / num_paths
+    center = (p + z ** 2 / (2 * num_paths)) / denominator
+    half_width = z * np.sqrt(p * (1 - p) / num_paths + z ** 2 / (4 * num_paths ** 2)) / denominator
+    return float(max(0.0, center - half_width) * 100), float(min(1.0, center + half_width) * 100)
+
+
+class MonteCarloResult:
+    """
+    One run's results as compact arrays - float32 final balances, a failure count per age and a
+    (percentiles x ages) balance matrix - plus scalar statistics. Reads like the old results dict
+    (results['success_rate']); the per-path lists and percentile dicts are only built on access.
+    """
+
+    __slots__ = ('ages', 'final_balances', 'failure_age_counts', 'percentile_matrix', 'stats', 'path_store')
+
+    # Balance percentiles kept for every age (the rows of percentile_matrix)
+    PERCENTILES = (10, 25, 50, 75, 90)
+
+    def __init__(self, ages: np.ndarray, final_balances: np.ndarray, failure_age_counts: np.ndarray,
+                 percentile_matrix: np.ndarray, stats: Dict, path_store: Optional[PathStore] = None):
+        self.ages = ages
+        self.final_balances = final_balances
+        self.failure_age_counts = failure_age_counts
+        self.percentile_matrix = percentile_matrix
+        self.stats = stats
+        # Every path's balances and returns on disk, when the run kept them for drill-down
+        self.path_store = path_store
+
+    def percentile(self, q: int) -> np.ndarray:
+        """Balance at percentile q (one of PERCENTILES) for every age"""
+        return self.percentile_matrix[self.PERCENTILES.index(q)]
+
+    def failure_histogram(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(ages, number of paths failing at each) for the ages where any path failed"""
+        failed = self.failure_age_counts > 0
+        return self.ages[failed], self.failure_age_counts[failed]
+
+    def failure_ages(self) -> np.ndarray:
+        """Failure age of every failed path, in age order"""
+        return np.repeat(self.ages, self.failure_age_counts)
+
+    def percentile_data(self) -> Dict[int, Dict[str, float]]:
+        """{age: {'p10': ..., 'p90': ...}} as the results dict used to carry it"""
+        columns = self.percentile_matrix.T.tolist()
+        return {age: {f'p{q}': value for q, value in zip(self.PERCENTILES, column)}
+                for age, column in zip(self.ages.tolist(), columns)}
+
+    def __getitem__(self, key: str):
+        if key in self.stats:
+            return self.stats[key]
+        if key == 'final_balances':
+            return self.final_balances
+        if key == 'failure_ages':
+            return self.failure_ages()
+        if key == 'percentile_data':
+            return self.percentile_data()
+        raise KeyError(key)
+
+    def keys(self) -> List[str]:
+        return list(self.stats) + ['final_balances', 'failure_ages', 'percentile_data']
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.stats or key in ('final_balances', 'failure_ages', 'percentile_data')
+
+    def get(self, key: str, default=None):
+        return self[key] if key in self else default
+
+
+class _RunTotals:
+    """
+    Whole-run aggregates, folded from chunk partials (in chunk order) as they arrive,
+    so only one chunk's partials are held at a time.
+    """
+
+    def __init__(self, capacity: int, num_ages: int, percentile_mode: str, num_controls: int = 0,
+                 path_store: Optional[PathStore] = None):
+        self.year_balances = BALANCE_RECORDERS[percentile_mode](capacity, num_ages)
+        self.path_store = path_store
+        self.final_balances = np.empty(capacity, dtype=np.float32)
+        # Household death age per path, with stochastic lifetimes
+        self.death_ages = None
+        # Per-path spending statistics, with a withdrawal policy
+        self.spending = None
+        self.failure_age_counts = np.zeros(num_ages, dtype=np.int64)
+        self.failures = 0
+        self.paths = 0
+        self.min_balance, self.max_balance = np.inf, -np.inf
+        self.success_moments = _SuccessMoments(num_controls)
+
+    def add(self, part: Dict):
+        self.year_balances.absorb(part['year_balances'], self.paths)
+        self.final_balances[self.paths:self.paths + part['paths']] = part['final_balances']
+        if part['death_ages'] is not None:
+            if self.death_ages is None:
+                self.death_ages = np.empty(len(self.final_balances), dtype=np.int64)
+            self.death_ages[self.paths:self.paths + part['paths']] = part['death_ages']
+        if part['spending'] is not None:
+            if self.spending is None:
+                self.spending = {name: np.empty(len(self.final_balances)) for name in part['spending']}
+            for name, values in part['spending'].items():
+                self.spending[name][self.paths:self.paths + part['paths']] = values
+        if self.path_store is not None:
+            self.path_store.write(self.paths, *part['stored_paths'], part['final_balances'])
+        self.failure_age_counts += part['failure_age_counts']
+        self.failures += part['failures']
+        self.min_balance = min(self.min_balance, part['min_balance'])
+        self.max_balance = max(self.max_balance, part['max_balance'])
+        self.success_moments += part['success_moments']
+        self.paths += part['paths']
+
+    def finish(self):
+        """Drop unused capacity (adaptive runs can stop before the cap)"""
+        self.year_balances.trim(self.paths)
+        self.final_balances = self.final_balances[:self.paths]
+        if self.path_store is not None:
+            self.path_store.finish(self.paths)
+        if self.death_ages is not None:
+            self.death_ages = self.death_ages[:self.paths]
+        if self.spending is not None:
+            self.spending = {name: values[:self.paths] for name, values in self.spending.items()}
+
+
+# Worker pools are expensive to start, so keep one alive per worker count for the life of the server
+_executors: Dict[int, ProcessPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    """Shared process pool with the given number of workers"""
+    with _executors_lock:
+        if workers not in _executors:
+            # Never fork a multi-threaded Streamlit server - start workers from a clean interpreter
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _executors[workers] = ProcessPoolExecutor(max_workers=workers,
+                                                      mp_context=multiprocessing.get_context(method))
+        return _executors[workers]
+
+
+@atexit.register
+def _shutdown_executors():
+    for executor in _executors.values():
+        executor.shutdown(wait=False, cancel_futures=True)
+
 
 class MonteCarloSimulator:
-    def __init__(self, inputs: Dict, num_simulations: int = 10000):
-        self.inputs = inputs
+    def __init__(self, inputs: Union[Dict, PlanInputs], num_simulations: int = 10000, seed: Optional[int] = None,
+                 workers: int = 1, percentile_mode: str = 'exact', target_precision: Optional[float] = None,
+                 confidence: float = 0.95, sampling: str = 'random', control_variate: bool = False,
+                 return_model: Union[str, ReturnModel] = 'normal', std_dev: float = 0.18,
+                 inflation_model: Union[None, str, AR1Inflation] = None,
+                 resume_from: Optional[SimulationCheckpoint] = None, keep_checkpoint: bool = False,
+                 longevity: Union[None, str, LifeTableLongevity] = None,
+                 withdrawal_policy: Union[None, str, WithdrawalPolicy] = None, time_step: str = 'annual',
+                 store_paths: bool = False):
+        # PlanInputs, or an inputs dict compiled (validated and defaulted) once here
+        self.inputs = inputs = compile_inputs(inputs)
+        # Annual return generator: a name from return_models.RETURN_MODELS (built for the plan with
+        # std_dev - ~18% is historical S&P 500 volatility) or a ReturnModel instance
+        self.return_model = build_return_model(return_model, inputs, std_dev)
+        # Kept so the goal-seek solver can rebuild input-dependent models for the plans it tries
+        self.return_model_choice = return_model
+        self.std_dev = std_dev
+        # Stochastic inflation correlated with returns (e.g. 'ar1'); None keeps the plan's constant
+        # yearly_inflation. Every inflation-linked cash flow is re-indexed per path.
+        self.inflation_model = build_inflation_model(inflation_model, inputs)
+        if self.inflation_model is not None and getattr(self.return_model, 'include_inflation', False):
+            raise ValueError("the return model already replays historical inflation - leave inflation_model as None")
+        # Stochastic lifetimes (e.g. 'life_table'): each path ends when the household's last survivor
+        # dies, and failure means ruin before death. None keeps the fixed horizon of age 100.
+        self.longevity = build_longevity_model(longevity, inputs)
+        # Dynamic retirement withdrawals (a name from withdrawal_policies.WITHDRAWAL_POLICIES or an
+        # instance) instead of the plan's fixed ones; results then include spending statistics
+        self.withdrawal_policy = build_withdrawal_policy(withdrawal_policy)
+        # 'monthly' steps every path month by month (contributions and withdrawals a twelfth at a time)
+        # with monthly returns bridged from the same annual draws, instead of the mid-year convention
+        if time_step not in TIME_STEPS:
+            raise ValueError(f"time_step must be one of {list(TIME_STEPS)}")
+        self.time_step = time_step
+        # Number of paths, or the hard cap on paths when running adaptively
         self.num_simulations = num_simulations
+        # Root seed for all random streams; None draws fresh OS entropy (recorded in the results)
+        self.seed = seed
+        # Worker processes for chunks of paths (1 = run in this process; 0 or None = all CPU cores)
+        self.workers = workers or os.cpu_count() or 1
+        # 'exact' keeps every path's per-age balance as float32; 'sketch' keeps a bounded-memory
+        # mergeable quantile sketch per age (percentiles within 1%), for very large runs
+        if percentile_mode not in BALANCE_RECORDERS:
+            raise ValueError(f"percentile_mode must be one of {sorted(BALANCE_RECORDERS)}")
+        self.percentile_mode = percentile_mode
+        # Adaptive mode: stop once the success-rate confidence interval is within +/- this many
+        # percentage points (e.g. 0.5), or at num_simulations, whichever comes first
+        self.target_precision = target_precision
+        self.confidence = confidence
+        # Variance reduction: antithetic or Sobol draws, and/or a control variate regression
+        # on first-order changes to the deterministic projection
+        if sampling not in SAMPLING_METHODS:
+            raise ValueError(f"sampling must be one of {list(SAMPLING_METHODS)}")
+        if sampling == 'antithetic' and control_variate:
+            # The controls are linear in the return shocks, so they cancel exactly within each mirrored pair
+            raise ValueError("control_variate has no effect with antithetic sampling - use 'random' or 'sobol'")
+        if sampling == 'antithetic' and self.longevity is not None:
+            # Paths are reordered by lifetime, which would break up the mirrored pairs
+            raise ValueError("stochastic longevity can't be combined with antithetic sampling")
+        self.sampling = sampling
+        self.control_variate = control_variate
+        # Incremental reruns: resume_from is a previous run's checkpoint. If the random set-up matches
+        # (an explicit seed equal to the checkpoint's - seed None is always a fresh run), paths are only
+        # re-simulated from the first age whose cash flows changed, with the same draws.
+        # keep_checkpoint stores self.checkpoint after a run.
+        self.resume_from = resume_from
+        self.keep_checkpoint = keep_checkpoint
+        self.checkpoint = None
+        # Drill-down: write every path's per-age balances and returns to a memory-mapped PathStore
+        # (results.path_store) instead of keeping only their aggregates
+        self.store_paths = store_paths
+    
+    def _checkpoint_config(self) -> str:
+        """Everything besides the seed and schedule that must match for a checkpoint's paths to be reused"""
+        models = (self.return_model, self.inflation_model, self.longevity, self.withdrawal_policy)
+        # Stored runs record exact balances in every chunk, so their histories can't resume a sketch run's
+        recorder = 'exact' if self.store_paths else self.percentile_mode
+        return '|'.join([self.sampling, self.time_step, recorder] + [repr(model) for model in models])
+    
+    def _success_interval(self, totals: _RunTotals) -> Tuple[float, float, float]:
+        """(success rate, CI low, CI high) in percent from the paths simulated so far"""
+        successes = totals.paths - totals.failures
+        if self.sampling == 'random' and not self.control_variate:
+            low, high = wilson_interval(successes, totals.paths, self.confidence)
+            return successes / totals.paths * 100, low, high
         
-    def run_simulation(self) -> Dict:
+        rate, std_error = totals.success_moments.estimate()
+        if std_error == 0:
+            # Every unit agreed, so there's no variation to reduce - fall back to the binomial interval
+            low, high = wilson_interval(successes, totals.paths, self.confidence)
+            return successes / totals.paths * 100, low, high
+        # Scrambled Sobol points are treated as independent draws, which overstates their error
+        half_width = NormalDist().inv_cdf((1 + self.confidence) / 2) * std_error
+        rate = min(max(rate, 0.0), 1.0)
+        return rate * 100, max(0.0, rate - half_width) * 100, min(1.0, rate + half_width) * 100
+    
+    def _converged(self, totals: _RunTotals) -> bool:
+        """Whether an adaptive run has simulated enough paths to stop"""
+        if self.target_precision is None or totals.paths < MIN_ADAPTIVE_SIMULATIONS:
+            return False
+        _, low, high = self._success_interval(totals)
+        return (high - low) / 2 <= self.target_precision
+        
+    def run_simulation(self) -> MonteCarloResult:
         """Run Monte Carlo simulation with variable returns"""
         
-        # Historical market statistics (based on S&P 500)
-        mean_return = self.inputs['investment_return'] / 100
-        std_dev = 0.18  # ~18% standard deviation (historical volatility)
-        
-        current_age = self.inputs['current_age']
-        retirement_age = self.inputs['retirement_age']
-        max_age = 100
-        
-        # Get lump sums and create lookup dict - SAFETY CHECK
-        lump_sums = self.inputs.get('lump_sums', [])
-        if not isinstance(lump_sums, list):
-            lump_sums = []
-        lump_sum_by_age = {ls['age']: ls['amount'] for ls in lump_sums if isinstance(ls, dict) and ls.get('amount', 0) > 0}
-        
-        # Get lump sum withdrawals and create lookup dict - SAFETY CHECK
-        lump_withdrawals = self.inputs.get('lump_sum_withdrawals', [])
-        if not isinstance(lump_withdrawals, list):
-            lump_withdrawals = []
-        lump_withdrawal_by_age = {lw['age']: lw['amount'] for lw in lump_withdrawals if isinstance(lw, dict) and lw.get('amount', 0) > 0}
-        
-        successes = 0
-        failures = 0
-        failure_ages = []
-        final_balances = []
-        worst_case_balance = float('inf')
-        best_case_balance = 0
-        
-        # Track percentile outcomes
-        all_year_balances = {age: [] for age in range(current_age, max_age + 1)}
-        
-        for sim in range(self.num_simulations):
-            balance = float(self.inputs['total_investments'])
-            failed = False
-            failure_age = None
-            
-            for age in range(current_age, max_age + 1):
-                # Generate random return (normal distribution)
-                annual_return_rate = np.random.normal(mean_return, std_dev)
-                
-                # Add lump sum if applicable (at beginning of year, BEFORE returns)
-                if age in lump_sum_by_age:
-                    balance += lump_sum_by_age[age]
-                
-                # Subtract lump sum withdrawal if applicable (at beginning of year, BEFORE returns)
-                if age in lump_withdrawal_by_age:
-                    balance -= lump_withdrawal_by_age[age]
-                
-                # Accumulation phase
-                if age < retirement_age:
-                    # Returns on starting balance
-                    returns = balance * annual_return_rate
-                    balance += returns
-                    
-                    # Contributions
-                    if age <= self.inputs['stop_investments_age']:
-                        annual_contrib = self.inputs['monthly_investments'] * 12
-                        contrib_returns = annual_contrib * (annual_return_rate / 2)
-                        balance += annual_contrib + contrib_returns
-                
-                # Retirement phase
-                else:
-                    # Calculate required income - entered in TODAY'S dollars, inflate from current age
-                    years_from_now = age - current_age
-                    
-                    if self.inputs['inflation_adjustment_enabled']:
-                        required_income = self.inputs['retirement_year_one_income'] * \
-                            ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_now)
-                    else:
-                        # If inflation adjustment disabled, inflate to retirement year then hold constant
-                        years_until_retirement = retirement_age - current_age
-                        required_income = self.inputs['retirement_year_one_income'] * \
-                            ((1 + self.inputs['yearly_inflation'] / 100) ** years_until_retirement)
-                    
-                    # Age-based reductions
-                    age_77_threshold = self.inputs.get('age_77_threshold', 77)
-                    age_83_threshold = self.inputs.get('age_83_threshold', 83)
-                    reduction_1_enabled = self.inputs.get('reduction_1_enabled', True)
-                    reduction_2_enabled = self.inputs.get('reduction_2_enabled', True)
-                    
-                    if reduction_1_enabled and age >= age_77_threshold:
-                        required_income *= (1 - self.inputs['age_77_reduction'] / 100)
-                    if reduction_2_enabled and age >= age_83_threshold:
-                        required_income *= (1 - self.inputs['age_83_reduction'] / 100)
-                    
-                    # Other income sources
-                    part_time_start = self.inputs.get('part_time_start_age', retirement_age)
-                    if age >= part_time_start and age <= self.inputs['part_time_end_age']:
-                        part_time = self.inputs['part_time_income']
-                        if self.inputs.get('part_time_inflation_adjusted', False):
-                            years_since_part_time_start = age - part_time_start
-                            part_time *= ((1 + self.inputs['yearly_inflation'] / 100) ** years_since_part_time_start)
-                    else:
-                        part_time = 0
-                    
-                    # OAS - Person 1
-                    oas_p1 = 0
-                    if age >= self.inputs.get('oas_start_age', 65):
-                        oas_p1 = self.inputs.get('monthly_oas', 0)
-                        if self.inputs.get('oas_inflation_adjusted', True):
-                            oas_p1 *= ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_now)
-                    
-                    # OAS - Person 2
-                    oas_p2 = 0
-                    if self.inputs.get('couple_mode', False) and age >= self.inputs.get('oas_start_age_p2', 65):
-                        oas_p2 = self.inputs.get('monthly_oas_p2', 0)
-                        if self.inputs.get('oas_inflation_adjusted_p2', True):
-                            oas_p2 *= ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_now)
-                    
-                    # CPP - Person 1
-                    cpp_p1 = 0
-                    if age >= self.inputs.get('cpp_start_age', 70):
-                        cpp_p1 = self.inputs.get('monthly_cpp', 0)
-                        if self.inputs.get('cpp_inflation_adjusted', True):
-                            cpp_p1 *= ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_now)
-                    
-                    # CPP - Person 2
-                    cpp_p2 = 0
-                    if self.inputs.get('couple_mode', False) and age >= self.inputs.get('cpp_start_age_p2', 70):
-                        cpp_p2 = self.inputs.get('monthly_cpp_p2', 0)
-                        if self.inputs.get('cpp_inflation_adjusted_p2', True):
-                            cpp_p2 *= ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_now)
-                    
-                    # Private pension - Person 1
-                    private_pension_p1 = 0
-                    if age >= self.inputs.get('private_pension_start_age', 999):
-                        private_pension_p1 = self.inputs.get('monthly_private_pension', 0)
-                        if self.inputs.get('private_pension_inflation_adjusted', False):
-                            private_pension_p1 *= ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_now)
-                    
-                    # Private pension - Person 2
-                    private_pension_p2 = 0
-                    if self.inputs.get('couple_mode', False) and age >= self.inputs.get('private_pension_start_age_p2', 999):
-                        private_pension_p2 = self.inputs.get('monthly_private_pension_p2', 0)
-                        if self.inputs.get('private_pension_inflation_adjusted_p2', False):
-                            private_pension_p2 *= ((1 + self.inputs['yearly_inflation'] / 100) ** years_from_now)
-                    
-                    total_pension = oas_p1 + oas_p2 + cpp_p1 + cpp_p2 + private_pension_p1 + private_pension_p2
-                    
-                    # Withdrawals
-                    monthly_from_other = part_time + total_pension
-                    if monthly_from_other < required_income:
-                        monthly_withdrawal = required_income - monthly_from_other
-                        annual_withdrawal = monthly_withdrawal * 12
-                        balance -= annual_withdrawal
-                    
-                    # Returns on balance after withdrawal
-                    if balance > 0:
-                        returns = balance * annual_return_rate
-                        balance += returns
-                    
-                    # Check for failure
-                    if balance <= 0 and not failed:
-                        failed = True
-                        failure_age = age
-                        failures += 1
-                        failure_ages.append(age)
-                
-                # Track balance for this age across all simulations
-                all_year_balances[age].append(max(0, balance))
-            
-            # End of simulation
-            if not failed:
-                successes += 1
-            
-            final_balances.append(max(0, balance))
-            worst_case_balance = min(worst_case_balance, balance)
-            best_case_balance = max(best_case_balance, balance)
-        
-        # Calculate percentiles for each year
-        percentile_data = {}
-        for age in range(current_age, max_age + 1):
-            balances = all_year_balances[age]
-            percentile_data[age] = {
-                'p10': np.percentile(balances, 10),
-                'p25': np.percentile(balances, 25),
-                'p50': np.percentile(balances, 50),
-                'p75': np.percentile(balances, 75),
-                'p90': np.percentile(balances, 90)
-            }
-        
-        success_rate = (successes / self.num_simulations) * 100
+        # Deterministic per-age amounts are the same for every path - compile them once
+        schedule = compile_cash_flows(self.inputs)
+        ages = schedule.ages.tolist()
         
-        return {
+        # Reuse a checkpoint's paths up to the first age whose cash flows changed
+        checkpoint = self.resume_from
+        if checkpoint is not None and (checkpoint.config != self._checkpoint_config()
+                                       or self.seed is None or self.seed != checkpoint.entropy):
+            checkpoint = None
+        start_index = checkpoint.first_changed_index(schedule) if checkpoint is not None else 0
+        if self.withdrawal_policy is not None and schedule.retired.any():
+            # Policy state isn't checkpointed, so resume no later than the start of retirement
+            start_index = min(start_index, int(np.argmax(schedule.retired)))
+        
+        # Each chunk draws its (paths x years) return matrix from its own child stream. Spawning
+        # children batch by batch yields the same streams as spawning them all at once.
+        root = np.random.SeedSequence(self.seed)
+        expected_returns = self.return_model.expected_returns(len(schedule))
+        control_weights = _control_weights(schedule, expected_returns) if self.control_variate else None
+        num_controls = 0 if control_weights is None else control_weights.shape[1]
+        path_store = PathStore(self.num_simulations, schedule.ages) if self.store_paths else None
+        totals = _RunTotals(self.num_simulations, len(schedule), self.percentile_mode, num_controls, path_store)
+        parallel = self.workers > 1 and self.num_simulations > PATHS_PER_STREAM
+        # Fixed runs go in one batch; adaptive runs check for convergence between batches
+        batch_paths = self.num_simulations if self.target_precision is None else PATHS_PER_STREAM * self.workers
+        all_sizes, histories, resumed_chunks = [], [], 0
+        
+        while totals.paths < self.num_simulations and not self._converged(totals):
+            remaining = min(batch_paths, self.num_simulations - totals.paths)
+            sizes = [min(PATHS_PER_STREAM, remaining - start) for start in range(0, remaining, PATHS_PER_STREAM)]
+            n = len(sizes)
+            # Chunks the checkpoint also simulated (same stream, same size) resume from its history
+            resumes = []
+            for j, size in enumerate(sizes, start=len(all_sizes)):
+                reusable = (checkpoint is not None and start_index > 0 and j < len(checkpoint.sizes)
+                            and checkpoint.sizes[j] == size)
+                resumes.append((start_index, checkpoint.histories[j]) if reusable else None)
+            all_sizes += sizes
+            job_args = ([schedule] * n, [self.return_model] * n, sizes, root.spawn(n), [self.percentile_mode] * n,
+                        [self.sampling] * n, [control_weights] * n, [self.inflation_model] * n, resumes,
+                        [self.keep_checkpoint] * n, [self.longevity] * n, [self.withdrawal_policy] * n,
+                        [self.time_step] * n, [self.store_paths] * n)
+            if parallel and n > 1 and not any(resumes):
+                # Chunks run in parallel; map() returns them in chunk order so merging is deterministic.
+                # Resumed chunks stay in this process - shipping their histories costs more than stepping them.
+                parts = _get_executor(min(self.workers, n)).map(_run_chunk, *job_args)
+            else:
+                parts = map(_run_chunk, *job_args)
+            for part, resume in zip(parts, resumes):
+                # Check after every chunk, so where an adaptive run stops doesn't depend on worker count
+                if self._converged(totals):
+                    break
+                totals.add(part)
+                histories.append(part['history'])
+                resumed_chunks += resume is not None
+        totals.finish()
+        
+        if self.keep_checkpoint:
+            self.checkpoint = SimulationCheckpoint(root.entropy, all_sizes[:len(histories)],
+                                                   self._checkpoint_config(), schedule, histories)
+        
+        # Calculate all percentiles for every age in a single pass
+        percentile_matrix = totals.year_balances.percentiles(MonteCarloResult.PERCENTILES)
+        
+        num_simulations = totals.paths
+        failures = totals.failures
+        successes = num_simulations - failures
+        final_balances = totals.final_balances
+        success_rate, ci_low, ci_high = self._success_interval(totals)
+        death_ages = totals.death_ages
+        
+        stats = {
             'success_rate': success_rate,
             'successes': successes,
             'failures': failures,
-            'failure_ages': failure_ages,
-            'avg_failure_age': np.mean(failure_ages) if failure_ages else None,
-            'final_balances': final_balances,
-            'median_final_balance': np.median(final_balances),
-            'worst_case_balance': worst_case_balance,
-            'best_case_balance': best_case_balance,
-            'percentile_data': percentile_data
+            'avg_failure_age': (float(np.dot(schedule.ages, totals.failure_age_counts) / failures)
+                                if failures else None),
+            'median_final_balance': float(np.median(final_balances)),
+            'worst_case_balance': totals.min_balance,
+            'best_case_balance': max(0.0, totals.max_balance),
+            'seed': root.entropy,
+            'num_simulations': num_simulations,
+            'success_rate_ci': (ci_low, ci_high),
+            'ci_half_width': (ci_high - ci_low) / 2,
+            'confidence': self.confidence,
+            'converged': (ci_high - ci_low) / 2 <= self.target_precision if self.target_precision else None,
+            # Age the paths were re-simulated from, when an earlier run's checkpoint was reused
+            'resumed_from_age': ages[start_index] if resumed_chunks else None,
+            # With stochastic lifetimes, success means the money outlasts the household
+            'longevity': death_ages is not None,
+            'probability_of_ruin': 100 - success_rate if death_ages is not None else None,
+            'median_death_age': float(np.median(death_ages)) if death_ages is not None else None,
+            'outlives_plan_rate': float((death_ages > ages[-1]).mean() * 100) if death_ages is not None else None,
+            'withdrawal_policy': None if self.withdrawal_policy is None else self.withdrawal_policy.name,
+            'spending_stats': None if totals.spending is None else summarize_spending(totals.spending),
+        }
+        return MonteCarloResult(schedule.ages, final_balances, totals.failure_age_counts, percentile_matrix, stats,
+                                path_store)
+    
+    def solve(self, parameter: str, target_success_rate: float = 90.0, low: Optional[float] = None,
+              high: Optional[float] = None, tolerance: Optional[float] = None) -> Dict:
+        """
+        Goal seek: the highest retirement_year_one_income, earliest retirement_age or lowest
+        monthly_investments (within [low, high]) whose success rate meets target_success_rate.
+        
+        Every trial value runs on the same num_simulations paths (common random numbers from this
+        simulator's seed and sampling), so the success rate moves monotonically with the value and
+        bisection converges cleanly; the reported rate matches a run_simulation() of the solved plan
+        with the same seed. Where outcomes are monotone per path, a path that succeeded at a worse
+        value or failed at a better one isn't re-simulated, so late iterations only step a few
+        undecided paths. Return models that depend on the plan (the glide path) are rebuilt for
+        every trial from the same streams, without that shortcut.
+        """
+        if parameter not in SOLVER_PARAMETERS:
+            raise ValueError(f"parameter must be one of {sorted(SOLVER_PARAMETERS)}")
+        spec = SOLVER_PARAMETERS[parameter]
+        tolerance = spec['tolerance'] if tolerance is None else tolerance
+        
+        # Default bounds; None marks an open end that's widened until the target is bracketed
+        current = getattr(self.inputs, parameter)
+        if parameter == 'retirement_age':
+            low = self.inputs.current_age if low is None else low
+            high = MAX_AGE if high is None else high
+            open_end = None
+        else:
+            open_end = 'high' if high is None else None
+            low = 0.0 if low is None else low
+            high = max(2.0 * current, 1000.0) if high is None else high
+        
+        # Every trial draws its paths from the same streams as run_simulation(), in chunks
+        schedule = compile_cash_flows(self.inputs)
+        root = np.random.SeedSequence(self.seed)
+        sizes = [min(PATHS_PER_STREAM, self.num_simulations - start)
+                 for start in range(0, self.num_simulations, PATHS_PER_STREAM)]
+        child_seeds = root.spawn(len(sizes))
+        
+        def draw(return_model: ReturnModel) -> Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray],
+                                                      Optional[np.ndarray]]:
+            draws = [_draw_paths(schedule, return_model, size, child_seed, self.sampling, self.inflation_model,
+                                 self.longevity, monthly=self.time_step == 'monthly')
+                     for size, child_seed in zip(sizes, child_seeds)]
+            # Monthly returns are (years x 12 x paths), so they join along their last axis
+            returns, inflation, death_age, monthly = (
+                None if draws[0][k] is None else np.concatenate([d[k] for d in draws], axis=-1 if k == 3 else 0)
+                for k in range(4))
+            if death_age is None:
+                return returns, inflation, None, monthly
+            # Sort across chunks too, so any subset of paths is still longest-lived first
+            order = np.argsort(-death_age, kind='stable')
+            return (returns[order], None if inflation is None else inflation[order], death_age[order],
+                    None if monthly is None else monthly[:, :, order])
+        
+        # Draw once, unless the return model changes with the plan being tried
+        plan_dependent = repr(build_return_model(self.return_model_choice, self.inputs.replace(**{parameter: high}),
+                                                 self.std_dev)) != repr(self.return_model)
+        return_matrix, inflation_matrix, death_age, monthly_matrix = draw(self.return_model)
+        num_paths = len(return_matrix)
+        all_paths = np.ones(num_paths, dtype=bool)
+        no_paths = np.zeros(num_paths, dtype=bool)
+        trials = []
+        
+        def succeeded(value, known: np.ndarray = no_paths, possible: np.ndarray = all_paths) -> np.ndarray:
+            """Which paths succeed at value, simulating only those possible but not already known to"""
+            nonlocal return_matrix, inflation_matrix, death_age, monthly_matrix
+            trial_inputs = self.inputs.replace(**{parameter: value})
+            if plan_dependent:
+                return_matrix, inflation_matrix, death_age, monthly_matrix = draw(
+                    build_return_model(self.return_model_choice, trial_inputs, self.std_dev))
+            if plan_dependent or not spec['prune'] or self.withdrawal_policy is not None:
+                # Dynamic withdrawals can make a path's outcome non-monotone in the value
+                known, possible = no_paths, all_paths
+            undecided = possible & ~known
+            trial_schedule = compile_cash_flows(trial_inputs)
+            inflation = None if inflation_matrix is None else inflation_matrix[undecided]
+            policy = None
+            withdrawal_matrix = None
+            if self.withdrawal_policy is not None:
+                policy = self.withdrawal_policy.start(trial_schedule, int(undecided.sum()), inflation)
+            elif inflation is not None:
+                withdrawal_matrix = trial_schedule.withdrawals_under_inflation(inflation)
+            num_alive = None if death_age is None else _alive_counts(trial_schedule, death_age[undecided])
+            failure_age, _ = _simulate_paths(trial_schedule, return_matrix[undecided], _NoBalances(),
+                                             withdrawal_matrix, num_alive=num_alive, policy=policy,
+                                             monthly_returns=None if monthly_matrix is None
+                                             else monthly_matrix[:, :, undecided])
+            result = known.copy()
+            result[undecided] = failure_age == 0
+            trials.append((value, float(result.mean() * 100)))
+            return result
+        
+        def rate(success: np.ndarray) -> float:
+            return float(success.mean() * 100)
+        
+        # Orient the bracket: the better end should meet the target and the worse end shouldn't
+        better, worse = (high, low) if spec['direction'] > 0 else (low, high)
+        better_open = open_end == ('high' if spec['direction'] > 0 else 'low')
+        worse_open = open_end == ('low' if spec['direction'] > 0 else 'high')
+        success_better = succeeded(better)
+        success_worse = succeeded(worse, possible=success_better)
+        for _ in range(MAX_SOLVER_WIDENINGS):
+            if rate(success_better) < target_success_rate and better_open:
+                worse, success_worse = better, success_better
+                better *= 2
+                success_better = succeeded(better, known=success_worse)
+            elif rate(success_worse) >= target_success_rate and worse_open:
+                better, success_better = worse, success_worse
+                worse *= 2
+                success_worse = succeeded(worse, possible=success_better)
+            else:
+                break
+        
+        if rate(success_better) < target_success_rate:
+            # Even the best value allowed misses the target
+            solution = None
+        elif rate(success_worse) >= target_success_rate:
+            # Even the worst value allowed meets it
+            better, success_better = worse, success_worse
+            solution = worse
+        else:
+            while abs(better - worse) > tolerance:
+                middle = (better + worse) / 2
+                if spec['integer']:
+                    # Round toward the worse end so the bracket always shrinks
+                    middle = int(np.floor(middle) if worse < better else np.ceil(middle))
+                    if middle == worse:
+                        break
+                success_middle = succeeded(middle, known=success_worse, possible=success_better)
+                if rate(success_middle) >= target_success_rate:
+                    better, success_better = middle, success_middle
+                else:
+                    worse, success_worse = middle, success_middle
+            solution = better
+        
+        return {
+            'parameter': parameter,
+            'value': solution,
+            'achievable': solution is not None,
+            'success_rate': rate(success_better),
+            'target_success_rate': target_success_rate,
+            # (value, success rate) of every trial, in the order they ran
+            'trials': trials,
+            'seed': root.entropy,
+            'num_simulations': num_paths,
         }
     
     def get_interpretation(self, success_rate: float) -> Tuple[str, str]:
@@ -232,10 +1008,11 @@ class MonteCarloSimulator:
         # Explain what Monte Carlo tests
         insights.append("### What This Simulation Tests\n")
         insights.append(
-            "The Monte Carlo simulation runs 10,000 different scenarios with realistic market volatility "
-            "(18% standard deviation based on historical S&P 500 data). Unlike the deterministic calculator "
-            "which assumes steady returns every year, this tests whether your retirement plan survives "
-            "**real-world market conditions** including crashes, bear markets, and varying sequences of returns.\n"
+            f"The Monte Carlo simulation ran {results['num_simulations']:,} different scenarios with realistic market "
+            f"volatility ({self.return_model.name.replace('_', ' ')} returns with a {self.return_model.std_dev:.0%} "
+            "standard deviation; historical S&P 500 volatility is about 18%). "
+            "Unlike the deterministic calculator which assumes steady returns every year, this tests whether "
+            "your retirement plan survives **real-world market conditions** including crashes, bear markets, and varying sequences of returns.\n"
         )
         
         # Success rate context
@@ -256,7 +1033,7 @@ class MonteCarloSimulator:
             insights.append("#### Why Success Rate Differs from Deterministic Projection\n")
             insights.append(
                 "The deterministic calculator may show your balance growing throughout retirement with steady "
-                f"{self.inputs['investment_return']}% returns. However, the Monte Carlo reveals the critical risk: "
+                f"{self.inputs.investment_return}% returns. However, the Monte Carlo reveals the critical risk: "
                 "**sequence of returns risk**.\n"
             )
             
@@ -325,10 +1102,10 @@ class MonteCarloSimulator:
             )
             
             insights.append("\n#### 4. Bridge the Income Gap at Age 65\n")
-            current_age = self.inputs['current_age']
-            retirement_age = self.inputs['retirement_age']
-            part_time_income = self.inputs.get('part_time_income', 0)
-            pension = self.inputs.get('monthly_pension', 0)
+            current_age = self.inputs.current_age
+            retirement_age = self.inputs.retirement_age
+            part_time_income = self.inputs.part_time_income
+            pension = self.inputs.monthly_pension
             
             if part_time_income > pension:
                 gap = part_time_income - pension
@@ -342,9 +1119,9 @@ class MonteCarloSimulator:
                 )
             
             insights.append("\n#### 5. Increase Pre-Retirement Savings\n")
-            if self.inputs['current_age'] < self.inputs['retirement_age'] - 5:
+            if self.inputs.current_age < self.inputs.retirement_age - 5:
                 insights.append(
-                    f"You have {self.inputs['retirement_age'] - self.inputs['current_age']} years until retirement. "
+                    f"You have {self.inputs.retirement_age - self.inputs.current_age} years until retirement. "
                     f"Increasing monthly investments by even $200-500 compounds significantly:\n"
                     f"- Extra $300/month = ~$50,000+ more at retirement\n"
                     f"- Reduces withdrawal rate and improves success rate by 5-10%\n"
@@ -361,14 +1138,16 @@ class MonteCarloSimulator:
         
         # Market volatility context
         insights.append("\n### 📈 Understanding Market Volatility Impact\n")
+        volatility = self.return_model.std_dev * 100
         insights.append(
-            f"**Historical context:** The simulation uses 18% standard deviation, meaning:\n"
-            f"- 68% of years: returns between {self.inputs['investment_return'] - 18:.1f}% and "
-            f"{self.inputs['investment_return'] + 18:.1f}%\n"
-            f"- 95% of years: returns between {self.inputs['investment_return'] - 36:.1f}% and "
-            f"{self.inputs['investment_return'] + 36:.1f}%\n"
+            f"**Historical context:** The simulation's {self.return_model.name.replace('_', ' ')} returns have a "
+            f"{volatility:.0f}% standard deviation, meaning roughly:\n"
+            f"- 68% of years: returns between {self.inputs.investment_return - volatility:.1f}% and "
+            f"{self.inputs.investment_return + volatility:.1f}%\n"
+            f"- 95% of years: returns between {self.inputs.investment_return - 2 * volatility:.1f}% and "
+            f"{self.inputs.investment_return + 2 * volatility:.1f}%\n"
             f"- Occasional years with -30% to -40% returns (like 2008)\n\n"
-            f"This volatility is based on actual S&P 500 historical data and represents realistic market behavior.\n"
+            f"For comparison, historical S&P 500 volatility is about 18%.\n"
         )
         
         # Percentile insights
@@ -406,13 +1185,14 @@ class MonteCarloSimulator:
         return "".join(insights)
 
 
-def generate_monte_carlo_advice(mc_results: Dict, inputs: Dict, projection_results: Dict) -> str:
+def generate_monte_carlo_advice(mc_results: Dict, inputs: Union[Dict, PlanInputs], projection_results: Dict) -> str:
     """Generate comprehensive advice integrating Monte Carlo results with projection analysis"""
+    inputs = compile_inputs(inputs)
     advice_parts = []
     
     success_rate = mc_results['success_rate']
     projection = projection_results['projection']
-    retirement_age = inputs['retirement_age']
+    retirement_age = inputs.retirement_age
     
     advice_parts.append("\n\n---\n\n## 🎲 Monte Carlo Risk Analysis\n")
     
@@ -497,9 +1277,9 @@ def generate_monte_carlo_advice(mc_results: Dict, inputs: Dict, projection_resul
         advice_parts.append("\n### 🎯 Priority Actions to Improve Success Rate\n")
         
         # Calculate specific numbers for recommendations
-        current_monthly_income = inputs['retirement_year_one_income']
-        part_time_income = inputs.get('part_time_income', 0)
-        pension = inputs.get('monthly_pension', 0)
+        current_monthly_income = inputs.retirement_year_one_income
+        part_time_income = inputs.part_time_income
+        pension = inputs.monthly_pension
         
         advice_parts.append("\n**1. Reduce Early Retirement Spending (Most Impactful)**\n")
         reduction_10pct = current_monthly_income * 0.10
@@ -520,10 +1300,10 @@ def generate_monte_carlo_advice(mc_results: Dict, inputs: Dict, projection_resul
                 f"- Or reduce expenses by ${gap:,.0f}/month to match pension income\n"
             )
         
-        if inputs['current_age'] < retirement_age - 3:
+        if inputs.current_age < retirement_age - 3:
             advice_parts.append("\n**3. Increase Pre-Retirement Savings**\n")
-            current_monthly = inputs.get('monthly_investments', 0)
-            extra_300 = 300 * 12 * (retirement_age - inputs['current_age'])
+            current_monthly = inputs.monthly_investments
+            extra_300 = 300 * 12 * (retirement_age - inputs.current_age)
             advice_parts.append(
                 f"- Current monthly savings: ${current_monthly:,.0f}\n"
                 f"- Increasing by $300/month adds ~${extra_300:,.0f} by retirement\n"
@@ -588,3 +1368,64 @@ def generate_monte_carlo_advice(mc_results: Dict, inputs: Dict, projection_resul
         )
     
     return "".join(advice_parts)
+
+
+def compare_scenarios(scenarios: Dict[str, Dict], num_simulations: int = 2000, seed: Optional[int] = None,
+                      workers: int = 1, return_model: str = 'normal', std_dev: float = 0.18,
+                      inflation_model: Optional[str] = None, confidence: float = 0.95) -> Dict:
+    """
+    Monte Carlo comparison of several plans on common random numbers: every scenario is run
+    against the same return (and inflation) draws in one batched pass, so the success-rate
+    difference between two scenarios is measured path by path.
+    
+    The paired standard error of a difference is usually far below the independent-runs one
+    (both are reported), so a few thousand paths tell scenarios apart. Each scenario's return
+    model is built for its own inputs from the return_model name.
+    """
+    names = list(scenarios)
+    plans = [compile_inputs(inputs) for inputs in scenarios.values()]
+    schedules = [compile_cash_flows(inputs) for inputs in plans]
+    return_models = [build_return_model(return_model, inputs, std_dev) for inputs in plans]
+    inflation_models = [build_inflation_model(inflation_model, inputs) for inputs in plans]
+    if inflation_model is not None and getattr(return_models[0], 'include_inflation', False):
+        raise ValueError("the return model already replays historical inflation - leave inflation_model as None")
+    
+    root = np.random.SeedSequence(seed)
+    sizes = [min(PATHS_PER_STREAM, num_simulations - start) for start in range(0, num_simulations, PATHS_PER_STREAM)]
+    n = len(sizes)
+    job_args = ([schedules] * n, [return_models] * n, [inflation_models] * n, sizes, root.spawn(n))
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and n > 1:
+        parts = list(_get_executor(min(workers, n)).map(_run_comparison_chunk, *job_args))
+    else:
+        parts = list(map(_run_comparison_chunk, *job_args))
+    
+    successes = sum(part['successes'] for part in parts)
+    joint = sum(part['joint_successes'] for part in parts)
+    final_balances = np.concatenate([part['final_balances'] for part in parts])
+    rates = successes / num_simulations
+    # Paired difference d = y_a - y_b per path: E[d^2] = (n_a + n_b - 2 n_ab) / N
+    difference = rates[:, None] - rates[None, :]
+    mean_square = (successes[:, None] + successes[None, :] - 2 * joint) / num_simulations
+    paired_variance = np.maximum(mean_square - difference ** 2, 0) * num_simulations / max(num_simulations - 1, 1)
+    paired_std_error = np.sqrt(paired_variance / num_simulations)
+    rate_variance = rates * (1 - rates) / num_simulations
+    independent_std_error = np.sqrt(rate_variance[:, None] + rate_variance[None, :])
+    
+    def by_name(matrix: np.ndarray) -> Dict[str, Dict[str, float]]:
+        return {a: {b: float(matrix[i, j] * 100) for j, b in enumerate(names)} for i, a in enumerate(names)}
+    
+    return {
+        'scenarios': names,
+        'success_rate': {name: float(rates[i] * 100) for i, name in enumerate(names)},
+        'success_rate_ci': {name: wilson_interval(int(successes[i]), num_simulations, confidence)
+                            for i, name in enumerate(names)},
+        'median_final_balance': {name: float(np.median(final_balances[:, i])) for i, name in enumerate(names)},
+        # [a][b] = success rate of a minus success rate of b, in percentage points
+        'difference': by_name(difference),
+        'paired_std_error': by_name(paired_std_error),
+        'independent_std_error': by_name(independent_std_error),
+        'seed': root.entropy,
+        'num_simulations': num_simulations,
+        'confidence': confidence,
+    }
@@ -0,0 +1,95 @@
+"""Stochastic lifetimes for the Monte Carlo simulator, sampled for every path at once from a bundled life table"""
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Union
+
+from plan_inputs import PlanInputs, compile_inputs
+
+# Canadian period life table: qx by single year of age (0-110) for males and females
+LIFE_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'canadian_life_table.csv')
+
+# Sexes a lifetime can be drawn for; 'unisex' averages the male and female mortality rates
+SEXES = ('male', 'female', 'unisex')
+
+
+@lru_cache(maxsize=None)
+def load_life_table(path: str = LIFE_TABLE_PATH) -> pd.DataFrame:
+    """Life table (age, male, female death probabilities), loaded once per process"""
+    table = pd.read_csv(path, comment='#')
+    table['unisex'] = (table['male'] + table['female']) / 2
+    return table
+
+
+class LifeTableLongevity:
+    """
+    Age at death for every path, sampled by inverse transform from a life table - one person,
+    or both partners in couple mode, with the plan lasting until the last survivor dies.
+
+    Ages are on person 1's age axis (the plan's); partner_age_difference is how many years
+    older person 2 is. Plan cash flows don't change at the first death.
+    """
+
+    name = 'life_table'
+
+    def __init__(self, sex: str = 'unisex', couple: bool = False, sex_p2: str = 'unisex',
+                 partner_age_difference: int = 0, path: str = LIFE_TABLE_PATH):
+        for value in (sex, sex_p2):
+            if value not in SEXES:
+                raise ValueError(f"sex must be one of {list(SEXES)}")
+        self.sex = sex
+        self.couple = couple
+        self.sex_p2 = sex_p2
+        self.partner_age_difference = partner_age_difference
+        table = load_life_table(path)
+        self.ages = table['age'].to_numpy()
+        self.death_rates = {value: table[value].to_numpy() for value in SEXES}
+
+    @classmethod
+    def from_inputs(cls, inputs: PlanInputs) -> 'LifeTableLongevity':
+        """Lifetimes for a plan's household (unisex rates and same-age partners unless the inputs say otherwise)"""
+        return cls(sex=inputs.sex, couple=inputs.couple_mode, sex_p2=inputs.sex_p2,
+                   partner_age_difference=inputs.partner_age_difference)
+
+    def _death_ages(self, rng: np.random.Generator, num_paths: int, age: int, sex: str) -> np.ndarray:
+        """Age at death of num_paths people alive at age (dying during the year of that age or later)"""
+        age = int(min(max(age, self.ages[0]), self.ages[-1]))
+        death_rates = self.death_rates[sex][age:]
+        # Probability of having died by the end of each year from age on (reaches 1 at the table's end)
+        died_by = 1 - np.cumprod(1 - death_rates)
+        return age + np.searchsorted(died_by, rng.random(num_paths), side='right')
+
+    def death_ages(self, rng: np.random.Generator, num_paths: int, current_age: int) -> np.ndarray:
+        """Age (on person 1's axis) at which the household's last survivor dies, for every path"""
+        death_age = self._death_ages(rng, num_paths, current_age, self.sex)
+        if self.couple:
+            partner_age = current_age + self.partner_age_difference
+            partner_death = self._death_ages(rng, num_paths, partner_age, self.sex_p2) - self.partner_age_difference
+            death_age = np.maximum(death_age, partner_death)
+        return death_age
+
+    def params(self) -> Dict:
+        """Parameters that fully describe the model (used in cache keys and labels)"""
+        return {'sex': self.sex, 'couple': self.couple, 'sex_p2': self.sex_p2,
+                'partner_age_difference': self.partner_age_difference}
+
+    def __repr__(self):
+        args = ', '.join(f'{k}={v!r}' for k, v in self.params().items())
+        return f'{type(self).__name__}({args})'
+
+
+LONGEVITY_MODELS = {
+    'life_table': LifeTableLongevity,
+}
+
+
+def build_longevity_model(model: Union[None, str, LifeTableLongevity],
+                          inputs: Union[Dict, PlanInputs]) -> Optional[LifeTableLongevity]:
+    """Longevity model for a plan from a name in LONGEVITY_MODELS, an instance, or None for a fixed horizon"""
+    if model is None or isinstance(model, LifeTableLongevity):
+        return model
+    if model not in LONGEVITY_MODELS:
+        raise ValueError(f"longevity must be one of {sorted(LONGEVITY_MODELS)}, an instance or None")
+    return LONGEVITY_MODELS[model].from_inputs(compile_inputs(inputs))
@@ -2,9 +2,21 @@ import streamlit as st
 import pandas as pd
 import json
 from pathlib import Path
-from calculator import RetirementCalculator
+from results_cache import get_monte_carlo_comparison, get_projection_results
 import plotly.graph_objects as go
 
+# Paths per scenario for the Monte Carlo comparison - paired differences need far fewer than independent runs
+COMPARISON_SIMULATION_OPTIONS = [1000, 2000, 5000, 10000]
+# Return distributions: label -> return_models.RETURN_MODELS name
+COMPARISON_RETURN_MODELS = {
+    "Normal": 'normal',
+    "Fat-tailed (Student-t)": 'student_t',
+    "Lognormal": 'lognormal',
+    "Bull/bear regimes": 'regime_switching',
+    "Historical (block bootstrap)": 'historical',
+    "Recommended glide path (stocks/bonds/cash)": 'glide_path',
+}
+
 # Page config
 st.set_page_config(
     page_title="Scenario Comparison",
@@ -179,6 +191,7 @@ if st.button("🔄 Compare Scenarios", type="primary"):
     with st.spinner("Calculating scenarios..."):
         comparison_data = []
         scenario_projections = {}  # Store full projections for line charts
+        scenario_inputs = {}  # Store migrated inputs for the Monte Carlo comparison
         failed_scenarios = []
         
         for scenario_name in selected_scenarios:
@@ -217,20 +230,7 @@ if st.button("🔄 Compare Scenarios", type="primary"):
                     # Couple mode defaults
                     inputs.setdefault('couple_mode', False)
                 
-                # Ensure all required fields exist with defaults
-                inputs.setdefault('oas_start_age', 65)
-                inputs.setdefault('monthly_oas', 0)
-                inputs.setdefault('oas_inflation_adjusted', True)
-                inputs.setdefault('oas_start_age_p2', 999)
-                inputs.setdefault('monthly_oas_p2', 0)
-                inputs.setdefault('oas_inflation_adjusted_p2', True)
-                inputs.setdefault('cpp_start_age', 70)
-                inputs.setdefault('monthly_cpp', 0)
-                inputs.setdefault('cpp_inflation_adjusted', True)
-                inputs.setdefault('cpp_start_age_p2', 999)
-                inputs.setdefault('monthly_cpp_p2', 0)
-                inputs.setdefault('cpp_inflation_adjusted_p2', True)
-                inputs.setdefault('couple_mode', False)
+                # Fields still missing get the engines' defaults when the plan is compiled (plan_inputs.PlanInputs)
                 
                 # CRITICAL: Ensure current_age exists
                 if 'current_age' not in inputs or inputs['current_age'] is None:
@@ -245,14 +245,14 @@ if st.button("🔄 Compare Scenarios", type="primary"):
                         inputs['current_age'] = inputs.get('retirement_age', 65) - 5
                 
                 # Calculate results
-                calculator = RetirementCalculator(inputs)
-                results = calculator.calculate()
-                df = pd.DataFrame(results['projection'])
+                results = get_projection_results(inputs)
+                df = results['projection'].to_frame()
                 retirement_age = inputs['retirement_age']
                 current_age = inputs['current_age']
                 
                 # Store full projection for line charts
                 scenario_projections[scenario_name] = df
+                scenario_inputs[scenario_name] = inputs
                 
                 # Get balance at retirement
                 retirement_row = df[df['Age'] == retirement_age]
@@ -337,6 +337,8 @@ if st.button("🔄 Compare Scenarios", type="primary"):
         if comparison_data:
             st.session_state.comparison_data = comparison_data
             st.session_state.scenario_projections = scenario_projections
+            st.session_state.comparison_inputs = scenario_inputs
+            st.session_state.pop('mc_comparison', None)
         else:
             st.error("❌ No scenarios could be loaded. Please check that the scenario files exist.")
             st.stop()
@@ -825,6 +827,61 @@ if 'comparison_data' in st.session_state and st.session_state.comparison_data:
         - Age: **{earliest_retirement['Retirement Age']:.0f}**
         """)
     
+    # Monte Carlo comparison on common random numbers
+    st.subheader("🎲 Monte Carlo Comparison")
+    st.markdown("Runs every scenario against the **same** simulated markets, so differences in success rate "
+                "come from the plans rather than from luck of the draw.")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        mc_paths = st.selectbox("Simulations per scenario", COMPARISON_SIMULATION_OPTIONS, index=1)
+    with col2:
+        mc_model_label = st.selectbox("Return Distribution", list(COMPARISON_RETURN_MODELS))
+    with col3:
+        mc_std_dev = st.number_input("Market Volatility (Standard Deviation)", 0.10, 0.30, 0.18, step=0.01)
+    
+    # Paired differences need at least two scenarios that calculated
+    comparable = len(st.session_state.comparison_inputs) >= 2
+    if not comparable:
+        st.info("ℹ️ At least two scenarios must calculate successfully to compare them on shared markets.")
+    
+    if st.button("🎲 Run Monte Carlo Comparison", disabled=not comparable):
+        with st.spinner(f"Simulating {len(st.session_state.comparison_inputs)} scenarios on {mc_paths:,} "
+                        f"shared market paths..."):
+            st.session_state.mc_comparison = get_monte_carlo_comparison(
+                st.session_state.comparison_inputs, num_simulations=mc_paths,
+                return_model=COMPARISON_RETURN_MODELS[mc_model_label], std_dev=mc_std_dev)
+    
+    if comparable and st.session_state.get('mc_comparison'):
+        mc = st.session_state.mc_comparison
+        names = mc['scenarios']
+        success_df = pd.DataFrame({
+            'Scenario': names,
+            'Success Rate': [f"{mc['success_rate'][name]:.1f}%" for name in names],
+            '95% CI': [f"{mc['success_rate_ci'][name][0]:.1f}% - {mc['success_rate_ci'][name][1]:.1f}%"
+                       for name in names],
+            'Median Final Balance': [f"${mc['median_final_balance'][name]:,.0f}" for name in names],
+        })
+        st.dataframe(success_df, use_container_width=True, hide_index=True)
+        
+        st.markdown("**Paired differences** (row minus column, percentage points ± standard error)")
+        difference_df = pd.DataFrame(
+            [[f"{mc['difference'][a][b]:+.1f} ± {mc['paired_std_error'][a][b]:.2f}" if a != b else "-"
+              for b in names] for a in names],
+            index=names, columns=names
+        )
+        st.dataframe(difference_df, use_container_width=True)
+        
+        # How much sharing the markets tightened the comparison, averaged over every pair
+        pairs = [(a, b) for i, a in enumerate(names) for b in names[i + 1:]]
+        if pairs:
+            paired = sum(mc['paired_std_error'][a][b] for a, b in pairs) / len(pairs)
+            independent = sum(mc['independent_std_error'][a][b] for a, b in pairs) / len(pairs)
+            st.caption(f"💡 A difference larger than about twice its standard error is unlikely to be chance. "
+                       f"Shared markets give an average standard error of {paired:.2f} points versus "
+                       f"{independent:.2f} for independent runs of {mc['num_simulations']:,} simulations each. "
+                       f"Seed: {mc['seed']}")
+    
     # Export comparison
     st.subheader("💾 Export Comparison")
     
@@ -1,14 +1,61 @@
 import streamlit as st
 import pandas as pd
 import sys
-import hashlib
-import json
 from pathlib import Path
 
 # Add parent directory to path to import modules
 sys.path.append(str(Path(__file__).parent.parent))
 from monte_carlo import MonteCarloSimulator
-from charts import create_monte_carlo_percentile_chart, create_failure_age_histogram
+from results_cache import fingerprint_inputs, get_monte_carlo_results
+from mortality import LifeTableLongevity
+from return_models import HistoricalBootstrapReturns
+from charts import create_monte_carlo_percentile_chart, create_failure_age_histogram, create_path_cohort_chart
+
+# Runs larger than this use a process pool (smaller ones finish faster than the dispatch overhead)
+# and streaming percentile sketches instead of keeping every path's balances
+PARALLEL_THRESHOLD = 10000
+# Confidence-interval half-width (percentage points) adaptive runs stop at
+ADAPTIVE_TARGET_PRECISION = 0.5
+# Variance-reduction choices: label -> (sampling, control_variate)
+VARIANCE_REDUCTION_OPTIONS = {
+    "None": ('random', False),
+    "Antithetic paths": ('antithetic', False),
+    "Quasi-random (Sobol)": ('sobol', False),
+    "Control variate": ('random', True),
+    "Sobol + control variate": ('sobol', True),
+}
+# Return distributions: label -> return_models.RETURN_MODELS name
+RETURN_MODEL_OPTIONS = {
+    "Normal": 'normal',
+    "Fat-tailed (Student-t)": 'student_t',
+    "Lognormal": 'lognormal',
+    "Bull/bear regimes": 'regime_switching',
+    "Historical (block bootstrap)": 'historical',
+    "Historical returns + inflation": 'historical_inflation',
+    "Recommended glide path (stocks/bonds/cash)": 'glide_path',
+}
+# Path drill-down cohorts: label -> (path_store.COHORT_ORDERS order, fraction of paths, worst first)
+PATH_COHORT_OPTIONS = {
+    "Worst 5% by final balance": ('final_balance', 0.05, True),
+    "Earliest 5% to run out": ('failure_age', 0.05, True),
+    "Best 5% by final balance": ('final_balance', 0.05, False),
+}
+# Retirement withdrawal strategies: label -> withdrawal_policies.WITHDRAWAL_POLICIES name (None = the plan's)
+WITHDRAWAL_POLICY_OPTIONS = {
+    "Fixed (your plan's withdrawals)": None,
+    "Guyton-Klinger guardrails": 'guardrails',
+    "Variable percentage (VPW)": 'vpw',
+    "RRIF minimum floor": 'rrif_minimum',
+    "4% of balance within a spending floor and ceiling": 'floor_ceiling',
+}
+# Life-table sex choices: label -> mortality.SEXES name
+SEX_OPTIONS = {"Not specified": 'unisex', "Female": 'female', "Male": 'male'}
+# Goal-seek questions: label -> monte_carlo.SOLVER_PARAMETERS name
+GOAL_SEEK_OPTIONS = {
+    "Maximum monthly retirement income": 'retirement_year_one_income',
+    "Earliest retirement age": 'retirement_age',
+    "Minimum monthly investments": 'monthly_investments',
+}
 
 st.set_page_config(
     page_title="Monte Carlo Simulation",
@@ -158,15 +205,14 @@ results = st.session_state.results
 if 'mc_inputs_hash' not in st.session_state:
     st.session_state.mc_inputs_hash = None
 
-# Create a hash of current inputs to detect changes
-import hashlib
-import json
-current_hash = hashlib.md5(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+# Create a hash of current inputs to detect changes (same fingerprint the results cache uses)
+current_hash = fingerprint_inputs(inputs)
 
-# If inputs changed, clear old Monte Carlo results
+# If inputs changed, clear old Monte Carlo results (and the goal seek solved against them)
 if st.session_state.mc_inputs_hash != current_hash:
-    if 'mc_results' in st.session_state:
-        del st.session_state.mc_results
+    for key in ('mc_results', 'goal_seek'):
+        if key in st.session_state:
+            del st.session_state[key]
     st.session_state.mc_inputs_hash = current_hash
     if st.session_state.mc_inputs_hash is not None:
         st.info("ℹ️ Your inputs have changed. Please run a new Monte Carlo simulation.")
@@ -195,7 +241,7 @@ st.markdown("---")
 st.markdown("""
 ### 🎯 What This Simulation Tests
 
-This Monte Carlo analysis runs 10,000 scenarios to test whether your retirement savings will **last until age 100** 
+This Monte Carlo analysis runs thousands of scenarios to test whether your retirement savings will **last until age 100** 
 under realistic market conditions. It's testing the **sustainability** of your withdrawals, not just whether you'll 
 have money at retirement.
 
@@ -210,7 +256,7 @@ The simulation accounts for all of these risks to give you a realistic success p
 st.markdown("---")
 
 st.markdown("""
-Test your retirement plan against 10,000 different market scenarios to assess robustness.
+Test your retirement plan against thousands of different market scenarios to assess robustness.
 
 **Why might Monte Carlo show lower success than the baseline projection?**
 
@@ -224,7 +270,7 @@ The Monte Carlo simulation uses **realistic variable returns**:
 **Sequence of Returns Risk:** If you get bad returns early in retirement (when withdrawing), you can run out of money even if the long-term average is good. This is why a 35% success rate with a $2.5M baseline is possible - 65% of scenarios hit bad markets at the wrong time.
 
 **What the simulation tests:**
-- **Market volatility** (18% standard deviation - historical S&P 500)
+- **Market volatility** (18% standard deviation by default - historical S&P 500)
 - **Sequence of returns risk** (crashes during withdrawal phase)
 - **Real-world market patterns** (not constant returns)
 
@@ -232,26 +278,107 @@ A success rate of **80% or higher** is considered robust for retirement planning
 """)
 
 # Simulation parameters
-col1, col2 = st.columns(2)
+col1, col2, col3 = st.columns(3)
 with col1:
     num_simulations = st.number_input("Number of Simulations", 1000, 50000, 10000, step=1000,
                                       help="More simulations = more accurate but slower")
 with col2:
     std_dev = st.number_input("Market Volatility (Standard Deviation)", 0.10, 0.30, 0.18, step=0.01,
                               help="Historical S&P 500 volatility is ~18%")
+with col3:
+    seed = st.number_input("Random Seed (optional)", min_value=0, value=None, step=1,
+                           help="Same seed and inputs always reproduce the exact same results. Leave blank for a fresh random run; with a seed, a tweaked plan re-simulates only from the first changed age.")
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    return_model_label = st.selectbox("Return Distribution", list(RETURN_MODEL_OPTIONS),
+                                      help="Fat tails and bull/bear regimes add more extreme and clustered bad years "
+                                           "with the same average return and volatility. Historical modes replay "
+                                           "5-year blocks of US market history (1928-2023), shifted to your "
+                                           "expected return, and ignore the volatility setting. The glide path "
+                                           "simulates the stock/bond/cash allocation recommended in your advice, "
+                                           "rebalanced every year.")
+with col2:
+    variance_reduction = st.selectbox("Variance Reduction", list(VARIANCE_REDUCTION_OPTIONS),
+                                      help="Sampling techniques that give the same precision with fewer simulations")
+with col3:
+    adaptive = st.checkbox("Stop early once the success rate is precise to ±0.5 percentage points", value=False,
+                           help="Runs simulations in batches until the 95% confidence interval on the success rate "
+                                "is within ±0.5 points, using the number above as the maximum")
+sampling, control_variate = VARIANCE_REDUCTION_OPTIONS[variance_reduction]
+stochastic_inflation = st.checkbox("Stochastic inflation", value=False,
+                                   disabled=RETURN_MODEL_OPTIONS[return_model_label] == 'historical_inflation',
+                                   help="Inflation varies year to year around your inflation rate (mean-reverting, "
+                                        "fitted to post-1950 US CPI and correlated with market returns), and every "
+                                        "inflation-indexed income and expense follows each scenario's own prices")
+withdrawal_label = st.selectbox("Withdrawal Strategy", list(WITHDRAWAL_POLICY_OPTIONS),
+                                help="Guardrails cut or raise spending 10% when the withdrawal rate drifts 20% from "
+                                     "where it started. VPW withdraws a market-dependent share of the balance that "
+                                     "lasts to 100. The RRIF floor never withdraws less than the RRIF minimum. The "
+                                     "floor/ceiling option spends 4% of the balance but between 85% and 125% of "
+                                     "your target income.")
+withdrawal_policy = WITHDRAWAL_POLICY_OPTIONS[withdrawal_label]
+stochastic_lifespan = st.checkbox("Stochastic lifespan", value=False, disabled=sampling == 'antithetic',
+                                  help="Each scenario draws an age at death (for both partners in couple mode) from "
+                                       "a Canadian life table and ends when the last survivor dies, so the plan "
+                                       "fails only if money runs out before death. Not available with antithetic "
+                                       "paths.")
+longevity = None
+if stochastic_lifespan and sampling != 'antithetic':
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sex = st.selectbox("Sex (Person 1)", list(SEX_OPTIONS))
+    if inputs.get('couple_mode', False):
+        with col2:
+            sex_p2 = st.selectbox("Sex (Person 2)", list(SEX_OPTIONS))
+        with col3:
+            partner_age_difference = st.number_input("Person 2 is older by (years)", -30, 30, 0,
+                                                     help="Negative if Person 2 is younger")
+        longevity = LifeTableLongevity(SEX_OPTIONS[sex], couple=True, sex_p2=SEX_OPTIONS[sex_p2],
+                                       partner_age_difference=int(partner_age_difference))
+    else:
+        longevity = LifeTableLongevity(SEX_OPTIONS[sex])
+monthly_steps = st.checkbox("Monthly time step", value=False,
+                            help="Steps every scenario month by month - contributions and withdrawals a twelfth "
+                                 "at a time, with monthly returns that compound to the same yearly returns - so "
+                                 "a plan can fail partway through a year. Slower than yearly steps.")
+time_step = 'monthly' if monthly_steps else 'annual'
+store_paths = st.checkbox("Keep every scenario for drill-down", value=False,
+                          help="Writes every scenario's year-by-year balance and returns to a temporary file, "
+                               "so you can inspect the worst scenarios or any single one without re-running")
+return_model = RETURN_MODEL_OPTIONS[return_model_label]
+inflation_model = 'ar1' if stochastic_inflation and return_model != 'historical_inflation' else None
+if return_model == 'historical_inflation':
+    # Replay history's inflation alongside its returns, centred on the plan's assumptions
+    return_model = HistoricalBootstrapReturns(inputs['investment_return'] / 100, include_inflation=True,
+                                              inflation_mean=inputs['yearly_inflation'] / 100)
 
 if st.button("Run Monte Carlo Simulation", type="primary"):
     with st.spinner(f"Running {num_simulations:,} simulations... This may take a moment."):
-        simulator = MonteCarloSimulator(inputs, num_simulations=num_simulations)
-        # Override std_dev if user changed it
-        mc_results = simulator.run_simulation()
+        # Large runs are split across all CPU cores and keep bounded-memory percentile sketches
+        large_run = num_simulations > PARALLEL_THRESHOLD
+        mc_results = get_monte_carlo_results(inputs, num_simulations=num_simulations,
+                                             seed=int(seed) if seed is not None else None,
+                                             workers=None if large_run else 1,
+                                             percentile_mode='sketch' if large_run else 'exact',
+                                             target_precision=ADAPTIVE_TARGET_PRECISION if adaptive else None,
+                                             sampling=sampling, control_variate=control_variate,
+                                             return_model=return_model, std_dev=std_dev,
+                                             inflation_model=inflation_model, longevity=longevity,
+                                             withdrawal_policy=withdrawal_policy, time_step=time_step,
+                                             store_paths=store_paths)
         st.session_state.mc_results = mc_results
+        # Models the results came from, so the insights describe the same simulation
+        st.session_state.mc_settings = {'return_model': return_model, 'std_dev': std_dev,
+                                        'inflation_model': inflation_model, 'longevity': longevity,
+                                        'withdrawal_policy': withdrawal_policy, 'time_step': time_step}
         st.success("✅ Simulation complete!")
 
 # Display results if they exist
 if 'mc_results' in st.session_state and st.session_state.mc_results:
     mc_results = st.session_state.mc_results
-    simulator = MonteCarloSimulator(inputs, num_simulations=num_simulations)
+    simulator = MonteCarloSimulator(inputs, num_simulations=mc_results['num_simulations'],
+                                    **st.session_state.get('mc_settings', {}))
     
     success_rate = mc_results['success_rate']
     rating, interpretation = simulator.get_interpretation(success_rate)
@@ -264,7 +391,40 @@ if 'mc_results' in st.session_state and st.session_state.mc_results:
     with col2:
         st.metric("Rating", rating)
     with col3:
-        st.metric("Successful Scenarios", f"{mc_results['successes']:,} / {num_simulations:,}")
+        st.metric("Successful Scenarios", f"{mc_results['successes']:,} / {mc_results['num_simulations']:,}")
+    
+    ci_low, ci_high = mc_results['success_rate_ci']
+    st.caption(f"📏 {mc_results['confidence']:.0%} confidence interval: {ci_low:.1f}% - {ci_high:.1f}% "
+               f"(±{mc_results['ci_half_width']:.2f} points from {mc_results['num_simulations']:,} simulations)")
+    if mc_results['converged'] is False:
+        st.caption("⚠️ Reached the maximum number of simulations before the target precision")
+    if mc_results.get('longevity'):
+        st.caption(f"⏳ Probability of running out of money before death: {mc_results['probability_of_ruin']:.1f}% "
+                   f"(median age at last death {mc_results['median_death_age']:.0f}; "
+                   f"{mc_results['outlives_plan_rate']:.1f}% of households outlive the age-100 horizon and are "
+                   f"judged at 100)")
+    if mc_results.get('spending_stats'):
+        spending = mc_results['spending_stats']
+        st.subheader("📉 Spending Stability")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Spending Volatility", f"{spending['volatility']:.1f}%",
+                      help="Typical scenario's standard deviation of year-over-year changes in real spending")
+        with col2:
+            st.metric("Typical Largest Cut", f"{spending['median_max_cut']:.1f}%",
+                      help="Largest single-year cut in real spending in the median scenario (planned age-based "
+                           "reductions count too)")
+        with col3:
+            st.metric("Largest Cut (Worst 10%)", f"{spending['p90_max_cut']:.1f}%")
+        with col4:
+            st.metric("Years Below Target", f"{spending['years_below_target']:.1f}%",
+                      help="Share of retirement years spending fell short of your target income")
+    if mc_results.get('resumed_from_age') is not None:
+        st.caption(f"⚡ Re-simulated from age {mc_results['resumed_from_age']} - earlier ages are unchanged "
+                   f"from the previous run")
+    
+    if mc_results.get('seed') is not None:
+        st.caption(f"🔁 Seed: {mc_results['seed']} - re-run with this seed to reproduce these results exactly")
     
     # Interpretation
     if success_rate >= 80:
@@ -301,8 +461,8 @@ if 'mc_results' in st.session_state and st.session_state.mc_results:
     
     # Balance percentiles chart
     st.subheader("Balance Projections Across Scenarios")
-    st.markdown("""
-    This chart shows how your investment balance evolves across 10,000 different market scenarios:
+    st.markdown(f"""
+    This chart shows how your investment balance evolves across {mc_results['num_simulations']:,} different market scenarios:
     
     - **Blue line (median)**: The middle outcome - half of scenarios do better, half do worse
     - **Dark blue band (25th-75th percentile)**: Where 50% of scenarios fall - the "typical" range
@@ -314,18 +474,34 @@ if 'mc_results' in st.session_state and st.session_state.mc_results:
     withdrawals reduce balance. If the median line stays well above zero, your plan is robust.
     """)
     
-    ages = list(mc_results['percentile_data'].keys())
-    
     st.plotly_chart(
         create_monte_carlo_percentile_chart(mc_results, inputs['retirement_age']),
         use_container_width=True
     )
     
+    # Drill down into individual scenarios, read from the run's memory-mapped path store
+    path_store = getattr(mc_results, 'path_store', None)
+    if path_store is not None:
+        st.subheader("🔍 Scenario Drill-Down")
+        cohort_label = st.selectbox("Scenarios to show", list(PATH_COHORT_OPTIONS))
+        order, fraction, worst = PATH_COHORT_OPTIONS[cohort_label]
+        cohort = path_store.cohort(fraction, order, worst)
+        st.plotly_chart(
+            create_path_cohort_chart(path_store.ages, path_store.path_balances(cohort),
+                                     inputs['retirement_age'], f"{cohort_label} ({len(cohort):,} scenarios)"),
+            use_container_width=True
+        )
+        rank = st.number_input("Scenario in this group (1 = most extreme)", 1, len(cohort), 1)
+        path = path_store.path(int(cohort[rank - 1]))
+        path['Return'] = path['Return'] * 100
+        st.dataframe(path.style.format({'Balance': '${:,.0f}', 'Return': '{:+.1f}%'}),
+                     use_container_width=True, hide_index=True)
+    
     # Key insights
     st.subheader("Key Insights")
     
-    st.markdown("""
-    These statistics summarize the 10,000 scenarios to help you understand the range of possible outcomes:
+    st.markdown(f"""
+    These statistics summarize the {mc_results['num_simulations']:,} scenarios to help you understand the range of possible outcomes:
     
     - **Median final balance**: The middle outcome at age 100 - half of scenarios end with more, half with less
     - **Best case**: The most optimistic scenario (top 1%) - everything goes right with markets
@@ -416,7 +592,10 @@ if 'mc_results' in st.session_state and st.session_state.mc_results:
     
     with col2:
         st.markdown("**Monte Carlo (Variable Returns):**")
-        st.markdown(f"- Average return: {inputs['investment_return']:.1f}% (with 18% volatility)")
+        # Volatility the results were simulated with, for the models that take it from the setting
+        volatility = (f" (with {st.session_state.mc_settings['std_dev']:.0%} volatility)"
+                      if simulator.return_model.uses_std_dev else "")
+        st.markdown(f"- Average return: {inputs['investment_return']:.1f}%{volatility}")
         st.markdown(f"- Median final balance: ${mc_median:,.0f}")
         st.markdown(f"- Success rate: {success_rate:.1f}%")
         st.markdown("- ✅ Realistic - accounts for market ups and downs")
@@ -437,3 +616,45 @@ if 'mc_results' in st.session_state and st.session_state.mc_results:
     
     Both have the same average return, but Scenario B fails because of bad timing!
     """)
+
+# Goal seek: solve for the plan input that just reaches a target success rate
+st.markdown("---")
+st.header("🎯 Goal Seek")
+st.markdown("Find the value that just reaches a target success rate, using the simulation settings above "
+            "with every other input unchanged.")
+
+col1, col2 = st.columns(2)
+with col1:
+    goal_label = st.selectbox("Solve for", list(GOAL_SEEK_OPTIONS))
+with col2:
+    target_success_rate = st.number_input("Target Success Rate (%)", 50.0, 99.0, 90.0, step=1.0)
+
+if st.button("🎯 Solve", type="primary"):
+    with st.spinner("Searching on a shared set of market scenarios..."):
+        solver = MonteCarloSimulator(inputs, num_simulations=num_simulations,
+                                     seed=int(seed) if seed is not None else None,
+                                     sampling=sampling, return_model=return_model, std_dev=std_dev,
+                                     inflation_model=inflation_model, longevity=longevity,
+                                     withdrawal_policy=withdrawal_policy, time_step=time_step)
+        st.session_state.goal_seek = solver.solve(GOAL_SEEK_OPTIONS[goal_label], target_success_rate)
+
+if st.session_state.get('goal_seek'):
+    goal = st.session_state.goal_seek
+    parameter = goal['parameter']
+    if not goal['achievable']:
+        st.warning(f"⚠️ No value within the search range reaches {goal['target_success_rate']:.0f}% - the best "
+                   f"reaches {goal['success_rate']:.1f}%")
+    else:
+        if parameter == 'retirement_age':
+            value, current = f"Age {goal['value']}", f"Age {inputs[parameter]}"
+        else:
+            value, current = f"${goal['value']:,.0f}/month", f"${inputs[parameter]:,.0f}/month"
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric([label for label, name in GOAL_SEEK_OPTIONS.items() if name == parameter][0], value)
+        with col2:
+            st.metric("Success Rate", f"{goal['success_rate']:.1f}%")
+        with col3:
+            st.metric("Your Plan", current)
+        st.caption(f"🔁 Solved in {len(goal['trials'])} trials on the same {goal['num_simulations']:,} scenarios "
+                   f"(seed {goal['seed']}) - re-run the simulation with this seed to reproduce the success rate")
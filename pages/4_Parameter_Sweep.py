@@ -0,0 +1,134 @@
+import streamlit as st
+import numpy as np
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.append(str(Path(__file__).parent.parent))
+from results_cache import get_parameter_sweep
+from charts import create_sweep_heatmap
+
+# Spending grid step choices (monthly, today's dollars)
+INCOME_STEP_OPTIONS = [100, 250, 500, 1000]
+# Slider bounds: retirement ages and monthly income target ($, today's dollars)
+RETIREMENT_AGE_RANGE = (50, 75)
+INCOME_RANGE = (1000, 40000)
+# Largest grid evaluated at once (retirement ages x spending levels)
+MAX_GRID_CELLS = 5000
+
+st.set_page_config(
+    page_title="Parameter Sweep",
+    page_icon="🗺️",
+    layout="wide"
+)
+
+# Responsive styling - COMPACT for desktop/tablet
+st.markdown("""
+    <style>
+        .block-container {
+            padding-top: 0.5rem;
+            max-width: 100%;
+        }
+        h1 {
+            margin-top: 0.3rem;
+            margin-bottom: 0.3rem;
+            font-size: 1.4rem;
+            line-height: 1.2;
+        }
+        h2 {
+            margin-top: 0.2rem;
+            margin-bottom: 0.2rem;
+            font-size: 1.1rem;
+        }
+    </style>
+    """, unsafe_allow_html=True)
+
+st.title("🗺️ Retirement Age vs Spending")
+
+# Check if we have inputs from the main page
+if 'inputs' not in st.session_state or 'results' not in st.session_state:
+    st.warning("⚠️ Please calculate your retirement plan on the main page first!")
+    st.markdown("Go back to the main page and click 'Calculate Retirement Plan' to generate your baseline projection.")
+    st.stop()
+
+inputs = st.session_state.inputs
+
+st.markdown("""
+See how every combination of retirement age and monthly spending plays out, instead of trying them one
+at a time. The whole grid is projected in one batch with the same constant-return assumptions as the main
+page, so each cell matches what **Calculate** would show for that plan.
+""")
+
+current_age = inputs['current_age']
+current_income = float(inputs['retirement_year_one_income'])
+min_age = max(current_age, RETIREMENT_AGE_RANGE[0])
+if min_age >= RETIREMENT_AGE_RANGE[1]:
+    st.info(f"ℹ️ The sweep covers retirement ages up to {RETIREMENT_AGE_RANGE[1]} - at {current_age} there are "
+            f"no later retirement ages left to compare.")
+    st.stop()
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    retirement_ages = st.slider("Retirement ages", min_age, RETIREMENT_AGE_RANGE[1],
+                                (max(min_age, 55), max(min_age, 70)))
+with col2:
+    income_step = st.selectbox("Spending step ($/month)", INCOME_STEP_OPTIONS, index=1)
+with col3:
+    # Default to 60-140% of the current target, kept inside the slider
+    low, high = INCOME_RANGE
+    default_range = tuple(min(max(income, low), high) for income in
+                          (int(current_income * 0.6) // 1000 * 1000, int(current_income * 1.4) // 1000 * 1000 + 1000))
+    income_range = st.slider("Monthly income target range ($, today's dollars)", low, high, default_range, step=500)
+
+ages = np.arange(retirement_ages[0], retirement_ages[1] + 1)
+incomes = np.arange(income_range[0], income_range[1] + income_step / 2, income_step)
+if len(ages) * len(incomes) > MAX_GRID_CELLS:
+    st.warning(f"⚠️ That grid has {len(ages) * len(incomes):,} plans - narrow the ranges or use a larger "
+               f"spending step (at most {MAX_GRID_CELLS:,}).")
+    st.stop()
+
+with st.spinner(f"Projecting {len(ages) * len(incomes):,} plans..."):
+    sweep = get_parameter_sweep(inputs, ages, incomes)
+st.caption(f"📐 {len(ages)} retirement ages × {len(incomes)} spending levels = {len(ages) * len(incomes):,} plans")
+
+current = (inputs['retirement_age'], current_income)
+
+st.subheader("Financial Health Score")
+st.caption("💡 🟢 100 (always ≥$1.6M) | 🟡 75 (always ≥$1.2M) | 🟠 50 (always ≥$500K) | 🔴 25 (below $500K) "
+           "| ❌ 0 (money runs out before 100)")
+st.plotly_chart(
+    create_sweep_heatmap(sweep['health_score'], ages, incomes, 'Financial Health Score', 'Score',
+                         hover_format='.0f', current=current),
+    use_container_width=True
+)
+
+col1, col2 = st.columns(2)
+with col1:
+    st.subheader("Age Money Runs Out")
+    # Plans that last to 100 show as 100, so the scale runs from earliest depletion to fully funded
+    depletion_age = np.where(sweep['depletion_age'] > 0, sweep['depletion_age'], 100)
+    st.plotly_chart(
+        create_sweep_heatmap(depletion_age, ages, incomes, 'Depletion Age (100 = lasts)', 'Age',
+                             hover_format='.0f', current=current),
+        use_container_width=True
+    )
+with col2:
+    st.subheader("Balance at 100")
+    st.plotly_chart(
+        create_sweep_heatmap(sweep['final_balance'], ages, incomes, 'Final Balance', 'Balance ($)',
+                             colorscale='Blues', current=current),
+        use_container_width=True
+    )
+
+# Highest sustainable spending at each retirement age
+st.subheader("Highest Spending That Lasts to 100")
+funded = sweep['depletion_age'] == 0
+rows = []
+for i, age in enumerate(ages):
+    lasting = incomes[funded[i]]
+    rows.append({
+        'Retirement Age': int(age),
+        'Max Monthly Income': f"${lasting.max():,.0f}" if len(lasting) else "-",
+        'Years of Work Left': int(age - current_age),
+    })
+st.dataframe(rows, use_container_width=True, hide_index=True)
@@ -0,0 +1,88 @@
+"""Memory-mapped store of every simulated path's balances and returns, for drilling into paths without re-simulating"""
+import os
+import shutil
+import tempfile
+import weakref
+
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+# Stores live in their own subdirectory of the system temp directory, one directory per run
+PATH_STORE_DIR = os.path.join(tempfile.gettempdir(), 'retirement_planner_paths')
+
+# Orders a tail cohort can be taken from (worst paths first)
+COHORT_ORDERS = ('final_balance', 'failure_age')
+
+
+class PathStore:
+    """
+    (paths x ages) float32 balance and return matrices in np.memmap files, filled chunk by
+    chunk as a run merges them, plus indexes of the paths sorted by final balance and by
+    failure age. Only the rows a caller asks for are paged into memory; the files are
+    deleted when the store is garbage collected (or the process exits).
+    """
+
+    def __init__(self, capacity: int, ages: np.ndarray, directory: Optional[str] = None):
+        os.makedirs(PATH_STORE_DIR, exist_ok=True)
+        self.directory = directory or tempfile.mkdtemp(dir=PATH_STORE_DIR)
+        self.ages = ages
+        self.num_paths = 0
+        shape = (capacity, len(ages))
+        self.balances = np.memmap(os.path.join(self.directory, 'balances.f32'), np.float32, 'w+', shape=shape)
+        self.returns = np.memmap(os.path.join(self.directory, 'returns.f32'), np.float32, 'w+', shape=shape)
+        # Per-path outcomes are small enough to stay in memory: failure age (0 = never failed) and final balance
+        self.failure_age = np.zeros(capacity, dtype=np.int16)
+        self.final_balance = np.zeros(capacity, dtype=np.float32)
+        self.by_final_balance = None
+        self.by_failure_age = None
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def write(self, row_offset: int, balances: np.ndarray, returns: np.ndarray, failure_age: np.ndarray,
+              final_balance: np.ndarray):
+        """Copy one chunk's paths into the rows starting at row_offset"""
+        rows = slice(row_offset, row_offset + len(balances))
+        self.balances[rows] = balances
+        self.returns[rows] = returns
+        self.failure_age[rows] = failure_age
+        self.final_balance[rows] = final_balance
+
+    def finish(self, num_paths: int):
+        """Flush the files and index the num_paths paths written (adaptive runs can stop short of capacity)"""
+        self.balances.flush()
+        self.returns.flush()
+        self.num_paths = num_paths
+        self.failure_age = self.failure_age[:num_paths]
+        self.final_balance = self.final_balance[:num_paths]
+        self.by_final_balance = np.argsort(self.final_balance, kind='stable')
+        # Earliest failures first, then the paths that never failed; ties by final balance
+        failure_key = np.where(self.failure_age > 0, self.failure_age, np.iinfo(np.int16).max)
+        self.by_failure_age = np.lexsort((self.final_balance, failure_key))
+
+    def cohort(self, fraction: float, order: str = 'final_balance', worst: bool = True) -> np.ndarray:
+        """Indexes of the worst (or best) fraction of paths by final balance or failure age, worst first"""
+        if order not in COHORT_ORDERS:
+            raise ValueError(f"order must be one of {list(COHORT_ORDERS)}")
+        index = self.by_final_balance if order == 'final_balance' else self.by_failure_age
+        count = max(1, int(round(self.num_paths * fraction)))
+        return index[:count] if worst else index[::-1][:count]
+
+    def path_balances(self, paths: np.ndarray) -> np.ndarray:
+        """(len(paths) x ages) balances of the given paths, read from disk in file order"""
+        paths = np.asarray(paths)
+        order = np.argsort(paths)
+        rows = np.empty((len(paths), len(self.ages)), dtype=np.float32)
+        rows[order] = self.balances[paths[order]]
+        return rows
+
+    def path(self, index: int) -> pd.DataFrame:
+        """One path's year-by-year balance and return"""
+        return pd.DataFrame({
+            'Age': self.ages,
+            'Balance': np.asarray(self.balances[index], dtype=float),
+            'Return': np.asarray(self.returns[index], dtype=float),
+        })
+
+    def delete(self):
+        """Remove the files now rather than when the store is garbage collected"""
+        self._cleanup()
@@ -0,0 +1,233 @@
+"""Typed plan inputs compiled once from an inputs dict, with the defaults every engine shares"""
+import hashlib
+import json
+import math
+import dataclasses
+from dataclasses import MISSING, dataclass, field, fields
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+# Projections and simulations run to this age
+MAX_AGE = 100
+
+# Age meaning "never" for benefits that aren't set up (e.g. a single person's partner pensions)
+NEVER = 999
+
+
+def _whole_number(name: str, value) -> int:
+    """An age or year count: an int, or a float with no fractional part"""
+    if type(value) is int:
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, float, np.integer, np.floating)) \
+            or not float(value).is_integer():
+        raise ValueError(f"{name} must be a whole number, got {value!r}")
+    return int(value)
+
+
+def _finite_number(name: str, value) -> float:
+    """A dollar amount or percentage"""
+    if type(value) is float and math.isfinite(value):
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, float, np.integer, np.floating)) \
+            or not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number, got {value!r}")
+    return float(value)
+
+
+def _optional_whole_number(name: str, value) -> Optional[int]:
+    """An age that defaults to another input (None until resolved)"""
+    return None if value is None else _whole_number(name, value)
+
+
+_CONVERTERS = {
+    int: _whole_number,
+    float: _finite_number,
+    bool: lambda name, value: bool(value),
+    str: lambda name, value: str(value),
+}
+
+
+def _lump_entries(name: str, entries) -> Tuple[Tuple[int, float], ...]:
+    """
+    (age, amount) pairs sorted by age from a list of {'age', 'amount'} dicts (or pairs), keeping
+    the last entry per age and dropping non-positive amounts - SAFETY CHECK for malformed data
+    """
+    if not isinstance(entries, (list, tuple)):
+        return ()
+    by_age = {}
+    for entry in entries:
+        if isinstance(entry, dict):
+            amount = _finite_number(f'{name} amount', entry.get('amount', 0))
+            age = entry.get('age') if amount > 0 else None
+        elif isinstance(entry, (list, tuple)) and len(entry) == 2:
+            age, amount = entry[0], _finite_number(f'{name} amount', entry[1])
+        else:
+            continue
+        if amount > 0:
+            by_age[_whole_number(f'{name} age', age)] = amount
+    return tuple(sorted(by_age.items()))
+
+
+def lump_sum_array(entries: Tuple[Tuple[int, float], ...], current_age: int, max_age: int = MAX_AGE) -> np.ndarray:
+    """Amounts by age (index 0 = current age, last index = max_age) from (age, amount) pairs"""
+    amounts = np.zeros(max(max_age - current_age + 1, 0))
+    for age, amount in entries:
+        if current_age <= age <= max_age:
+            amounts[age - current_age] = amount
+    return amounts
+
+
+@dataclass(frozen=True, slots=True)
+class PlanInputs:
+    """
+    Every plan input the engines read, validated and normalized once: ages are ints, amounts
+    and percentages floats, flags bools, lump sums sorted (age, amount) pairs. Missing inputs
+    get the engines' defaults (a benefit without an amount or start age is never paid).
+    Instances are immutable and hashable; fingerprint is a hash that is stable across
+    processes, for cache keys. Derived values (rates as fractions, lump sums by age) are
+    computed once on construction.
+    """
+
+    current_age: int
+    retirement_age: int
+    total_investments: float
+    investment_return: float
+    yearly_inflation: float
+    retirement_year_one_income: float
+
+    # Savings - contributions stop at retirement unless stop_investments_age is earlier
+    monthly_investments: float = 0.0
+    stop_investments_age: Optional[int] = None
+    tfsa: float = 0.0
+    rrsp: float = 0.0
+    non_registered: float = 0.0
+    lira: float = 0.0
+
+    # Spending in retirement (today's dollars) and its age-based reductions
+    inflation_adjustment_enabled: bool = True
+    reduction_1_enabled: bool = True
+    age_77_threshold: int = 77
+    age_77_reduction: float = 0.0
+    reduction_2_enabled: bool = True
+    age_83_threshold: int = 83
+    age_83_reduction: float = 0.0
+
+    # Part-time work, from retirement unless part_time_start_age says otherwise
+    part_time_income: float = 0.0
+    part_time_start_age: Optional[int] = None
+    part_time_end_age: int = 65
+    part_time_inflation_adjusted: bool = False
+
+    # Government benefits - Person 1 and Person 2
+    oas_start_age: int = 65
+    monthly_oas: float = 0.0
+    oas_inflation_adjusted: bool = True
+    oas_start_age_p2: int = NEVER
+    monthly_oas_p2: float = 0.0
+    oas_inflation_adjusted_p2: bool = True
+    # Saved scenarios without a CPP start age have always been given 70 (as Home's migration presets)
+    cpp_start_age: int = 70
+    monthly_cpp: float = 0.0
+    cpp_inflation_adjusted: bool = True
+    cpp_start_age_p2: int = NEVER
+    monthly_cpp_p2: float = 0.0
+    cpp_inflation_adjusted_p2: bool = True
+    ignore_oas_clawback: bool = False
+
+    # Employer/private pensions and their bridged top-ups
+    private_pension_start_age: int = NEVER
+    monthly_private_pension: float = 0.0
+    private_pension_inflation_adjusted: bool = False
+    private_pension_start_age_p2: int = NEVER
+    monthly_private_pension_p2: float = 0.0
+    private_pension_inflation_adjusted_p2: bool = False
+    bridged_enabled_p1: bool = False
+    bridged_start_age_p1: int = NEVER
+    bridged_end_age_p1: int = NEVER
+    bridged_amount_p1: float = 0.0
+    bridged_enabled_p2: bool = False
+    bridged_start_age_p2: int = NEVER
+    bridged_end_age_p2: int = NEVER
+    bridged_amount_p2: float = 0.0
+    # Single pension amount of old (pre couple-mode) scenarios, only quoted in advice
+    monthly_pension: float = 0.0
+
+    # Lump sums in and out, as (age, amount) pairs
+    lump_sums: Tuple[Tuple[int, float], ...] = ()
+    lump_sum_withdrawals: Tuple[Tuple[int, float], ...] = ()
+
+    # Household, for stochastic lifetimes
+    couple_mode: bool = False
+    sex: str = 'unisex'
+    sex_p2: str = 'unisex'
+    partner_age_difference: int = 0
+
+    # Derived once on construction
+    inflation_rate: float = field(init=False, repr=False, compare=False)
+    return_rate: float = field(init=False, repr=False, compare=False)
+    lump_in: np.ndarray = field(init=False, repr=False, compare=False)
+    lump_out: np.ndarray = field(init=False, repr=False, compare=False)
+    _fingerprint: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        set_value = object.__setattr__
+        for name, convert in _FIELD_CONVERTERS:
+            set_value(self, name, convert(name, getattr(self, name)))
+        # Ages that default to the retirement age
+        for name in ('stop_investments_age', 'part_time_start_age'):
+            if getattr(self, name) is None:
+                set_value(self, name, self.retirement_age)
+        if not 0 <= self.current_age <= MAX_AGE:
+            raise ValueError(f"current_age must be between 0 and {MAX_AGE}, got {self.current_age}")
+
+        set_value(self, 'inflation_rate', self.yearly_inflation / 100)
+        set_value(self, 'return_rate', self.investment_return / 100)
+        for name, entries in (('lump_in', self.lump_sums), ('lump_out', self.lump_sum_withdrawals)):
+            amounts = lump_sum_array(entries, self.current_age)
+            amounts.setflags(write=False)
+            set_value(self, name, amounts)
+
+    @classmethod
+    def from_dict(cls, inputs: Dict) -> 'PlanInputs':
+        """Plan inputs from an inputs dict; keys the engines don't read (names, dates, UI state) are ignored"""
+        missing = [name for name in _REQUIRED_FIELDS if inputs.get(name) is None]
+        if missing:
+            raise ValueError(f"missing plan inputs: {', '.join(missing)}")
+        return cls(**{name: inputs[name] for name, _ in _FIELD_CONVERTERS if inputs.get(name) is not None})
+
+    def to_dict(self) -> Dict:
+        """The inputs as a plain dict, lump sums back in the {'age', 'amount'} form"""
+        values = {name: getattr(self, name) for name, _ in _FIELD_CONVERTERS}
+        for name in ('lump_sums', 'lump_sum_withdrawals'):
+            values[name] = [{'age': age, 'amount': amount} for age, amount in values[name]]
+        return values
+
+    def replace(self, **changes) -> 'PlanInputs':
+        """A copy with some inputs changed (validated and derived again)"""
+        return dataclasses.replace(self, **changes)
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of every input, the same in every process (unlike hash()), computed on first use"""
+        if self._fingerprint is None:
+            values = {name: getattr(self, name) for name, _ in _FIELD_CONVERTERS}
+            payload = json.dumps(values, sort_keys=True)
+            object.__setattr__(self, '_fingerprint', hashlib.md5(payload.encode()).hexdigest())
+        return self._fingerprint
+
+
+# (name, converter) for every input field, in declaration order
+_FIELD_CONVERTERS = tuple(
+    (spec.name, _lump_entries if spec.type == Tuple[Tuple[int, float], ...]
+     else _optional_whole_number if spec.type == Optional[int] else _CONVERTERS[spec.type])
+    for spec in fields(PlanInputs) if spec.init
+)
+_REQUIRED_FIELDS = tuple(spec.name for spec in fields(PlanInputs) if spec.init and spec.default is MISSING)
+
+
+def compile_inputs(inputs: Union[Dict, PlanInputs]) -> PlanInputs:
+    """PlanInputs for an inputs dict, or an already compiled PlanInputs passed through"""
+    if isinstance(inputs, PlanInputs):
+        return inputs
+    return PlanInputs.from_dict(inputs)
@@ -0,0 +1,56 @@
+"""Recommended equity/bond/cash glide path, shared by the calculator's advice and the multi-asset simulator"""
+import numpy as np
+
+# Asset classes of the multi-asset portfolio, in column order
+ASSET_CLASSES = ('equity', 'bonds', 'cash')
+
+# Years of required income to hold in cash from 5 years before retirement (the advice's 2-year reserve)
+CASH_RESERVE_YEARS = 2
+
+
+def target_equity_percent(age: int, retirement_age: int, retirement_day: bool = False) -> int:
+    """
+    Recommended equity percentage at an age: 110 minus age, bounded by the stage of the glide path.
+    The retirement bands go by age alone; retirement_day gives the 40-60% band at any age.
+    """
+    if age < retirement_age:
+        # Accumulation: at most 90% more than 10 years out, 80% within 10 years, 70% within 5
+        years_to_retirement = retirement_age - age
+        cap = 90 if years_to_retirement > 10 else 80 if years_to_retirement > 5 else 70
+        return min(cap, 110 - age)
+
+    # Retirement: 40-60% at retirement (and until 70), 35-50% from 70, 30-45% from 75, 25-35% from 85
+    if retirement_day or age < 70:
+        floor, cap = 40, 60
+    elif age < 75:
+        floor, cap = 35, 50
+    elif age < 85:
+        floor, cap = 30, 45
+    else:
+        floor, cap = 25, 35
+    return max(floor, min(cap, 110 - age))
+
+
+def glide_path_allocation(schedule, investment_return: float) -> np.ndarray:
+    """
+    (years x 3) equity/bond/cash weights for every age of a cash-flow schedule.
+
+    Equity follows target_equity_percent. From 5 years before retirement a cash reserve of
+    CASH_RESERVE_YEARS of required income is carved out of fixed income, sized against the
+    deterministic projection at investment_return (and never more than the fixed-income share).
+    """
+    ages = schedule.ages
+    equity = np.array([target_equity_percent(age, schedule.retirement_age, age == schedule.retirement_age)
+                       for age in ages]) / 100
+
+    # Required income at retirement stands in for the years before it starts
+    retirement_index = min(max(schedule.index_of(schedule.retirement_age), 0), len(ages) - 1)
+    monthly_income = np.where(schedule.retired, schedule.required_income, schedule.required_income[retirement_index])
+    reserve = CASH_RESERVE_YEARS * 12 * monthly_income
+
+    projected = schedule.invested_balances(np.full(len(ages), investment_return))
+    holds_reserve = ages >= schedule.retirement_age - 5
+    cash_share = np.divide(reserve, projected, out=np.ones(len(ages)), where=projected > 0)
+    cash = np.where(holds_reserve, np.minimum(cash_share, 1 - equity), 0.0)
+
+    return np.column_stack([equity, 1 - equity - cash, cash])
@@ -0,0 +1,162 @@
+"""Memoized calculator and Monte Carlo results shared by every page"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Union
+
+import numpy as np
+
+from calculator import RetirementCalculator, calculate_batch, financial_health_scores
+from monte_carlo import MonteCarloResult, MonteCarloSimulator, compare_scenarios
+from mortality import LifeTableLongevity
+from plan_inputs import PlanInputs, compile_inputs
+from return_models import ReturnModel
+
+def fingerprint_inputs(inputs: Union[Dict, PlanInputs]) -> str:
+    """
+    Stable hash of the inputs that affect projection and simulation results - bookkeeping keys
+    (scenario name, dates, schema version) aren't plan inputs, and 65 and 65.0 are the same age
+    """
+    return compile_inputs(inputs).fingerprint
+
+
+class ResultsCache:
+    """Thread-safe LRU cache of computed results with a bounded number of entries"""
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for key, computing and storing it on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        # Compute outside the lock so one slow simulation doesn't block other sessions
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Module-level caches persist across Streamlit reruns and are shared by all pages
+projection_cache = ResultsCache(max_entries=64)
+monte_carlo_cache = ResultsCache(max_entries=32)
+# Latest path checkpoint per seeded simulation set-up, so a tweaked plan re-simulates only from the
+# first changed age. Unseeded runs are always fresh, so they're never checkpointed. Each holds
+# every path's draws and balances (~15 MB per 10,000 paths), so keep few.
+checkpoint_cache = ResultsCache(max_entries=4)
+comparison_cache = ResultsCache(max_entries=16)
+# Latest calculator checkpoint per starting point (age, balance, return), so an edited plan is
+# recomputed only from the first age whose cash flows changed. Each is a few hundred KB at most.
+calculation_checkpoint_cache = ResultsCache(max_entries=16)
+sweep_cache = ResultsCache(max_entries=16)
+
+
+def get_projection_results(inputs: Union[Dict, PlanInputs]) -> Dict:
+    """Deterministic projection for inputs, calculated at most once per unique plan"""
+    plan = compile_inputs(inputs)
+
+    def calculate():
+        start = (plan.current_age, plan.total_investments, plan.investment_return)
+        calculator = RetirementCalculator(plan, resume_from=calculation_checkpoint_cache.get(start))
+        results = calculator.calculate()
+        calculation_checkpoint_cache.put(start, calculator.checkpoint)
+        return results
+
+    return projection_cache.get_or_compute(plan.fingerprint, calculate)
+
+
+def get_parameter_sweep(inputs: Union[Dict, PlanInputs], retirement_ages, incomes) -> Dict[str, np.ndarray]:
+    """
+    Depletion age, final balance and Financial Health Score for every retirement age x monthly
+    income combination, as (retirement ages x incomes) grids from one batched calculation
+    """
+    retirement_ages = [int(age) for age in retirement_ages]
+    incomes = [float(income) for income in incomes]
+    plan = compile_inputs(inputs)
+    key = (plan.fingerprint, tuple(retirement_ages), tuple(incomes))
+
+    def sweep():
+        age_grid, income_grid = np.meshgrid(retirement_ages, incomes, indexing='ij')
+        batch = calculate_batch(plan, retirement_age=age_grid.ravel(), retirement_year_one_income=income_grid.ravel())
+        shape = age_grid.shape
+        return {
+            'retirement_ages': np.array(retirement_ages),
+            'incomes': np.array(incomes),
+            'depletion_age': batch['depletion_age'].reshape(shape),
+            'final_balance': batch['final_balance'].reshape(shape),
+            'health_score': financial_health_scores(batch).reshape(shape),
+        }
+
+    return sweep_cache.get_or_compute(key, sweep)
+
+
+def get_monte_carlo_results(inputs: Union[Dict, PlanInputs], num_simulations: int = 10000, seed: Optional[int] = None,
+                            workers: int = 1, percentile_mode: str = 'exact',
+                            target_precision: Optional[float] = None, sampling: str = 'random',
+                            control_variate: bool = False, return_model: Union[str, ReturnModel] = 'normal',
+                            std_dev: float = 0.18, inflation_model: Optional[str] = None,
+                            longevity: Union[None, str, LifeTableLongevity] = None,
+                            withdrawal_policy: Optional[str] = None, time_step: str = 'annual',
+                            store_paths: bool = False) -> MonteCarloResult:
+    """Monte Carlo results for inputs, simulated at most once per unique plan, path count and seed"""
+    # Worker count doesn't change the results, so it isn't part of the key
+    setup = (num_simulations, seed, percentile_mode, target_precision, sampling, control_variate,
+             return_model if isinstance(return_model, str) else repr(return_model), std_dev, inflation_model,
+             longevity if longevity is None or isinstance(longevity, str) else repr(longevity), withdrawal_policy,
+             time_step, store_paths)
+    plan = compile_inputs(inputs)
+    key = (plan.fingerprint,) + setup
+
+    def simulate():
+        # Only an explicit seed reuses draws; shared across sessions, a checkpoint must never stand in for one
+        resume = seed is not None
+        simulator = MonteCarloSimulator(plan, num_simulations=num_simulations, seed=seed, workers=workers,
+                                        percentile_mode=percentile_mode, target_precision=target_precision,
+                                        sampling=sampling, control_variate=control_variate,
+                                        return_model=return_model, std_dev=std_dev, inflation_model=inflation_model,
+                                        longevity=longevity, withdrawal_policy=withdrawal_policy,
+                                        time_step=time_step, store_paths=store_paths,
+                                        resume_from=checkpoint_cache.get(setup) if resume else None,
+                                        keep_checkpoint=resume)
+        results = simulator.run_simulation()
+        if resume:
+            checkpoint_cache.put(setup, simulator.checkpoint)
+        return results
+
+    return monte_carlo_cache.get_or_compute(key, simulate)
+
+
+def get_monte_carlo_comparison(scenarios: Dict[str, Dict], num_simulations: int = 2000, seed: Optional[int] = None,
+                               workers: int = 1, return_model: str = 'normal', std_dev: float = 0.18,
+                               inflation_model: Optional[str] = None) -> Dict:
+    """Common-random-numbers comparison of named plans, simulated at most once per unique set of plans and settings"""
+    plans = {name: compile_inputs(inputs) for name, inputs in scenarios.items()}
+    key = (tuple((name, plan.fingerprint) for name, plan in plans.items()), num_simulations, seed,
+           return_model, std_dev, inflation_model)
+    return comparison_cache.get_or_compute(key, lambda: compare_scenarios(
+        plans, num_simulations=num_simulations, seed=seed, workers=workers, return_model=return_model,
+        std_dev=std_dev, inflation_model=inflation_model))
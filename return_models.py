@@ -0,0 +1,399 @@
+"""Annual investment return models for the Monte Carlo simulator, each generating a whole (paths x years) matrix at once"""
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Tuple, Union
+
+from cash_flows import compile_cash_flows
+from plan_inputs import PlanInputs, compile_inputs
+from portfolio import ASSET_CLASSES, glide_path_allocation
+
+# Annual US stock/bond/bill returns and CPI inflation (percent), 1928 onwards
+HISTORICAL_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'historical_returns.csv')
+
+
+class ReturnModel:
+    """
+    Base class for return models. A model turns a (paths x years) matrix of standard
+    normal shocks - drawn by the simulator so antithetic/Sobol sampling applies to every
+    model - into annual returns, using rng for any extra randomness it needs.
+
+    Every model's returns average expected_returns() in every year (`mean`, unless the
+    model varies it by age), which the simulator's control variates rely on, and have
+    overall standard deviation `std_dev`.
+    """
+
+    name = 'base'
+    # Standard normal shocks the model consumes per path per year
+    shocks_per_year = 1
+    # False where volatility comes from history or an allocation rather than the std_dev setting
+    uses_std_dev = True
+
+    def __init__(self, mean: float, std_dev: float):
+        self.mean = mean
+        self.std_dev = std_dev
+
+    @classmethod
+    def from_inputs(cls, inputs: PlanInputs, std_dev: float) -> 'ReturnModel':
+        """Model for a plan: its expected return with the given volatility"""
+        return cls(inputs.return_rate, std_dev)
+
+    def expected_returns(self, num_years: int) -> np.ndarray:
+        """Expected return in each year"""
+        return np.full(num_years, self.mean)
+
+    def primary_shocks(self, shocks: np.ndarray) -> np.ndarray:
+        """(paths x years) shocks of the main risky asset, which correlated inflation moves with"""
+        return shocks
+
+    def generate(self, rng: np.random.Generator, shocks: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def simulate(self, rng: np.random.Generator, shocks: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """(returns, yearly inflation or None) - models that also drive inflation override this"""
+        return self.generate(rng, shocks), None
+
+    def monthly_returns(self, rng: np.random.Generator, returns: np.ndarray) -> np.ndarray:
+        """
+        (years x 12 x paths) monthly returns that compound exactly to the (paths x years) annual
+        returns: a Brownian bridge in log space, spreading the model's volatility evenly over the
+        months, so a monthly run keeps the annual model's distribution.
+        """
+        num_paths, num_years = returns.shape
+        # A loss of 100% or more (possible in the normal model's tail) leaves a sliver rather than log(0)
+        log_growth = np.log(np.maximum(1 + returns, 1e-6))
+        noise = rng.standard_normal((num_years, 12, num_paths))
+        noise -= noise.mean(axis=1, keepdims=True)
+        noise *= self.std_dev / (1 + self.mean) / np.sqrt(12)
+        noise += log_growth.T[:, None, :] / 12
+        return np.expm1(noise, out=noise)
+
+    def params(self) -> Dict:
+        """Parameters that fully describe the model (used in cache keys and labels)"""
+        return {'mean': self.mean, 'std_dev': self.std_dev}
+
+    def __repr__(self):
+        args = ', '.join(f'{k}={v!r}' for k, v in self.params().items())
+        return f'{type(self).__name__}({args})'
+
+
+class NormalReturns(ReturnModel):
+    """Independent normally distributed returns each year (the original simulator's model)"""
+
+    name = 'normal'
+
+    def generate(self, rng: np.random.Generator, shocks: np.ndarray) -> np.ndarray:
+        return self.mean + self.std_dev * shocks
+
+
+class StudentTReturns(ReturnModel):
+    """
+    Fat-tailed returns: Student-t with `degrees_of_freedom` (> 2), rescaled to the same
+    standard deviation as the normal model so only the tails differ.
+    """
+
+    name = 'student_t'
+
+    def __init__(self, mean: float, std_dev: float, degrees_of_freedom: float = 5.0):
+        if degrees_of_freedom <= 2:
+            raise ValueError("degrees_of_freedom must be greater than 2 for a finite standard deviation")
+        super().__init__(mean, std_dev)
+        self.degrees_of_freedom = degrees_of_freedom
+
+    def generate(self, rng: np.random.Generator, shocks: np.ndarray) -> np.ndarray:
+        df = self.degrees_of_freedom
+        # t = Z / sqrt(chi2 / df) has variance df / (df - 2); scale it back to unit variance
+        mixing = rng.chisquare(df, size=shocks.shape) / df
+        return self.mean + self.std_dev * np.sqrt((df - 2) / df) * shocks / np.sqrt(mixing)
+
+    def params(self) -> Dict:
+        return {**super().params(), 'degrees_of_freedom': self.degrees_of_freedom}
+
+
+class LognormalReturns(ReturnModel):
+    """Lognormal growth factors (returns can't fall below -100%) moment-matched to mean and std_dev"""
+
+    name = 'lognormal'
+
+    def __init__(self, mean: float, std_dev: float):
+        super().__init__(mean, std_dev)
+        # Parameters of log(1 + r) giving E[1 + r] = 1 + mean and SD[1 + r] = std_dev
+        self.log_std = np.sqrt(np.log(1 + (std_dev / (1 + mean)) ** 2))
+        self.log_mean = np.log(1 + mean) - self.log_std ** 2 / 2
+
+    def generate(self, rng: np.random.Generator, shocks: np.ndarray) -> np.ndarray:
+        return np.expm1(self.log_mean + self.log_std * shocks)
+
+
+class RegimeSwitchingReturns(ReturnModel):
+    """
+    Two-state Markov regime-switching model: a calm "bull" regime and a volatile "bear"
+    regime whose mean is `bear_gap` lower, switching with the given yearly probabilities.
+
+    Regime means and volatilities are solved so the long-run mean and standard deviation
+    match `mean` and `std_dev`. Paths start in the long-run regime mix, so every year's
+    expected return is exactly `mean`, but bad years cluster together.
+    """
+
+    name = 'regime_switching'
+
+    def __init__(self, mean: float, std_dev: float, p_bull_to_bear: float = 0.15, p_bear_to_bull: float = 0.5,
+                 bear_gap: float = 0.25, bear_volatility_ratio: float = 1.5):
+        super().__init__(mean, std_dev)
+        self.p_bull_to_bear = p_bull_to_bear
+        self.p_bear_to_bull = p_bear_to_bull
+        self.bear_gap = bear_gap
+        self.bear_volatility_ratio = bear_volatility_ratio
+
+        # Long-run share of years spent in the bear regime
+        self.bear_share = p_bull_to_bear / (p_bull_to_bear + p_bear_to_bull)
+        bull_mean = mean + self.bear_share * bear_gap
+        # Total variance = within-regime variance + variance of the regime means
+        within = std_dev ** 2 - self.bear_share * (1 - self.bear_share) * bear_gap ** 2
+        if within <= 0:
+            raise ValueError("std_dev is too small for the gap between bull and bear regime means")
+        bull_std = np.sqrt(within / (1 - self.bear_share + self.bear_share * bear_volatility_ratio ** 2))
+        # Index 0 = bull, 1 = bear
+        self.regime_means = np.array([bull_mean, bull_mean - bear_gap])
+        self.regime_stds = np.array([bull_std, bull_std * bear_volatility_ratio])
+
+    def generate(self, rng: np.random.Generator, shocks: np.ndarray) -> np.ndarray:
+        num_paths, num_years = shocks.shape
+        uniforms = rng.random(size=(num_paths, num_years))
+        regimes = np.empty((num_paths, num_years), dtype=np.int64)
+        regimes[:, 0] = uniforms[:, 0] < self.bear_share
+        # Probability of being in the bear regime next year, given this year's regime
+        to_bear = np.array([self.p_bull_to_bear, 1 - self.p_bear_to_bull])
+        for t in range(1, num_years):
+            regimes[:, t] = uniforms[:, t] < to_bear[regimes[:, t - 1]]
+        return self.regime_means[regimes] + self.regime_stds[regimes] * shocks
+
+    def params(self) -> Dict:
+        return {**super().params(), 'p_bull_to_bear': self.p_bull_to_bear, 'p_bear_to_bull': self.p_bear_to_bull,
+                'bear_gap': self.bear_gap, 'bear_volatility_ratio': self.bear_volatility_ratio}
+
+
+@lru_cache(maxsize=None)
+def load_historical_returns(path: str = HISTORICAL_DATA_PATH) -> pd.DataFrame:
+    """Historical annual data (year, stocks, bonds, bills, inflation) as fractions, loaded once per process"""
+    data = pd.read_csv(path, comment='#')
+    for column in data.columns.drop('year'):
+        data[column] = data[column] / 100
+    return data
+
+
+class HistoricalBootstrapReturns(ReturnModel):
+    """
+    Circular block bootstrap of historical annual returns: each path strings together
+    blocks of `block_size` consecutive historical years (wrapping from the last year to
+    the first), so crashes, recoveries and runs of bad years keep their real sequence.
+
+    With match_mean, returns are shifted so their average is the plan's expected return
+    (and inflation to inflation_mean, if given) while keeping history's year-to-year
+    swings. Every year's expected return is then exactly `mean`. With include_inflation,
+    the same historical years' inflation drives each path's indexed cash flows.
+
+    Block starts come from rng directly - the simulator's antithetic/Sobol shocks don't apply.
+    """
+
+    name = 'historical'
+    uses_std_dev = False
+
+    def __init__(self, mean: float, std_dev: Optional[float] = None, asset: str = 'stocks', block_size: int = 5,
+                 match_mean: bool = True, include_inflation: bool = False, inflation_mean: Optional[float] = None):
+        data = load_historical_returns()
+        if asset not in data.columns or asset in ('year', 'inflation'):
+            raise ValueError(f"asset must be one of {[c for c in data.columns if c not in ('year', 'inflation')]}")
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1")
+        self.asset = asset
+        self.block_size = block_size
+        self.match_mean = match_mean
+        self.include_inflation = include_inflation
+        self.inflation_mean = inflation_mean
+
+        returns = data[asset].to_numpy()
+        inflation = data['inflation'].to_numpy()
+        if match_mean:
+            returns = returns - returns.mean() + mean
+            if inflation_mean is not None:
+                inflation = inflation - inflation.mean() + inflation_mean
+        self.history = returns
+        self.inflation_history = inflation
+        # Volatility comes from history; the std_dev argument is accepted for a uniform signature only
+        super().__init__(float(returns.mean()), float(returns.std()))
+
+    def _sample_years(self, rng: np.random.Generator, num_paths: int, num_years: int) -> np.ndarray:
+        """(paths x years) indices into the history, drawn block by block for every path at once"""
+        num_blocks = -(-num_years // self.block_size)
+        starts = rng.integers(0, len(self.history), size=(num_paths, num_blocks))
+        years = starts[:, :, None] + np.arange(self.block_size)
+        return years.reshape(num_paths, -1)[:, :num_years] % len(self.history)
+
+    def generate(self, rng: np.random.Generator, shocks: np.ndarray) -> np.ndarray:
+        return self.simulate(rng, shocks)[0]
+
+    def simulate(self, rng: np.random.Generator, shocks: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        years = self._sample_years(rng, *shocks.shape)
+        inflation = self.inflation_history[years] if self.include_inflation else None
+        return self.history[years], inflation
+
+    def params(self) -> Dict:
+        return {'mean': self.mean, 'asset': self.asset, 'block_size': self.block_size, 'match_mean': self.match_mean,
+                'include_inflation': self.include_inflation, 'inflation_mean': self.inflation_mean}
+
+
+class GlidePathReturns(ReturnModel):
+    """
+    Multi-asset portfolio following a per-age (years x assets) allocation, rebalanced back
+    to the target weights at the start of every year - so each year's portfolio return is
+    the allocation-weighted sum of that year's asset returns.
+
+    Asset returns are multivariate normal, correlated through a Cholesky factor of their
+    covariance, with every path's shocks drawn in one matrix (3 shocks per year).
+    """
+
+    name = 'glide_path'
+    shocks_per_year = len(ASSET_CLASSES)
+    uses_std_dev = False
+
+    def __init__(self, allocation: np.ndarray, asset_means: np.ndarray, asset_stds: np.ndarray,
+                 correlation: np.ndarray):
+        self.allocation = np.asarray(allocation, dtype=float)
+        self.asset_means = np.asarray(asset_means, dtype=float)
+        self.asset_stds = np.asarray(asset_stds, dtype=float)
+        self.correlation = np.asarray(correlation, dtype=float)
+        covariance = self.correlation * np.outer(self.asset_stds, self.asset_stds)
+        self.cholesky = np.linalg.cholesky(covariance)
+        portfolio_variance = np.einsum('ya,ab,yb->y', self.allocation, covariance, self.allocation)
+        super().__init__(float(self.expected_returns(len(self.allocation)).mean()),
+                         float(np.sqrt(portfolio_variance.mean())))
+
+    @classmethod
+    def from_inputs(cls, inputs: PlanInputs, std_dev: float = None) -> 'GlidePathReturns':
+        """
+        The advice's recommended glide path for a plan, with volatilities and correlations of
+        US stocks, 10-year Treasuries and T-bills from the bundled history. Asset means keep
+        history's premiums over cash, shifted so the allocation at retirement earns the plan's
+        expected return. std_dev is ignored - volatility comes from the allocation.
+        """
+        investment_return = inputs.return_rate
+        schedule = compile_cash_flows(inputs)
+        allocation = glide_path_allocation(schedule, investment_return)
+
+        history = load_historical_returns()[['stocks', 'bonds', 'bills']].to_numpy()
+        retirement_index = min(max(schedule.index_of(schedule.retirement_age), 0), len(schedule) - 1)
+        asset_means = history.mean(axis=0)
+        asset_means = asset_means + investment_return - allocation[retirement_index] @ asset_means
+        return cls(allocation, asset_means, history.std(axis=0), np.corrcoef(history, rowvar=False))
+
+    def expected_returns(self, num_years: int) -> np.ndarray:
+        return self.allocation[:num_years] @ self.asset_means
+
+    def primary_shocks(self, shocks: np.ndarray) -> np.ndarray:
+        num_years, num_assets = self.allocation.shape
+        return shocks.reshape(shocks.shape[0], num_years, num_assets)[:, :, 0]
+
+    def generate(self, rng: np.random.Generator, shocks: np.ndarray) -> np.ndarray:
+        num_paths = shocks.shape[0]
+        num_years, num_assets = self.allocation.shape
+        # (paths x years x assets) correlated asset returns
+        asset_returns = self.asset_means + shocks.reshape(num_paths, num_years, num_assets) @ self.cholesky.T
+        return np.einsum('pya,ya->py', asset_returns, self.allocation)
+
+    def params(self) -> Dict:
+        return {'allocation': self.allocation.round(6).tolist(), 'asset_means': self.asset_means.tolist(),
+                'asset_stds': self.asset_stds.tolist(), 'correlation': self.correlation.round(6).tolist()}
+
+
+class AR1Inflation:
+    """
+    Yearly inflation as a mean-reverting AR(1) process around the plan's inflation rate:
+    
+        inflation[t] = mean + persistence * (inflation[t-1] - mean) + volatility * shock[t]
+    
+    starting from the mean, so every year's expected inflation is exactly `mean`. Shocks are
+    correlated with the return model's main risky-asset shocks (`correlation`). The whole
+    (paths x years) matrix comes from one matrix product with the process's impulse response.
+    """
+
+    name = 'ar1'
+
+    def __init__(self, mean: float, persistence: float, volatility: float, correlation: float):
+        if not -1 < persistence < 1:
+            raise ValueError("persistence must be between -1 and 1")
+        if not -1 <= correlation <= 1:
+            raise ValueError("correlation must be between -1 and 1")
+        self.mean = mean
+        self.persistence = persistence
+        self.volatility = volatility
+        self.correlation = correlation
+
+    @classmethod
+    def from_inputs(cls, inputs: PlanInputs, start_year: int = 1950) -> 'AR1Inflation':
+        """
+        Persistence, volatility and stock-return correlation fitted to US CPI inflation since
+        start_year (post-war, past the 1930s deflation and wartime price controls), around
+        the plan's yearly_inflation.
+        """
+        history = load_historical_returns()
+        history = history[history['year'] >= start_year]
+        deviations = history['inflation'].to_numpy() - history['inflation'].mean()
+        persistence = (deviations[1:] @ deviations[:-1]) / (deviations[:-1] @ deviations[:-1])
+        innovations = deviations[1:] - persistence * deviations[:-1]
+        correlation = np.corrcoef(innovations, history['stocks'].to_numpy()[1:])[0, 1]
+        return cls(inputs.inflation_rate, float(persistence), float(innovations.std()), float(correlation))
+
+    def generate(self, return_shocks: np.ndarray, own_shocks: np.ndarray) -> np.ndarray:
+        """(paths x years) yearly inflation from the return model's primary shocks and independent shocks"""
+        num_years = own_shocks.shape[1]
+        shocks = self.correlation * return_shocks + np.sqrt(1 - self.correlation ** 2) * own_shocks
+        # response[t, s] = volatility * persistence^(t - s): how year s's shock still moves year t
+        lags = np.arange(num_years)[:, None] - np.arange(num_years)
+        response = np.where(lags >= 0, self.volatility * self.persistence ** np.maximum(lags, 0), 0.0)
+        return self.mean + shocks @ response.T
+
+    def params(self) -> Dict:
+        return {'mean': self.mean, 'persistence': self.persistence, 'volatility': self.volatility,
+                'correlation': self.correlation}
+
+    def __repr__(self):
+        args = ', '.join(f'{k}={v!r}' for k, v in self.params().items())
+        return f'{type(self).__name__}({args})'
+
+
+INFLATION_MODELS = {
+    'ar1': AR1Inflation,
+}
+
+
+RETURN_MODELS = {
+    'normal': NormalReturns,
+    'student_t': StudentTReturns,
+    'lognormal': LognormalReturns,
+    'regime_switching': RegimeSwitchingReturns,
+    'historical': HistoricalBootstrapReturns,
+    'glide_path': GlidePathReturns,
+}
+
+
+def build_return_model(model: Union[str, ReturnModel], inputs: Union[Dict, PlanInputs],
+                       std_dev: float) -> ReturnModel:
+    """Return model for a plan from a name in RETURN_MODELS (default parameters), or pass an instance through"""
+    if isinstance(model, ReturnModel):
+        return model
+    if model not in RETURN_MODELS:
+        raise ValueError(f"return_model must be one of {sorted(RETURN_MODELS)} or a ReturnModel instance")
+    return RETURN_MODELS[model].from_inputs(compile_inputs(inputs), std_dev)
+
+
+def build_inflation_model(model: Union[None, str, AR1Inflation],
+                          inputs: Union[Dict, PlanInputs]) -> Optional[AR1Inflation]:
+    """Inflation model for a plan from a name in INFLATION_MODELS, an instance, or None for constant inflation"""
+    if model is None or isinstance(model, AR1Inflation):
+        return model
+    if model not in INFLATION_MODELS:
+        raise ValueError(f"inflation_model must be one of {sorted(INFLATION_MODELS)}, an instance or None")
+    return INFLATION_MODELS[model].from_inputs(compile_inputs(inputs))
@@ -0,0 +1,288 @@
+"""Dynamic withdrawal policies for the Monte Carlo simulator, each deciding a whole block of paths' withdrawals per year"""
+import copy
+
+import numpy as np
+from typing import Dict, Optional, Union
+
+from cash_flows import MAX_AGE
+
+# RRIF minimum withdrawal as a fraction of the start-of-year balance, by age (CRA prescribed
+# factors from 71; before 71 the factor is 1 / (90 - age), and 20% from 95 on)
+RRIF_MINIMUM_FACTORS = {
+    71: 0.0528, 72: 0.0540, 73: 0.0553, 74: 0.0567, 75: 0.0582, 76: 0.0598, 77: 0.0617, 78: 0.0636,
+    79: 0.0658, 80: 0.0682, 81: 0.0708, 82: 0.0738, 83: 0.0771, 84: 0.0808, 85: 0.0851, 86: 0.0899,
+    87: 0.0955, 88: 0.1021, 89: 0.1099, 90: 0.1192, 91: 0.1306, 92: 0.1449, 93: 0.1634, 94: 0.1879,
+}
+RRIF_MINIMUM_FACTOR_FROM_95 = 0.20
+
+
+def rrif_minimum_factor(age: int) -> float:
+    """Fraction of a RRIF that must be withdrawn in the year of an age"""
+    if age < 71:
+        return 1 / (90 - age)
+    return RRIF_MINIMUM_FACTORS.get(age, RRIF_MINIMUM_FACTOR_FROM_95)
+
+
+class SpendingTracker:
+    """
+    Per-path spending statistics accumulated one retirement year at a time: year-over-year
+    changes in real (inflation-adjusted) spending and the years spending fell below the plan's
+    required income. Paths are a prefix of the block, as in the path simulation.
+    """
+
+    def __init__(self, num_paths: int):
+        self.previous = np.zeros(num_paths)
+        self.change_sum = np.zeros(num_paths)
+        self.change_square_sum = np.zeros(num_paths)
+        self.changes = np.zeros(num_paths, dtype=np.int64)
+        self.max_cut = np.zeros(num_paths)
+        self.years = np.zeros(num_paths, dtype=np.int64)
+        self.years_below = np.zeros(num_paths, dtype=np.int64)
+
+    def record(self, real_spending: np.ndarray, below_target: np.ndarray):
+        n = len(real_spending)
+        previous = self.previous[:n]
+        # Yearly change in real spending, for paths that spent something the year before
+        has_previous = previous > 0
+        change = np.divide(real_spending, previous, out=np.ones(n), where=has_previous) - 1
+        self.change_sum[:n] += change
+        self.change_square_sum[:n] += change * change
+        self.changes[:n] += has_previous
+        np.maximum(self.max_cut[:n], -change, out=self.max_cut[:n])
+        self.years[:n] += 1
+        self.years_below[:n] += below_target
+        previous[:] = real_spending
+
+    def per_path(self) -> Dict[str, np.ndarray]:
+        """Each path's spending volatility (SD of yearly real changes), largest real cut and share of years below target"""
+        changes = np.maximum(self.changes, 1)
+        mean = self.change_sum / changes
+        return {
+            'volatility': np.sqrt(np.maximum(self.change_square_sum / changes - mean * mean, 0)),
+            'max_cut': self.max_cut,
+            'years_below_target': self.years_below / np.maximum(self.years, 1),
+        }
+
+
+def summarize_spending(per_path: Dict[str, np.ndarray]) -> Dict[str, float]:
+    """Run-level spending statistics (in percent) from every path's SpendingTracker.per_path()"""
+    return {
+        # Median path's standard deviation of year-over-year real spending changes
+        'volatility': float(np.median(per_path['volatility']) * 100),
+        # Largest single-year real spending cut: median path and worst 10% of paths
+        'median_max_cut': float(np.median(per_path['max_cut']) * 100),
+        'p90_max_cut': float(np.percentile(per_path['max_cut'], 90) * 100),
+        # Share of retirement years spending was below the plan's required income, averaged over paths
+        'years_below_target': float(np.mean(per_path['years_below_target']) * 100),
+    }
+
+
+class WithdrawalPolicy:
+    """
+    Base class for withdrawal policies. start() returns a fresh copy holding per-path state
+    for one block of paths; withdraw() is then called once per retirement year with the living
+    paths' balances (after lump sums, before the withdrawal) and returns each path's planned
+    withdrawal. Spending is the withdrawal plus the plan's other income (pensions, part-time work).
+
+    A path fails when its balance can't cover the planned withdrawal.
+    """
+
+    name = 'base'
+
+    def start(self, schedule, num_paths: int, inflation: Optional[np.ndarray] = None) -> 'WithdrawalPolicy':
+        """Copy of the policy for num_paths paths of a schedule, with optional (paths x years) yearly inflation"""
+        run = copy.copy(self)
+        run.schedule = schedule
+        flows = schedule.spending_flows(inflation)
+        shape = (num_paths, len(schedule))
+        run.required_income = np.broadcast_to(flows['required_income'], shape)
+        run.other_income = np.broadcast_to(flows['other_income'], shape)
+        run.price_level = np.broadcast_to(flows['price_level'], shape)
+        run.spending = SpendingTracker(num_paths)
+        run._reset(num_paths)
+        return run
+
+    def _reset(self, num_paths: int):
+        """Set up per-path state"""
+
+    def _plan(self, i: int, balance: np.ndarray, last_return: Optional[np.ndarray]) -> np.ndarray:
+        raise NotImplementedError
+
+    def need(self, i: int, n: int) -> np.ndarray:
+        """What the plan itself withdraws at age index i: required income not covered by other income"""
+        return np.maximum(self.required_income[:n, i] - self.other_income[:n, i], 0)
+
+    def withdraw(self, i: int, balance: np.ndarray, last_return: Optional[np.ndarray]) -> np.ndarray:
+        """Planned withdrawal at age index i for each living path, recording the spending it funds"""
+        n = len(balance)
+        planned = np.maximum(self._plan(i, balance, last_return), 0)
+        spending = np.minimum(planned, np.maximum(balance, 0)) + self.other_income[:n, i]
+        self.spending.record(spending / self.price_level[:n, i], spending < self.required_income[:n, i] - 0.005)
+        return planned
+
+    def params(self) -> Dict:
+        """Parameters that fully describe the policy (used in cache keys and labels)"""
+        return {}
+
+    def __repr__(self):
+        args = ', '.join(f'{k}={v!r}' for k, v in self.params().items())
+        return f'{type(self).__name__}({args})'
+
+
+class FixedWithdrawals(WithdrawalPolicy):
+    """The plan's own withdrawals whatever the market does - the baseline, with spending statistics"""
+
+    name = 'fixed'
+
+    def _plan(self, i: int, balance: np.ndarray, last_return: Optional[np.ndarray]) -> np.ndarray:
+        return self.need(i, len(balance))
+
+
+class GuytonKlingerGuardrails(WithdrawalPolicy):
+    """
+    Guyton-Klinger decision rules on a per-path spending multiplier of the plan's required income:
+
+    - inflation rule: skip the year's inflation raise after a losing year if the withdrawal
+      rate is above its initial level;
+    - capital preservation: cut spending by `adjustment` when the withdrawal rate rises more
+      than `guardrail` above its initial level (not in the last `preservation_cutoff_years`);
+    - prosperity: raise spending by `adjustment` when it falls more than `guardrail` below.
+    """
+
+    name = 'guardrails'
+
+    def __init__(self, guardrail: float = 0.20, adjustment: float = 0.10, preservation_cutoff_years: int = 15):
+        if not 0 < guardrail < 1 or not 0 < adjustment < 1:
+            raise ValueError("guardrail and adjustment must be between 0 and 1")
+        self.guardrail = guardrail
+        self.adjustment = adjustment
+        self.preservation_cutoff_years = preservation_cutoff_years
+
+    def _reset(self, num_paths: int):
+        self.multiplier = np.ones(num_paths)
+        self.initial_rate = None
+
+    def _rate(self, withdrawal: np.ndarray, balance: np.ndarray) -> np.ndarray:
+        return np.divide(withdrawal, balance, out=np.full(len(balance), np.inf), where=balance > 0)
+
+    def _plan(self, i: int, balance: np.ndarray, last_return: Optional[np.ndarray]) -> np.ndarray:
+        n = len(balance)
+        if self.initial_rate is None:
+            # First retirement year: the plan's withdrawal sets each path's initial rate
+            planned = self.need(i, n)
+            self.initial_rate = np.full(len(self.multiplier), np.inf)
+            self.initial_rate[:n] = self._rate(planned, balance)
+            return planned
+
+        multiplier = self.multiplier[:n]
+        initial_rate = self.initial_rate[:n]
+        required, other = self.required_income[:n, i], self.other_income[:n, i]
+
+        def withdrawal():
+            return np.maximum(multiplier * required - other, 0)
+
+        # Required income already includes this year's inflation - undo it where the rule freezes spending
+        inflation = self.price_level[:n, i] / self.price_level[:n, i - 1]
+        frozen = (last_return < 0) & (self._rate(withdrawal(), balance) > initial_rate)
+        multiplier[frozen] /= inflation[frozen]
+
+        rate = self._rate(withdrawal(), balance)
+        if MAX_AGE - self.schedule.ages[i] > self.preservation_cutoff_years:
+            multiplier[rate > initial_rate * (1 + self.guardrail)] *= 1 - self.adjustment
+        multiplier[rate < initial_rate * (1 - self.guardrail)] *= 1 + self.adjustment
+        return withdrawal()
+
+    def params(self) -> Dict:
+        return {'guardrail': self.guardrail, 'adjustment': self.adjustment,
+                'preservation_cutoff_years': self.preservation_cutoff_years}
+
+
+class VariablePercentageWithdrawal(WithdrawalPolicy):
+    """
+    Variable-percentage withdrawal (VPW): each year withdraw the fraction of the balance that
+    would fund level real payments to `horizon_age` at `real_return` - all of it in the final
+    year, so the portfolio never runs dry early but spending follows the market.
+    """
+
+    name = 'vpw'
+
+    def __init__(self, real_return: Optional[float] = None, horizon_age: int = MAX_AGE):
+        # None uses the plan's expected return net of its inflation rate
+        self.real_return = real_return
+        self.horizon_age = horizon_age
+
+    def _reset(self, num_paths: int):
+        schedule = self.schedule
+        real_return = self.real_return
+        if real_return is None:
+            real_return = (1 + schedule.investment_return) / schedule.growth - 1
+        # Payments left including this year's; annuity-due payment per dollar of balance
+        payments = np.maximum(self.horizon_age - schedule.ages + 1, 1)
+        if abs(real_return) < 1e-9:
+            self.rates = 1 / payments
+        else:
+            self.rates = real_return / ((1 + real_return) * (1 - (1 + real_return) ** -payments.astype(float)))
+        # The final year takes exactly everything: rounding would leave the formula's rate a hair off 1, and
+        # past 1 every path overdraws (and fails) at the horizon
+        self.rates = np.minimum(np.where(payments == 1, 1.0, self.rates), 1.0)
+
+    def _plan(self, i: int, balance: np.ndarray, last_return: Optional[np.ndarray]) -> np.ndarray:
+        return self.rates[i] * balance
+
+    def params(self) -> Dict:
+        return {'real_return': self.real_return, 'horizon_age': self.horizon_age}
+
+
+class RRIFMinimumFloor(WithdrawalPolicy):
+    """The plan's withdrawal, but never less than the RRIF minimum for the age (the whole portfolio treated as a RRIF)"""
+
+    name = 'rrif_minimum'
+
+    def _reset(self, num_paths: int):
+        self.factors = np.array([rrif_minimum_factor(age) for age in self.schedule.ages])
+
+    def _plan(self, i: int, balance: np.ndarray, last_return: Optional[np.ndarray]) -> np.ndarray:
+        return np.maximum(self.need(i, len(balance)), self.factors[i] * balance)
+
+
+class SpendingFloorCeiling(WithdrawalPolicy):
+    """
+    Spend `rate` of the balance plus other income, kept between `floor` and `ceiling` times the
+    plan's required income - spending follows the market only within the band.
+    """
+
+    name = 'floor_ceiling'
+
+    def __init__(self, rate: float = 0.04, floor: float = 0.85, ceiling: float = 1.25):
+        if not 0 <= floor <= 1 <= ceiling:
+            raise ValueError("floor must be between 0 and 1 and ceiling at least 1")
+        self.rate = rate
+        self.floor = floor
+        self.ceiling = ceiling
+
+    def _plan(self, i: int, balance: np.ndarray, last_return: Optional[np.ndarray]) -> np.ndarray:
+        n = len(balance)
+        required, other = self.required_income[:n, i], self.other_income[:n, i]
+        spending = np.clip(self.rate * np.maximum(balance, 0) + other, self.floor * required, self.ceiling * required)
+        return spending - other
+
+    def params(self) -> Dict:
+        return {'rate': self.rate, 'floor': self.floor, 'ceiling': self.ceiling}
+
+
+WITHDRAWAL_POLICIES = {
+    'fixed': FixedWithdrawals,
+    'guardrails': GuytonKlingerGuardrails,
+    'vpw': VariablePercentageWithdrawal,
+    'rrif_minimum': RRIFMinimumFloor,
+    'floor_ceiling': SpendingFloorCeiling,
+}
+
+
+def build_withdrawal_policy(policy: Union[None, str, WithdrawalPolicy]) -> Optional[WithdrawalPolicy]:
+    """Policy from a name in WITHDRAWAL_POLICIES (default parameters), an instance, or None for the plan's withdrawals"""
+    if policy is None or isinstance(policy, WithdrawalPolicy):
+        return policy
+    if policy not in WITHDRAWAL_POLICIES:
+        raise ValueError(f"withdrawal_policy must be one of {sorted(WITHDRAWAL_POLICIES)}, an instance or None")
+    return WITHDRAWAL_POLICIES[policy]()